@@ -35,7 +35,8 @@ class AuditMiddleware:
             if '/api/auth/login/' in request.path and request.method == 'POST':
                 action = 'login' if response.status_code == 200 else 'failed_login'
             elif '/api/transactions/transfer/' in request.path and request.method == 'POST':
-                if response.status_code == 200:
+                # 202 = transfer accepted for asynchronous settlement
+                if response.status_code in (200, 202):
                     action = 'transfer'
 
             if action:
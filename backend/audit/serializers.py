@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from backend.projection import SparseFieldsetSerializerMixin
 from .models import AuditLog
 
 
-class AuditLogSerializer(serializers.ModelSerializer):
+class AuditLogSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     user_email = serializers.EmailField(source='user.email', read_only=True)
 
     class Meta:
@@ -1,4 +1,7 @@
+from django.db import connection
 from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
@@ -62,3 +65,40 @@ class AuditLogAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Should return empty list for non-admin users
         self.assertEqual(len(response.data['results']), 0)
+
+    def test_log_list_query_count(self):
+        """Test that a page of logs costs a count and one joined select"""
+        for i in range(15):
+            AuditLog.objects.create(user=self.customer_user, action='login', status='success')
+        self.client.force_authenticate(user=self.admin_user)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/audit/logs/')
+        self.assertEqual(len(response.data['results']), 15)
+        self.assertEqual(response.data['results'][0]['user_email'], 'customer@example.com')
+
+    def test_sparse_fieldset(self):
+        """Test that ?fields= prunes the JSON and the selected columns"""
+        AuditLog.objects.create(user=self.customer_user, action='login', user_agent='curl', status='success')
+        self.client.force_authenticate(user=self.admin_user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/audit/logs/?fields=action,timestamp')
+        self.assertEqual(set(response.data['results'][0]), {'action', 'timestamp'})
+        self.assertNotIn('user_agent', queries[-1]['sql'])
+        self.assertNotIn('JOIN', queries[-1]['sql'])
+
+        response = self.client.get('/api/audit/logs/?fields=action,password')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fast_rendering_matches_serializer(self):
+        """Test that the fast list path renders the same bytes, including logs without a user"""
+        AuditLog.objects.create(user=self.customer_user, action='login', ip_address='10.0.0.1', status='success')
+        AuditLog.objects.create(user=None, action='failed_login', details='{"username": "ghost"}', status='failed')
+        self.client.force_authenticate(user=self.admin_user)
+
+        with override_settings(FAST_LIST_RENDERING=False):
+            expected = self.client.get('/api/audit/logs/').content
+        response = self.client.get('/api/audit/logs/')
+        self.assertEqual(response.content, expected)
+        self.assertNotIn('user_email', response.data['results'][0])
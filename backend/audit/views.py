@@ -1,23 +1,28 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from backend.fastpath import FastJSONRenderer
+from backend.projection import ProjectionMixin
 from .models import AuditLog
 from .serializers import AuditLogSerializer
 
 
-class AuditLogListView(generics.ListAPIView):
+class AuditLogListView(ProjectionMixin, generics.ListAPIView):
     """
     Endpoint for auditors and admins to view audit logs.
     Regular users cannot access this endpoint.
+    Supports ?fields= to return (and load) a subset of fields.
     """
     serializer_class = AuditLogSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer]
+    fast_rows = True
 
     def get_queryset(self):
         # Only allow auditors and admins
         if self.request.user.role not in ['admin', 'auditor']:
             return AuditLog.objects.none()
 
-        queryset = AuditLog.objects.all()
+        queryset = self.project(AuditLog.objects.all())
 
         # Optional filtering by user_id
         user_id = self.request.query_params.get('user_id')
@@ -2,6 +2,9 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests for the transaction event stream go to a raw ASGI app
+(transactions.stream) so long-lived connections do not hold a thread;
+everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +16,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup: the stream uses models
+from transactions.stream import STREAM_PATH, transaction_stream  # noqa: E402
+from fraud_detection.anomaly import get_model  # noqa: E402
+
+# Load the fraud model once per worker rather than on a request
+get_model()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        return await transaction_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,244 @@
+"""
+Fast path for read-only list endpoints.
+Instead of model instances fed through ModelSerializer field machinery,
+the page is loaded as values_list() rows and turned into dicts by a plan
+compiled once per request from the serializer's fields: one column and one
+plain converter per field. FastJSONRenderer then encodes the result with
+orjson when it is installed. Both produce exactly the bytes the regular
+serializer and JSONRenderer would; serializers or fields the plan cannot
+reproduce fall back to the regular path.
+"""
+
+import decimal
+import math
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from .projection import model_paths
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+SKIP = object()
+
+
+def _to_str(field):
+    return str
+
+
+def _to_bool(field):
+    return bool
+
+
+def _to_int(field):
+    return int
+
+
+def _to_float(field):
+    return float
+
+
+def _to_choice(field):
+    mapping = field.choice_strings_to_values
+
+    def convert(value):
+        return value if value == '' else mapping.get(str(value), value)
+    return convert
+
+
+def _to_decimal(field):
+    if field.localize or field.normalize_output or \
+            not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        return None
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places if field.decimal_places is not None else None
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        if exponent is not None:
+            value = value.quantize(exponent, rounding=rounding, context=context)
+        return '{:f}'.format(value)
+    return convert
+
+
+def _to_datetime(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != 'iso-8601':
+        return None
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return None
+
+    def convert(value):
+        if isinstance(value, str) or timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+# Exact field classes only: subclasses may override to_representation
+CONVERTERS = {
+    serializers.CharField: _to_str,
+    serializers.EmailField: _to_str,
+    serializers.SlugField: _to_str,
+    serializers.URLField: _to_str,
+    serializers.IPAddressField: _to_str,
+    serializers.ChoiceField: _to_choice,
+    serializers.BooleanField: _to_bool,
+    serializers.IntegerField: _to_int,
+    serializers.FloatField: _to_float,
+    serializers.DecimalField: _to_decimal,
+    serializers.DateTimeField: _to_datetime,
+}
+
+
+def _nullable_hops(model, source_attrs):
+    """Column paths of the nullable relations a nested source goes through"""
+    hops, path = [], []
+    for attr in source_attrs[:-1]:
+        field = model._meta.get_field(attr)
+        path.append(field.name)
+        if field.null:
+            hops.append('__'.join(path))
+        model = field.related_model
+    return hops
+
+
+class RowPlan:
+    """
+    Serialize values_list(*columns, named=True) rows like serializer would.
+    columns always starts with 'pk', followed by required and field columns.
+    """
+
+    def __init__(self, columns, steps, float_positions):
+        self.columns = columns
+        self.steps = steps
+        self.float_positions = float_positions
+
+    def __call__(self, rows):
+        data = FastRows()
+        for row in rows:
+            item = {}
+            for name, position, convert, guards, on_null in self.steps:
+                if guards and any(row[guard] is None for guard in guards):
+                    # DRF's get_attribute fails through a null relation
+                    if on_null is not SKIP:
+                        item[name] = on_null
+                    continue
+                value = row[position]
+                item[name] = None if value is None else convert(value)
+            data.append(item)
+        data.json_safe = all(
+            _float_safe(row[position]) for position in self.float_positions for row in rows
+        )
+        return data
+
+
+def compile_rows(serializer, required=()):
+    """
+    RowPlan for a (sparse) ModelSerializer instance, or None when any of
+    its fields cannot be reproduced from a plain column.
+    """
+    if not isinstance(serializer, serializers.ModelSerializer):
+        return None
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        return None
+    model = serializer.Meta.model
+
+    columns = ['pk']
+    positions = {'pk': 0}
+
+    def position(column):
+        if column not in positions:
+            positions[column] = len(columns)
+            columns.append(column)
+        return positions[column]
+
+    for column in required:
+        position(column)
+
+    steps, float_positions = [], []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        make = CONVERTERS.get(type(field))
+        if make is None or field.source == '*':
+            return None
+        paths = model_paths(model, field.source_attrs)
+        if paths is None:
+            return None
+        convert = make(field)
+        if convert is None:
+            return None
+        column = paths[1]
+        if column == model._meta.pk.name:
+            column = 'pk'
+        guards = tuple(position(hop) for hop in _nullable_hops(model, field.source_attrs))
+        if guards and field.default is not empty:
+            return None
+        on_null = None if field.allow_null else SKIP
+        steps.append((name, position(column), convert, guards, on_null))
+        if convert is float:
+            float_positions.append(position(column))
+    return RowPlan(columns, steps, float_positions)
+
+
+class FastRows(list):
+    """Serialized rows; json_safe means orjson encodes them like the stdlib would"""
+    json_safe = False
+
+
+class RowListSerializer:
+    """Stands in for serializer(page, many=True) on the fast path"""
+
+    def __init__(self, plan, rows):
+        self.plan = plan
+        self.rows = rows
+
+    @property
+    def data(self):
+        if not hasattr(self, '_data'):
+            self._data = self.plan(self.rows)
+        return self._data
+
+
+def _float_safe(value):
+    # Python and orjson only agree on float formatting without an exponent
+    return value is None or value == 0 or (
+        math.isfinite(value) and 1e-4 <= abs(value) < 1e15
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that hands FastRows pages (bare or in a pagination
+    envelope) to orjson; everything else renders exactly as before.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is not None and self._fast(data, accepted_media_type, renderer_context):
+            try:
+                body = orjson.dumps(data)
+            except TypeError:
+                pass
+            else:
+                # Same escaping of the JavaScript line terminators as JSONRenderer
+                return body.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def _fast(self, data, accepted_media_type, renderer_context):
+        if self.get_indent(accepted_media_type, renderer_context or {}) or not api_settings.COMPACT_JSON:
+            return False
+        if not api_settings.UNICODE_JSON or not api_settings.STRICT_JSON:
+            return False
+        rows = data.get('results') if isinstance(data, dict) else data
+        return isinstance(rows, FastRows) and rows.json_safe
@@ -0,0 +1,124 @@
+"""
+Projection-aware list endpoints.
+Views derive select_related() and only() from the serializer fields they
+render, so list pages cost a fixed number of queries and load only the
+columns in the response. Clients can narrow both with ?fields=a,b,c.
+Views with fast_rows = True load values_list() rows instead of model
+instances and serialize them with a compiled plan (see backend.fastpath).
+"""
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+
+
+class SparseFieldsetSerializerMixin:
+    """Drop every field not listed in context['fields'] (when given)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('fields')
+        if selected:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+
+def model_paths(model, source_attrs):
+    """
+    Map a serializer field's source to (join path, column path) on model.
+    Returns None when the source is not a plain chain of concrete fields
+    (a property, a method, '*'), which cannot be projected.
+    """
+    joins = []
+    for position, attr in enumerate(source_attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        last = position == len(source_attrs) - 1
+        if field.many_to_many or field.one_to_many:
+            return None
+        if last:
+            return '__'.join(joins) or None, '__'.join(joins + [field.name])
+        if not field.is_relation:
+            return None
+        joins.append(field.name)
+        model = field.related_model
+    return None
+
+
+class ProjectionMixin:
+    """
+    For generic list views: build the queryset from the serializer fields.
+    projection_required lists columns the view needs whatever the client
+    selects (e.g. pagination keys). With fast_rows, project() returns named
+    values_list() rows whenever the selected fields allow it.
+    """
+    projection_required = ()
+    fast_rows = False
+
+    def get_selected_fields(self):
+        """Field names from ?fields=, validated against the serializer; None means all"""
+        if hasattr(self, '_selected_fields'):
+            return self._selected_fields
+        raw = self.request.query_params.get(FIELDS_PARAM)
+        selected = None
+        if raw:
+            selected = [name.strip() for name in raw.split(',') if name.strip()]
+            available = self.get_serializer_class()().fields
+            unknown = [name for name in selected if name not in available]
+            if unknown:
+                raise ValidationError({FIELDS_PARAM: [f"Unknown field(s): {', '.join(unknown)}"]})
+        self._selected_fields = selected
+        return selected
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_selected_fields()
+        return context
+
+    def get_row_plan(self):
+        """Compiled fast-path plan for this request, or None for the regular path"""
+        if not hasattr(self, '_row_plan'):
+            self._row_plan = None
+            if self.fast_rows and settings.FAST_LIST_RENDERING:
+                from .fastpath import compile_rows
+                serializer = self.get_serializer_class()(context=self.get_serializer_context())
+                self._row_plan = compile_rows(serializer, self.projection_required)
+        return self._row_plan
+
+    def get_serializer(self, *args, **kwargs):
+        plan = self.get_row_plan() if args and kwargs.get('many') else None
+        if plan is not None:
+            from .fastpath import RowListSerializer
+            return RowListSerializer(plan, args[0])
+        return super().get_serializer(*args, **kwargs)
+
+    def project(self, queryset):
+        """Apply select_related() and only() for the selected serializer fields"""
+        plan = self.get_row_plan()
+        if plan is not None:
+            return queryset.values_list(*plan.columns, named=True)
+
+        serializer_fields = self.get_serializer_class()().fields
+        selected = self.get_selected_fields() or list(serializer_fields)
+
+        joins, columns, projectable = set(), set(self.projection_required), True
+        for name in selected:
+            field = serializer_fields[name]
+            paths = model_paths(queryset.model, field.source_attrs) if field.source != '*' else None
+            if paths is None:
+                projectable = False
+                continue
+            join, column = paths
+            if join:
+                joins.add(join)
+            columns.add(column)
+
+        if joins:
+            queryset = queryset.select_related(*sorted(joins))
+        if projectable:
+            queryset = queryset.only(*sorted(columns))
+        return queryset
@@ -57,6 +57,7 @@ INSTALLED_APPS = [
     'transactions',
     'fraud_detection',
     'audit',
+    'ledger',
 ]
 
 MIDDLEWARE = [
@@ -215,6 +216,62 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Transaction ID generator
+# Node id (0-255) baked into every transaction ID. Give each host a distinct
+# value; when unset each process uses random bits instead (transactions.ids).
+TRANSACTION_ID_NODE = os.getenv('TRANSACTION_ID_NODE')
+
+# Idempotency-Key settings
+# How long a stored transfer response can be replayed for the same key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24')))
+# How long a claimed key stays locked without a response before a retry may
+# take it over; keep it above the gunicorn worker timeout (30s)
+IDEMPOTENCY_KEY_LEASE = timedelta(seconds=int(os.getenv('IDEMPOTENCY_KEY_LEASE_SECONDS', '60')))
+# How long a duplicate waits for the in-flight request before answering 409
+IDEMPOTENCY_KEY_WAIT = timedelta(seconds=int(os.getenv('IDEMPOTENCY_KEY_WAIT_SECONDS', '5')))
+
+# Cache
+# Local memory by default. Point CACHE_BACKEND/CACHE_LOCATION at a shared
+# cache (e.g. django.core.cache.backends.memcached.PyMemcacheCache and
+# host:port) so every worker sees the same entries and rate limits.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Seconds a serialized account stays cached (banking.cache)
+ACCOUNT_CACHE_TIMEOUT = int(os.getenv('ACCOUNT_CACHE_TIMEOUT', '300'))
+
+# List endpoints with fast_rows serialize values_list() rows with a compiled
+# plan instead of ModelSerializer instances (backend.fastpath)
+FAST_LIST_RENDERING = os.getenv('FAST_LIST_RENDERING', 'True') == 'True'
+
+# Seconds between keepalive comments on an idle transaction event stream
+TRANSACTION_STREAM_HEARTBEAT = int(os.getenv('TRANSACTION_STREAM_HEARTBEAT', '15'))
+
+# Fraud rules (fraud_detection.rules), strongest first. FraudRule rows in
+# the database override enabled/weight/params per rule by name.
+FRAUD_FLAG_THRESHOLD = float(os.getenv('FRAUD_FLAG_THRESHOLD', '0.7'))
+FRAUD_RULES = [
+    {'name': 'large_amount', 'weight': 0.9, 'params': {'threshold': '10000'}},
+    {'name': 'rapid_transfers', 'weight': 0.8, 'params': {'max_count': 5}},
+    {'name': 'unusual_amount', 'weight': 0.7, 'params': {'multiplier': 5}},
+    {'name': 'night_time', 'weight': 0.5, 'params': {'start_hour': 23, 'end_hour': 6}},
+]
+# Seconds the merged rule configuration stays cached
+FRAUD_RULES_CACHE_TIMEOUT = int(os.getenv('FRAUD_RULES_CACHE_TIMEOUT', '300'))
+
+# Isolation Forest model written by train_fraud_model (fraud_detection.anomaly);
+# the default file is git-ignored, point this elsewhere in deployments
+FRAUD_MODEL_PATH = os.getenv('FRAUD_MODEL_PATH', str(BASE_DIR / 'fraud_model.joblib'))
+
+# Deep fraud scoring after commit (fraud_detection.deep): thread, sync or off.
+# SQLite takes one writer at a time, so local development scores inline
+FRAUD_DEEP_SCORING = os.getenv('FRAUD_DEEP_SCORING', 'thread' if os.getenv('DATABASE_URL') else 'sync')
+FRAUD_DEEP_WORKERS = int(os.getenv('FRAUD_DEEP_WORKERS', '2'))
+
 # Swagger Settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -60,4 +60,6 @@ urlpatterns = [
     path('api/banking/', include('banking.urls')),
     path('api/transactions/', include('transactions.urls')),
     path('api/audit/', include('audit.urls')),
+    path('api/ledger/', include('ledger.urls')),
+    path('api/fraud/', include('fraud_detection.urls')),
 ]
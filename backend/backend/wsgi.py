@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Load the fraud model once per worker (fraud_detection.anomaly) rather than on a request
+from fraud_detection.anomaly import get_model  # noqa: E402
+
+get_model()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import BankAccount
+from .models import BalanceBucket, BankAccount
 
 
 @admin.register(BankAccount)
@@ -8,3 +8,10 @@ class BankAccountAdmin(admin.ModelAdmin):
     list_filter = ['account_type', 'is_active', 'created_at']
     search_fields = ['account_number', 'user__email', 'user__username']
     readonly_fields = ['account_number', 'created_at', 'updated_at']
+
+
+@admin.register(BalanceBucket)
+class BalanceBucketAdmin(admin.ModelAdmin):
+    list_display = ['account', 'index', 'balance', 'updated_at']
+    search_fields = ['account__account_number']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,71 @@
+"""
+Balance buckets for hot accounts.
+A hot account's credits are spread over BalanceBucket rows so that many
+concurrent transfers to it lock different rows. The buckets are folded
+back into BankAccount.balance periodically and whenever the account
+needs the money to pay out.
+"""
+
+import random
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import BalanceBucket, BankAccount
+
+
+def credit_bucket(account, amount, now=None):
+    """
+    Credit a random bucket of a hot account in a single UPDATE.
+    Falls back to the main balance if the bucket row does not exist
+    (e.g. the account was unsharded concurrently).
+    """
+    index = random.randrange(account.bucket_count)
+    updated = BalanceBucket.objects.filter(account_id=account.pk, index=index).update(
+        balance=F('balance') + amount
+    )
+    if not updated:
+        BankAccount.objects.filter(pk=account.pk).update(
+            balance=F('balance') + amount,
+            updated_at=now or timezone.now()
+        )
+    return index
+
+
+def fold_buckets(account_id, now=None):
+    """
+    Move everything parked in the account's buckets into its main balance.
+    The caller must hold the account's row lock. Returns the amount moved.
+    """
+    buckets = list(
+        BalanceBucket.objects.select_for_update()
+        .filter(account_id=account_id)
+        .exclude(balance=0)
+        .order_by('index')
+    )
+    total = sum((bucket.balance for bucket in buckets), Decimal('0.00'))
+    if buckets:
+        BalanceBucket.objects.filter(pk__in=[bucket.pk for bucket in buckets]).update(balance=0)
+        BankAccount.objects.filter(pk=account_id).update(
+            balance=F('balance') + total,
+            updated_at=now or timezone.now()
+        )
+    return total
+
+
+def set_bucket_count(account, count):
+    """
+    Shard an account into count buckets, or unshard it with count=0.
+    Existing bucket balances are folded into the main balance first.
+    """
+    with db_transaction.atomic():
+        locked = BankAccount.objects.select_for_update().get(pk=account.pk)
+        fold_buckets(locked.pk)
+        BalanceBucket.objects.filter(account=locked, index__gte=count).delete()
+        existing = set(BalanceBucket.objects.filter(account=locked).values_list('index', flat=True))
+        BalanceBucket.objects.bulk_create([
+            BalanceBucket(account=locked, index=index)
+            for index in range(count) if index not in existing
+        ])
+        BankAccount.objects.filter(pk=locked.pk).update(bucket_count=count)
+    account.bucket_count = count
@@ -0,0 +1,61 @@
+"""
+Cache of the serialized account representation.
+Entries live in Django's default cache, keyed by user, and carry the
+account's conditional GET validators: an entry only counts as a hit while
+it still matches them. Transfers and BankAccount.save drop the affected
+entries once their database transaction commits.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+
+KEY_PREFIX = 'banking:account:'
+HITS_KEY = 'banking:account-cache:hits'
+MISSES_KEY = 'banking:account-cache:misses'
+
+
+def account_cache_key(user_id):
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # First event since the counter was created or evicted
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_cached_account(user_id, version):
+    """Cached representation for the user's account at version, or None"""
+    entry = cache.get(account_cache_key(user_id))
+    if entry is not None and entry[0] == version:
+        _count(HITS_KEY)
+        return entry[1]
+    _count(MISSES_KEY)
+    return None
+
+
+def cache_account(user_id, version, data):
+    cache.set(account_cache_key(user_id), (version, dict(data)), settings.ACCOUNT_CACHE_TIMEOUT)
+
+
+def invalidate_accounts(accounts):
+    """Drop the cached representation of accounts when the current transaction commits"""
+    keys = {account_cache_key(account.user_id) for account in accounts}
+    if keys:
+        db_transaction.on_commit(lambda: cache.delete_many(list(keys)))
+
+
+def cache_stats():
+    """Hit and miss counters (shared by every process using the same cache)"""
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 4) if lookups else None,
+    }
@@ -0,0 +1,32 @@
+"""
+Fold the balance buckets of hot accounts back into their main balance.
+Meant to run periodically (e.g. every minute from cron) so the main row
+stays close to the real balance.
+
+Usage:
+    python manage.py fold_balance_buckets
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, transaction as db_transaction
+from banking.buckets import fold_buckets
+from banking.models import BankAccount
+
+
+class Command(BaseCommand):
+    help = 'Fold balance buckets of hot accounts into their main balance'
+
+    def handle(self, *args, **options):
+        folded = skipped = 0
+        for account_id in BankAccount.objects.filter(bucket_count__gt=0).values_list('id', flat=True):
+            try:
+                with db_transaction.atomic():
+                    # Hold the account lock so a concurrent debit sees a consistent total
+                    list(BankAccount.objects.select_for_update().filter(pk=account_id).values_list('pk', flat=True))
+                    if fold_buckets(account_id):
+                        folded += 1
+            except OperationalError:
+                # Lock timeout or deadlock; the next run picks it up
+                skipped += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Folded buckets of {folded} accounts ({skipped} skipped)'))
@@ -0,0 +1,35 @@
+"""
+Mark an account as hot by splitting its credits over balance buckets.
+A count of 0 folds the buckets back and turns sharding off.
+
+Usage:
+    python manage.py set_balance_buckets ACC123456789 16
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from banking.buckets import set_bucket_count
+from banking.models import BankAccount
+
+MAX_BUCKETS = 256
+
+
+class Command(BaseCommand):
+    help = 'Set the number of balance buckets for an account (0 disables sharding)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('account_number')
+        parser.add_argument('count', type=int)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if not 0 <= count <= MAX_BUCKETS:
+            raise CommandError(f'count must be between 0 and {MAX_BUCKETS}')
+        try:
+            account = BankAccount.objects.get(account_number=options['account_number'])
+        except BankAccount.DoesNotExist:
+            raise CommandError(f"Account {options['account_number']} does not exist")
+
+        set_bucket_count(account, count)
+        self.stdout.write(self.style.SUCCESS(
+            f'{account.account_number} now uses {count} balance buckets'
+        ))
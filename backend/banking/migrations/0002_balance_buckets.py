@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccount',
+            name='bucket_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BalanceBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_buckets', to='banking.bankaccount')),
+            ],
+            options={
+                'verbose_name': 'Balance Bucket',
+                'verbose_name_plural': 'Balance Buckets',
+                'db_table': 'balance_buckets',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='balancebucket',
+            constraint=models.UniqueConstraint(fields=('account', 'index'), name='unique_balance_bucket'),
+        ),
+    ]
@@ -24,6 +24,9 @@ class BankAccount(models.Model):
     account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPE_CHOICES, default='savings')
     balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
     daily_limit = models.DecimalField(max_digits=10, decimal_places=2, default=50000.00)
+    # Hot accounts (high fan-in receivers) take credits into sub-balance
+    # buckets instead of the main row; 0 means the account is not sharded
+    bucket_count = models.PositiveSmallIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -36,11 +39,26 @@ class BankAccount(models.Model):
     def __str__(self):
         return f"{self.account_number} - {self.user.email} (Balance: ${self.balance})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The ledger snapshots balances that saves change (ledger.signals)
+        instance._saved_balance = instance.__dict__.get('balance')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.account_number:
             self.account_number = self.generate_account_number()
         super().save(*args, **kwargs)
 
+    @property
+    def total_balance(self):
+        """Main balance plus credits still parked in balance buckets"""
+        if not self.bucket_count:
+            return self.balance
+        parked = self.balance_buckets.aggregate(total=models.Sum('balance'))['total'] or 0
+        return self.balance + parked
+
     @staticmethod
     def generate_account_number():
         """Generate unique 12-digit account number starting with ACC"""
@@ -48,3 +66,31 @@ class BankAccount(models.Model):
             number = 'ACC' + ''.join(random.choices(string.digits, k=9))
             if not BankAccount.objects.filter(account_number=number).exists():
                 return number
+
+
+class BalanceBucket(models.Model):
+    """
+    Sub-balance of a hot account.
+    Credits land in a random bucket so concurrent transfers to the same
+    account do not serialize on its row; buckets are folded back into
+    BankAccount.balance periodically and whenever the account spends.
+    """
+    account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.CASCADE,
+        related_name='balance_buckets'
+    )
+    index = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'balance_buckets'
+        verbose_name = 'Balance Bucket'
+        verbose_name_plural = 'Balance Buckets'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'index'], name='unique_balance_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.account.account_number} bucket {self.index}: ${self.balance}"
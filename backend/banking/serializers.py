@@ -5,6 +5,8 @@ from .models import BankAccount
 class BankAccountSerializer(serializers.ModelSerializer):
     user_email = serializers.EmailField(source='user.email', read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True)
+    # Includes credits parked in balance buckets for hot accounts
+    balance = serializers.DecimalField(source='total_balance', max_digits=15, decimal_places=2, read_only=True)
 
     class Meta:
         model = BankAccount
@@ -1,11 +1,13 @@
 """
 Django signals for banking app.
-Auto-creates a bank account when a new user is registered.
+Auto-creates a bank account when a new user is registered and keeps the
+account cache in step with saves.
 """
 
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
+from .cache import invalidate_accounts
 from .models import BankAccount
 
 
@@ -27,8 +29,19 @@ def create_bank_account(sender, instance, created, **kwargs):
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def save_bank_account(sender, instance, **kwargs):
     """
-    Save the bank account when user is saved.
-    This ensures the account is always synced with the user.
+    Touch the bank account when user is saved.
+    This ensures the account is always synced with the user. Only
+    updated_at is written: the cached bank_account may be stale, and a
+    full save would write its balance over concurrent transfers.
     """
     if hasattr(instance, 'bank_account'):
-        instance.bank_account.save()
+        instance.bank_account.save(update_fields=['updated_at'])
+
+
+@receiver(post_save, sender=BankAccount)
+def invalidate_cached_account(sender, instance, **kwargs):
+    """
+    Drop the cached account once the save commits.
+    User saves re-save the account above, so username and email changes land here too.
+    """
+    invalidate_accounts([instance])
@@ -1,8 +1,15 @@
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import BankAccount
+from transactions.services import execute_transfer
+from .buckets import set_bucket_count
+from .cache import account_cache_key
+from .models import BalanceBucket, BankAccount
 
 User = get_user_model()
 
@@ -24,6 +31,22 @@ class BankAccountCreationTestCase(TestCase):
         self.assertEqual(user.bank_account.balance, 0.00)
         self.assertEqual(user.bank_account.daily_limit, 50000.00)
 
+    def test_user_save_keeps_concurrent_balance(self):
+        """Test that saving a user does not write back a stale account balance"""
+        user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        user.bank_account  # cached with a zero balance
+        BankAccount.objects.filter(user=user).update(balance=Decimal('75.00'))
+
+        user.first_name = 'Renamed'
+        user.save()
+
+        self.assertEqual(BankAccount.objects.get(user=user).balance, Decimal('75.00'))
+
     def test_account_number_generation(self):
         """Test that account numbers are unique and properly formatted"""
         user = User.objects.create_user(
@@ -56,3 +79,145 @@ class BankAccountAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('account_number', response.data)
         self.assertIn('balance', response.data)
+
+    def test_unchanged_account_is_not_modified(self):
+        """Test that polling an unchanged account gets 304 from one query"""
+        first = self.client.get('/api/banking/account/')
+        self.assertIn('ETag', first)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/banking/account/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(
+            '/api/banking/account/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='Test@1234', role='customer'
+        )
+        BankAccount.objects.filter(user=other).update(balance=Decimal('50.00'))
+        execute_transfer(other.bank_account, self.user.bank_account, Decimal('10.00'))
+        response = self.client.get('/api/banking/account/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['balance'], '10.00')
+
+
+class BalanceBucketTestCase(APITestCase):
+    """Test suite for hot-account balance buckets"""
+
+    def setUp(self):
+        self.payer = User.objects.create_user(
+            username='payer',
+            email='payer@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.merchant = User.objects.create_user(
+            username='merchant',
+            email='merchant@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        BankAccount.objects.filter(pk=self.payer.bank_account.pk).update(balance=Decimal('100.00'))
+        self.hot = BankAccount.objects.get(pk=self.merchant.bank_account.pk)
+        set_bucket_count(self.hot, 4)
+
+    def test_credits_land_in_buckets_and_reads_sum_them(self):
+        """Test that a hot receiver's row is untouched and the API reports the total"""
+        payer_account = BankAccount.objects.get(pk=self.payer.bank_account.pk)
+        for _ in range(3):
+            execute_transfer(payer_account, self.hot, Decimal('10.00'))
+
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.balance, Decimal('0.00'))
+        self.assertEqual(self.hot.total_balance, Decimal('30.00'))
+
+        # Fresh user, as a real request would load it
+        self.client.force_authenticate(user=User.objects.get(pk=self.merchant.pk))
+        response = self.client.get('/api/banking/account/')
+        self.assertEqual(Decimal(response.data['balance']), Decimal('30.00'))
+
+    def test_fold_and_spend_parked_credits(self):
+        """Test that a hot account can spend bucket credits and the fold command drains buckets"""
+        payer_account = BankAccount.objects.get(pk=self.payer.bank_account.pk)
+        execute_transfer(payer_account, self.hot, Decimal('50.00'))
+
+        # The main balance is 0, so the engine has to fold before debiting
+        execute_transfer(self.hot, payer_account, Decimal('20.00'))
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.balance, Decimal('30.00'))
+        self.assertEqual(self.hot.total_balance, Decimal('30.00'))
+
+        execute_transfer(payer_account, self.hot, Decimal('5.00'))
+        call_command('fold_balance_buckets', stdout=StringIO())
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.balance, Decimal('35.00'))
+        self.assertFalse(BalanceBucket.objects.filter(account=self.hot).exclude(balance=0).exists())
+
+
+class AccountCacheTestCase(APITestCase):
+    """Test suite for the cached account representation"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='cached',
+            email='cached@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.other = User.objects.create_user(
+            username='payer',
+            email='payer@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        BankAccount.objects.filter(user=self.other).update(balance=Decimal('100.00'))
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+
+    def test_repeat_reads_skip_serialization(self):
+        """Test that a cached account costs only the validators lookup"""
+        self.client.get('/api/banking/account/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/banking/account/')
+        self.assertEqual(response.data['user_name'], 'cached')
+
+    def test_transfer_commit_invalidates(self):
+        """Test that a committed transfer drops both accounts' entries"""
+        self.client.get('/api/banking/account/')
+        self.assertIsNotNone(cache.get(account_cache_key(self.user.pk)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            execute_transfer(
+                BankAccount.objects.get(user=self.other),
+                BankAccount.objects.get(user=self.user),
+                Decimal('25.00')
+            )
+        self.assertIsNone(cache.get(account_cache_key(self.user.pk)))
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        self.assertEqual(self.client.get('/api/banking/account/').data['balance'], '25.00')
+
+    def test_user_save_invalidates(self):
+        """Test that renaming the user is visible on the next read"""
+        self.client.get('/api/banking/account/')
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        self.assertEqual(self.client.get('/api/banking/account/').data['user_name'], 'renamed')
+
+    def test_hit_ratio(self):
+        """Test that the stats endpoint reports hits and misses to admins only"""
+        for _ in range(4):
+            self.client.get('/api/banking/account/')
+        response = self.client.get('/api/banking/cache-stats/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='Test@1234', role='admin'
+        )
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/api/banking/cache-stats/')
+        self.assertEqual(response.data, {'hits': 3, 'misses': 1, 'hit_ratio': 0.75})
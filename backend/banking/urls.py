@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import AccountDetailView, CreateAccountView
+from .views import AccountCacheStatsView, AccountDetailView, CreateAccountView
 
 app_name = 'banking'
 
 urlpatterns = [
     path('account/', AccountDetailView.as_view(), name='account-detail'),
     path('account/create/', CreateAccountView.as_view(), name='account-create'),
+    path('cache-stats/', AccountCacheStatsView.as_view(), name='cache-stats'),
 ]
@@ -1,18 +1,52 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.utils.decorators import method_decorator
+from transactions.conditional import account_condition, account_validators
+from .cache import cache_account, cache_stats, get_cached_account
 from .models import BankAccount
 from .serializers import BankAccountSerializer
 
 
 class AccountDetailView(generics.RetrieveAPIView):
-    """Get user's bank account details"""
+    """
+    Get user's bank account details.
+    Sends ETag/Last-Modified; unchanged polls get 304 Not Modified, and
+    changed ones are served from the account cache when it is current.
+    """
     serializer_class = BankAccountSerializer
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(account_condition)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_object(self):
         return self.request.user.bank_account
 
+    def retrieve(self, request, *args, **kwargs):
+        version = account_validators(request)[0]
+        data = get_cached_account(request.user.pk, version) if version else None
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            if version:
+                cache_account(request.user.pk, version, data)
+        return Response(data)
+
+
+class AccountCacheStatsView(APIView):
+    """Hit ratio of the account cache (admin only)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response(
+                {'error': 'Only admins can view cache statistics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(cache_stats())
+
 
 class CreateAccountView(generics.CreateAPIView):
     """Create a new bank account for user"""
@@ -1,5 +1,8 @@
+import json
+from django import forms
 from django.contrib import admin
-from .models import FraudAlert
+from .models import AccountFeatures, FraudAlert, FraudRule
+from .rules import params_problem
 
 
 @admin.register(FraudAlert)
@@ -11,3 +14,41 @@ class FraudAlertAdmin(admin.ModelAdmin):
     list_filter = ['severity', 'status', 'created_at']
     search_fields = ['transaction__transaction_id', 'detection_reason']
     readonly_fields = ['created_at', 'reviewed_at']
+
+
+@admin.register(AccountFeatures)
+class AccountFeaturesAdmin(admin.ModelAdmin):
+    list_display = ['account', 'completed_count', 'amount_mean', 'updated_at']
+    search_fields = ['account__account_number']
+    readonly_fields = ['updated_at']
+
+
+class FraudRuleForm(forms.ModelForm):
+    """Rejects params the rule engine would ignore"""
+
+    class Meta:
+        model = FraudRule
+        fields = '__all__'
+
+    def clean_params(self):
+        params = self.cleaned_data['params']
+        if not params:
+            return params
+        try:
+            parsed = json.loads(params)
+        except ValueError:
+            raise forms.ValidationError('Params must be a JSON object')
+        if not isinstance(parsed, dict):
+            raise forms.ValidationError('Params must be a JSON object')
+        problem = params_problem(self.cleaned_data.get('name') or self.instance.name, parsed)
+        if problem:
+            raise forms.ValidationError(problem)
+        return params
+
+
+@admin.register(FraudRule)
+class FraudRuleAdmin(admin.ModelAdmin):
+    form = FraudRuleForm
+    list_display = ['name', 'enabled', 'weight', 'params', 'updated_at']
+    list_filter = ['enabled']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,182 @@
+"""
+Isolation Forest scoring of transfers.
+train_fraud_model fits the model on feature rows replayed from the
+transactions table and saves it with joblib at settings.FRAUD_MODEL_PATH.
+Each worker process loads it once, memory-mapped, on first use (wsgi.py and
+asgi.py warm it at startup). Scores are decision_function values: below 0
+is an outlier, and the lower the more anomalous.
+
+Features describe a transfer against its sender's state just before it,
+the same AccountFeatures values the rule engine reads, so training and
+live scoring see identical inputs.
+"""
+
+import logging
+import os
+import threading
+from collections import namedtuple
+import joblib
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from transactions.models import Transaction
+from .features import RECENT_LIMIT, RECENT_WINDOW, features_for
+from .models import AccountFeatures, epoch_micros
+
+logger = logging.getLogger(__name__)
+
+FEATURE_NAMES = (
+    'log_amount', 'log_amount_vs_mean', 'amount_zscore', 'hour',
+    'recent_sends', 'seconds_since_last_send', 'log_history',
+)
+
+# Bundle saved next to the fitted model; loading refuses any other layout
+FraudModel = namedtuple('FraudModel', 'forest feature_names trained_at rows')
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def raw_row(features, amount, moment):
+    """
+    Raw inputs for one transfer: amount, hour, the sender's amount mean,
+    std and count, sends in the recent window and seconds since the last
+    send (capped at the window).
+    """
+    now = epoch_micros(moment)
+    cutoff = epoch_micros(moment - RECENT_WINDOW)
+    recent = [value for value in features.send_times() if cutoff <= value <= now]
+    window = RECENT_WINDOW.total_seconds()
+    since_last = (now - recent[-1]) / 1e6 if recent else window
+    return (
+        float(amount), moment.hour + moment.minute / 60, features.amount_mean,
+        features.amount_std or 0.0, features.completed_count, len(recent), min(since_last, window),
+    )
+
+
+def feature_matrix(raw):
+    """Model inputs, one row per raw_row() tuple, computed column-wise"""
+    raw = np.asarray(raw, dtype=np.float64).reshape(-1, 7)
+    amounts, hours, means, stds, counts, recent, since_last = raw.T
+    log_amount = np.log1p(amounts)
+    has_history = counts > 0
+    vs_mean = np.where(has_history, log_amount - np.log1p(np.where(has_history, means, 0)), 0.0)
+    spread = stds > 0
+    zscore = np.where(spread, (amounts - means) / np.where(spread, stds, 1), 0.0).clip(-50, 50)
+    return np.column_stack([log_amount, vs_mean, zscore, hours, recent, since_last, np.log1p(counts)])
+
+
+def training_batches(sender_chunk=500, fraction=1.0, seed=0):
+    """
+    Feature matrices of the whole transactions table, one per chunk of
+    senders. Each sender's transfers are replayed in time order through an
+    in-memory AccountFeatures, so a row sees only what came before it.
+    fraction keeps a random share of the rows.
+    """
+    rng = np.random.default_rng(seed)
+    senders = list(
+        Transaction.objects.order_by('sender_account_id')
+        .values_list('sender_account_id', flat=True).distinct()
+    )
+    for start in range(0, len(senders), sender_chunk):
+        rows = (
+            Transaction.objects.filter(sender_account_id__in=senders[start:start + sender_chunk])
+            .order_by('sender_account_id', 'timestamp', 'id')
+            .values_list('sender_account_id', 'amount', 'timestamp', 'status')
+        )
+        states, raw = {}, []
+        for sender_id, amount, moment, status in rows.iterator(chunk_size=2000):
+            state = states.get(sender_id)
+            if state is None:
+                state = states[sender_id] = AccountFeatures(account_id=sender_id)
+            raw.append(raw_row(state, amount, moment))
+            state.add_send(moment, RECENT_WINDOW, RECENT_LIMIT)
+            if status == 'completed':
+                state.add_amount(amount)
+        if not raw:
+            continue
+        matrix = feature_matrix(raw)
+        if fraction < 1:
+            matrix = matrix[rng.random(len(matrix)) < fraction]
+        yield matrix
+
+
+def save_model(forest, rows, path=None):
+    """Write the bundle (uncompressed, so it can be memory-mapped) and swap it in atomically"""
+    path = path or settings.FRAUD_MODEL_PATH
+    bundle = FraudModel(forest, FEATURE_NAMES, timezone.now().isoformat(), rows)
+    joblib.dump(tuple(bundle), f'{path}.tmp')
+    os.replace(f'{path}.tmp', path)
+    reset_model()
+    return path
+
+
+def load_model(path, mmap_mode='r'):
+    bundle = FraudModel(*joblib.load(path, mmap_mode=mmap_mode))
+    if tuple(bundle.feature_names) != FEATURE_NAMES:
+        raise ValueError(f'{path} was trained on different features; retrain it with train_fraud_model')
+    return bundle
+
+
+def get_model():
+    """This process's model, loaded on first call; None when none is trained"""
+    path = settings.FRAUD_MODEL_PATH
+    if path not in _loaded:
+        with _lock:
+            if path not in _loaded:
+                bundle = None
+                if os.path.exists(path):
+                    try:
+                        bundle = load_model(path)
+                    except (OSError, ValueError, TypeError):
+                        logger.exception('Could not load the fraud model from %s', path)
+                _loaded[path] = bundle
+    return _loaded[path]
+
+
+def reset_model():
+    """Forget loaded models; the next get_model() reads the file again"""
+    with _lock:
+        _loaded.clear()
+
+
+def score_matrix(matrix):
+    """decision_function of feature rows in one call, or None without a model"""
+    bundle = get_model()
+    if bundle is None:
+        return None
+    return bundle.forest.decision_function(matrix)
+
+
+def score_transfer(sender_account, amount, now=None, features=None):
+    """Score of one transfer about to be made, or None without a model"""
+    if get_model() is None:
+        return None
+    features = features or features_for(sender_account)
+    scores = score_matrix(feature_matrix([raw_row(features, amount, now or timezone.now())]))
+    return float(scores[0])
+
+
+def score_transfers(transfers):
+    """
+    Scores of many (sender_account_id, amount, moment) transfers against
+    their senders' current features: one features query and one
+    decision_function call. None without a model.
+    """
+    if get_model() is None:
+        return None
+    transfers = list(transfers)
+    states = AccountFeatures.objects.in_bulk({sender_id for sender_id, _, _ in transfers})
+    raw = [
+        raw_row(states.get(sender_id) or AccountFeatures(account_id=sender_id), amount, moment)
+        for sender_id, amount, moment in transfers
+    ]
+    return score_matrix(feature_matrix(raw))
+
+
+def score_transactions(transactions):
+    """Scores of Transaction objects, as score_transfers"""
+    return score_transfers(
+        (transaction_obj.sender_account_id, transaction_obj.amount, transaction_obj.timestamp)
+        for transaction_obj in transactions
+    )
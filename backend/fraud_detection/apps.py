@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FraudDetectionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fraud_detection'
+
+    def ready(self):
+        """Import signals when the app is ready"""
+        import fraud_detection.signals
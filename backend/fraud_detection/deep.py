@@ -0,0 +1,123 @@
+"""
+Out-of-band ("deep") fraud scoring.
+The rule engine screens a transfer inline; anything heavier (the Isolation
+Forest, history features) runs after the transfer commits, so it never adds
+to transfer latency. settings.FRAUD_DEEP_SCORING picks how:
+
+    thread  a small in-process thread pool (FRAUD_DEEP_WORKERS threads)
+    sync    in the committing thread, right after the commit
+    off     not at all
+
+Deep scoring only ever raises a transaction's fraud score. It flags the
+transaction once the score reaches the threshold, and it creates or
+upgrades the FraudAlert of every flagged transaction.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction as db_transaction
+from transactions.models import Transaction
+from .rescore import apply_verdicts, range_columns, score_columns
+
+logger = logging.getLogger(__name__)
+
+# Worker attempts when the database is busy (SQLite takes one writer at a
+# time, so a worker can collide with the request threads)
+WORKER_ATTEMPTS = 5
+
+_lock = threading.Lock()
+_executor = None
+_pending = set()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.FRAUD_DEEP_WORKERS, thread_name_prefix='fraud-deep'
+            )
+        return _executor
+
+
+def schedule_deep_scoring(transactions):
+    """Deep-score completed transactions once the current database transaction commits"""
+    mode = settings.FRAUD_DEEP_SCORING
+    if mode == 'off':
+        return
+    # Keyed like the ledger on the pre-assigned transaction_id: bulk_create
+    # leaves pk unset on backends that cannot return it (SQLite)
+    transaction_ids = [transaction_obj.transaction_id for transaction_obj in transactions]
+
+    def enqueue():
+        # Still inside a transaction (a test running captured callbacks):
+        # another thread could not see the rows yet
+        if mode == 'sync' or connection.in_atomic_block:
+            run_deep_scoring(transaction_ids)
+            return
+        future = get_executor().submit(_score_in_worker, transaction_ids)
+        with _lock:
+            _pending.add(future)
+        future.add_done_callback(_forget)
+
+    db_transaction.on_commit(enqueue)
+
+
+def _forget(future):
+    with _lock:
+        _pending.discard(future)
+
+
+def _score_in_worker(transaction_ids):
+    close_old_connections()
+    try:
+        run_deep_scoring(transaction_ids, attempts=WORKER_ATTEMPTS)
+    finally:
+        close_old_connections()
+
+
+def run_deep_scoring(transaction_ids, attempts=1):
+    """
+    deep_score(), retried with backoff while the database is busy and
+    logging rather than raising: the transfer already succeeded
+    """
+    for attempt in range(attempts):
+        try:
+            return deep_score(transaction_ids)
+        except OperationalError:
+            if attempt + 1 < attempts:
+                time.sleep(0.01 * 2 ** attempt)
+                continue
+            logger.exception('Deep fraud scoring failed for transactions %s', transaction_ids)
+        except Exception:
+            logger.exception('Deep fraud scoring failed for transactions %s', transaction_ids)
+            return None
+
+
+def flush(timeout=None):
+    """Wait for queued deep scoring to finish; returns whether it all did"""
+    with _lock:
+        pending = list(_pending)
+    _, not_done = wait(pending, timeout=timeout)
+    return not not_done
+
+
+def deep_score(transaction_ids):
+    """
+    Score completed transactions (by transaction_id) with the rules and the
+    model over their history, then raise scores, flag and create or upgrade
+    alerts. Returns the number of transactions whose score went up.
+    """
+    rows = list(
+        Transaction.objects.filter(transaction_id__in=transaction_ids, status='completed')
+        .order_by('id')
+        .values_list('id', 'sender_account_id', 'amount', 'timestamp',
+                     'receiver_account_id', 'flagged', 'fraud_score', 'fraud_reason')
+    )
+    if not rows:
+        return 0
+    scores, reasons = score_columns(range_columns(rows, rows[0][0]), len(rows))
+    return apply_verdicts(rows, scores, reasons)['changed']
@@ -0,0 +1,146 @@
+"""
+Per-account fraud feature store.
+The transfer engine hands every new or completed transaction to
+track_transfers() inside its own database transaction, so the senders'
+AccountFeatures rows change under a row lock together with the money and
+a lock conflict retries the whole transfer instead of losing the update.
+Fraud rules then read one row instead of counting and averaging the
+account's history.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction as db_transaction
+from django.db.models import Avg, Count, StdDev
+from django.utils import timezone
+from banking.models import BankAccount
+from transactions.models import Transaction
+from .models import AccountFeatures
+
+# Window of the rapid-transfer rule, and how many send times are kept for it
+RECENT_WINDOW = timedelta(minutes=10)
+RECENT_LIMIT = 32
+
+
+def features_for(account):
+    """The account's features, or an empty (unsaved) row if it has none yet"""
+    features = AccountFeatures.objects.filter(account_id=account.pk).first()
+    return features or AccountFeatures(account_id=account.pk)
+
+
+def track_transfers(transactions, new_rows=True):
+    """
+    Fold transactions into their senders' features, in the caller's database
+    transaction (which must lock the senders first, as the transfer engine
+    does). new_rows=False is for existing rows that just completed: they
+    already count as sends and only add their amount.
+    """
+    updates = [
+        (
+            transaction_obj.sender_account_id,
+            transaction_obj.timestamp if new_rows else None,
+            transaction_obj.amount if transaction_obj.status == 'completed' else None
+        )
+        for transaction_obj in transactions
+    ]
+    apply_updates(updates)
+
+
+def apply_updates(updates):
+    """
+    Apply (account_id, send time or None, completed amount or None) updates.
+    Errors propagate, so the caller's transaction rolls back (and retries)
+    with the transfer it belongs to.
+    """
+    by_account = defaultdict(list)
+    for account_id, sent_at, amount in updates:
+        by_account[account_id].append((sent_at, amount))
+    with db_transaction.atomic(savepoint=False):
+        rows = lock_features(sorted(by_account))
+        for account_id, changes in by_account.items():
+            features = rows[account_id]
+            for sent_at, amount in changes:
+                if sent_at is not None:
+                    features.add_send(sent_at, RECENT_WINDOW, RECENT_LIMIT)
+                if amount is not None:
+                    features.add_amount(amount)
+            features.updated_at = timezone.now()
+        AccountFeatures.objects.bulk_update(
+            rows.values(),
+            ['completed_count', 'amount_mean', 'amount_m2', 'recent_sends', 'updated_at']
+        )
+
+
+def lock_features(account_ids):
+    """Lock (creating where missing) the features rows of account_ids, in pk order"""
+    def locked():
+        return {
+            features.account_id: features
+            for features in AccountFeatures.objects.select_for_update()
+            .filter(account_id__in=account_ids).order_by('account_id')
+        }
+
+    rows = locked()
+    missing = [account_id for account_id in account_ids if account_id not in rows]
+    if missing:
+        AccountFeatures.objects.bulk_create(
+            [AccountFeatures(account_id=account_id) for account_id in missing],
+            ignore_conflicts=True
+        )
+        rows = locked()
+    return rows
+
+
+def rebuild_features(account_ids=None, now=None, batch_size=1000):
+    """
+    Recompute features from the transactions table, for account_ids or all
+    accounts. Returns the number of rows written.
+
+    Accounts are rebuilt batch_size at a time, each batch in its own
+    transaction with the account rows locked (the lock a transfer takes on
+    its sender before updating features), so transfers made during the
+    rebuild are neither missed nor counted twice.
+    """
+    now = now or timezone.now()
+    accounts = BankAccount.objects.order_by('pk')
+    if account_ids is not None:
+        accounts = accounts.filter(pk__in=account_ids)
+    ids = list(accounts.values_list('pk', flat=True))
+
+    written = 0
+    for start in range(0, len(ids), batch_size):
+        written += rebuild_batch(ids[start:start + batch_size], now)
+    return written
+
+
+def rebuild_batch(account_ids, now):
+    """Rebuild features for account_ids under their row locks"""
+    with db_transaction.atomic():
+        # Primary key order, as the transfer engine locks, so neither side deadlocks
+        locked = BankAccount.objects.select_for_update().filter(pk__in=account_ids).order_by('pk')
+        list(locked.values_list('pk', flat=True))
+        completed = Transaction.objects.filter(status='completed', sender_account_id__in=account_ids)
+        recent = Transaction.objects.filter(timestamp__gte=now - RECENT_WINDOW, sender_account_id__in=account_ids)
+
+        rows = {}
+        stats = completed.order_by().values('sender_account_id').annotate(
+            count=Count('id'), mean=Avg('amount'), std=StdDev('amount', sample=True)
+        )
+        for row in stats:
+            count, std = row['count'], row['std'] or 0
+            rows[row['sender_account_id']] = AccountFeatures(
+                account_id=row['sender_account_id'],
+                completed_count=count,
+                amount_mean=float(row['mean']),
+                amount_m2=float(std) ** 2 * (count - 1),
+                updated_at=now
+            )
+        for account_id, sent_at in recent.order_by('sender_account_id', 'timestamp').values_list(
+            'sender_account_id', 'timestamp'
+        ):
+            features = rows.setdefault(account_id, AccountFeatures(account_id=account_id, updated_at=now))
+            features.add_send(sent_at, RECENT_WINDOW, RECENT_LIMIT)
+
+        AccountFeatures.objects.filter(account_id__in=account_ids).delete()
+        AccountFeatures.objects.bulk_create(rows.values())
+    return len(rows)
@@ -0,0 +1,78 @@
+"""
+Transfer latency with and without deep fraud scoring.
+Runs the same sequence of screened transfers under each FRAUD_DEEP_SCORING
+mode and reports latency percentiles: "off" is the inline rules alone,
+"sync" what deep scoring would cost on the request path, and "thread" the
+out-of-band tier as deployed (plus how long its queue takes to drain).
+
+Usage:
+    python manage.py benchmark_fraud_latency --transfers 300
+"""
+
+import random
+import time
+import uuid
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from banking.models import BankAccount
+from fraud_detection import deep
+from fraud_detection.anomaly import get_model
+from fraud_detection.rules import screen_transfer
+from transactions.services import execute_transfer
+
+User = get_user_model()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = 'Compare p50/p95/p99 transfer latency across deep fraud scoring modes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transfers', type=int, default=300, help='Transfers per mode')
+        parser.add_argument('--accounts', type=int, default=10)
+        parser.add_argument('--modes', default='off,sync,thread')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        for i in range(options['accounts']):
+            User.objects.create(username=f'bench_{tag}_{i}', email=f'bench_{tag}_{i}@example.com', role='customer')
+        accounts = BankAccount.objects.filter(user__username__startswith=f'bench_{tag}_')
+        accounts.update(balance=Decimal('100000000.00'), daily_limit=Decimal('99999999.99'))
+        accounts = list(accounts)
+
+        model = 'trained model' if get_model() is not None else 'no model, rules only (run train_fraud_model)'
+        self.stdout.write(f'Database: {connection.vendor}; deep tier: {model}')
+        self.stdout.write(f"{'mode':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'drain ms':>9}")
+        try:
+            for mode in options['modes'].split(','):
+                with override_settings(FRAUD_DEEP_SCORING=mode.strip()):
+                    samples, drain_ms = self.run(accounts, options['transfers'])
+                self.stdout.write(
+                    f'{mode:>7} {percentile(samples, 0.5):>8.2f} {percentile(samples, 0.95):>8.2f} '
+                    f'{percentile(samples, 0.99):>8.2f} {drain_ms:>9.1f}'
+                )
+        finally:
+            User.objects.filter(username__startswith=f'bench_{tag}_').delete()
+
+    def run(self, accounts, transfers):
+        """Latency of each screened transfer, and the time left to drain the deep queue"""
+        rng = random.Random(0)
+        samples = []
+        for _ in range(transfers):
+            sender, receiver = rng.sample(accounts, 2)
+            amount = Decimal(rng.choice(['25.00', '140.00', '900.00', '12500.00']))
+            started = time.perf_counter()
+            verdict = screen_transfer(sender, amount)
+            execute_transfer(sender, receiver, amount, flagged=verdict.flagged,
+                             fraud_score=verdict.score, fraud_reason=verdict.reason)
+            samples.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        deep.flush()
+        return samples, (time.perf_counter() - started) * 1000
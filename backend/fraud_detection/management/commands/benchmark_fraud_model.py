@@ -0,0 +1,83 @@
+"""
+Benchmark the Isolation Forest fraud model.
+Reports model load time (memory-mapped and fully read), the latency of
+scoring one transfer, and the per-row cost of scoring a batch in a single
+decision_function call.
+
+Usage:
+    python manage.py benchmark_fraud_model --batch 5000 --repeat 200
+"""
+
+import os
+import statistics
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from fraud_detection.anomaly import feature_matrix, load_model, raw_row
+from fraud_detection.models import AccountFeatures
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = 'Measure fraud model load time and single and batch scoring latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=None, help='Model file (default: FRAUD_MODEL_PATH)')
+        parser.add_argument('--batch', type=int, default=5000, help='Transfers per batch call')
+        parser.add_argument('--repeat', type=int, default=200, help='Timed single-transfer scores')
+
+    def handle(self, *args, **options):
+        path = options['model'] or settings.FRAUD_MODEL_PATH
+        if not os.path.exists(path):
+            raise CommandError(f'No model at {path}; train one with train_fraud_model')
+
+        self.stdout.write(f'model: {path} ({os.path.getsize(path) / 1e6:.1f} MB)')
+        for mmap_mode, label in (('r', 'load (mmap)'), (None, 'load (read)')):
+            samples = [self.time(lambda: load_model(path, mmap_mode=mmap_mode)) for _ in range(5)]
+            self.stdout.write(f'{label:>14}: {statistics.median(samples):8.2f} ms')
+
+        bundle = load_model(path)
+        self.stdout.write(f'trained {bundle.trained_at} on {bundle.rows} rows')
+        forest = bundle.forest
+
+        # One transfer: feature row and decision_function
+        features = AccountFeatures.objects.first() or AccountFeatures()
+        now = timezone.now()
+
+        def score_one():
+            return forest.decision_function(feature_matrix([raw_row(features, '250.00', now)]))
+
+        score_one()
+        samples = [self.time(score_one) for _ in range(options['repeat'])]
+        self.stdout.write(
+            f'{"single score":>14}: p50 {percentile(samples, 0.5):.2f} ms, '
+            f'p95 {percentile(samples, 0.95):.2f} ms, p99 {percentile(samples, 0.99):.2f} ms'
+        )
+
+        # A batch in one call, over synthetic but plausible raw rows
+        rng = np.random.default_rng(0)
+        size = options['batch']
+        raw = np.column_stack([
+            rng.lognormal(5, 1.5, size), rng.uniform(0, 24, size), rng.lognormal(5, 1, size),
+            rng.lognormal(4, 1, size), rng.integers(0, 500, size), rng.integers(0, 8, size),
+            rng.uniform(0, 600, size),
+        ])
+        batch_samples = [self.time(lambda: forest.decision_function(feature_matrix(raw))) for _ in range(5)]
+        batch_ms = statistics.median(batch_samples)
+        single_ms = percentile(samples, 0.5)
+        self.stdout.write(
+            f'{"batch score":>14}: {size} rows in {batch_ms:.1f} ms '
+            f'({batch_ms * 1000 / size:.1f} us/row, {single_ms * size / batch_ms:.0f}x faster than one call per row)'
+        )
+
+    @staticmethod
+    def time(func):
+        started = time.perf_counter()
+        func()
+        return (time.perf_counter() - started) * 1000
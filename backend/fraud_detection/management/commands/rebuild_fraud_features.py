@@ -0,0 +1,40 @@
+"""
+Rebuild the per-account fraud features from the transactions table.
+Run once after deploying the feature store, and after editing transactions
+outside the transfer engine. Accounts are locked a batch at a time while
+they are rebuilt, so it can run alongside live transfers.
+
+Usage:
+    python manage.py rebuild_fraud_features
+    python manage.py rebuild_fraud_features --account ACC1234567890
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from banking.models import BankAccount
+from fraud_detection.features import rebuild_features
+
+
+class Command(BaseCommand):
+    help = 'Recompute fraud detection features (amount statistics, recent sends) from transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', action='append', dest='accounts', metavar='ACCOUNT_NUMBER',
+                            help='Only rebuild this account (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Accounts locked and rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        account_ids = None
+        if options['accounts']:
+            found = dict(
+                BankAccount.objects.filter(account_number__in=options['accounts'])
+                .values_list('account_number', 'pk')
+            )
+            missing = sorted(set(options['accounts']) - set(found))
+            if missing:
+                raise CommandError(f"Unknown account(s): {', '.join(missing)}")
+            account_ids = list(found.values())
+
+        written = rebuild_features(account_ids, batch_size=options['batch_size'])
+        scope = 'all accounts' if account_ids is None else f'{len(account_ids)} account(s)'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt fraud features for {written} sender(s) ({scope})'))
@@ -0,0 +1,135 @@
+"""
+Re-score completed transactions with the current fraud rules and model.
+Rows are processed in primary key ranges fanned out over a process pool;
+each range raises verdicts (scores never go down, flags are never
+cleared), creates or upgrades FraudAlert rows for flagged transactions and
+corrects monthly flagged counts.
+
+With --checkpoint the range boundary below which everything is done is
+saved after each range, and a later run with the same file resumes there.
+Delete the file to start over.
+
+Usage:
+    python manage.py rescore_transactions --days 90 --workers 4
+    python manage.py rescore_transactions --checkpoint /tmp/rescore.json
+    python manage.py rescore_transactions --dry-run --no-model
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+from django.utils import timezone
+from fraud_detection.rescore import rescore_range
+from transactions.models import Transaction
+
+COUNTERS = ('rows', 'changed', 'flagged', 'alerts')
+
+
+def _init_worker():
+    # Forked workers must not share the parent's database connections
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Re-score historical transactions and create fraud alerts for new hits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Only transactions from the last N days (default: all)')
+        parser.add_argument('--from-id', type=int, default=None)
+        parser.add_argument('--to-id', type=int, default=None, help='Exclusive upper bound')
+        parser.add_argument('--range-size', type=int, default=10000, help='Primary keys per range')
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                            help='Worker processes; 1 runs in this process')
+        parser.add_argument('--checkpoint', default=None, help='JSON file to resume from and update')
+        parser.add_argument('--no-model', action='store_true', help='Rules only, skip the Isolation Forest')
+        parser.add_argument('--dry-run', action='store_true', help='Score without writing anything')
+
+    def handle(self, *args, **options):
+        start_id, end_id, totals = self.bounds(options)
+        if start_id >= end_id:
+            self.stdout.write('Nothing to rescore')
+            return
+        size = options['range_size']
+        ranges = [(low, min(low + size, end_id)) for low in range(start_id, end_id, size)]
+        self.stdout.write(f'Rescoring ids {start_id}..{end_id - 1} in {len(ranges)} ranges')
+
+        started = time.perf_counter()
+        done = {}
+        watermark = start_id
+        for (low, high), result in self.run(ranges, options):
+            for name in COUNTERS:
+                totals[name] += result[name]
+            # Ranges finish out of order; the checkpoint only moves past contiguous ones
+            done[low] = high
+            while watermark in done:
+                watermark = done.pop(watermark)
+            if options['checkpoint'] and not options['dry_run']:
+                self.save_checkpoint(options['checkpoint'], watermark, end_id, totals)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  ids {low}..{high - 1}: {result['rows']} rows, {result['changed']} changed, "
+                f"{result['alerts']} alerts ({totals['rows'] / elapsed:,.0f} rows/s overall)"
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {totals['rows']} transactions in {elapsed:.1f}s "
+            f"({totals['rows'] / elapsed:,.0f} rows/s): {totals['changed']} changed, "
+            f"{totals['flagged']} flagged, {totals['alerts']} alerts created"
+            + (' (dry run, nothing written)' if options['dry_run'] else '')
+        ))
+
+    def bounds(self, options):
+        """(start_id, exclusive end_id, counters so far) from the options or the checkpoint"""
+        path = options['checkpoint']
+        if path and os.path.exists(path):
+            try:
+                with open(path) as checkpoint:
+                    state = json.load(checkpoint)
+                return state['next_id'], state['end_id'], state['totals']
+            except (ValueError, KeyError) as e:
+                raise CommandError(f'Unreadable checkpoint {path}: {e}')
+
+        transactions = Transaction.objects.filter(status='completed')
+        if options['days'] is not None:
+            transactions = transactions.filter(timestamp__gte=timezone.now() - timedelta(days=options['days']))
+        bounds = transactions.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            return 0, 0, {}
+        start_id = max(bounds['first'], options['from_id'] or 0)
+        end_id = bounds['last'] + 1
+        if options['to_id'] is not None:
+            end_id = min(end_id, options['to_id'])
+        return start_id, end_id, dict.fromkeys(COUNTERS, 0)
+
+    def run(self, ranges, options):
+        """Yield ((low, high), result) as ranges complete"""
+        arguments = (not options['no_model'], options['dry_run'])
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            # SQLite takes one writer at a time; parallel ranges would fail with "database is locked"
+            self.stderr.write('SQLite database: rescoring in a single process')
+            options['workers'] = 1
+        if options['workers'] <= 1:
+            for low, high in ranges:
+                yield (low, high), rescore_range(low, high, *arguments)
+            return
+        # Children open their own connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = {pool.submit(rescore_range, low, high, *arguments): (low, high) for low, high in ranges}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    @staticmethod
+    def save_checkpoint(path, next_id, end_id, totals):
+        with open(f'{path}.tmp', 'w') as checkpoint:
+            json.dump({'next_id': next_id, 'end_id': end_id, 'totals': totals}, checkpoint)
+        os.replace(f'{path}.tmp', path)
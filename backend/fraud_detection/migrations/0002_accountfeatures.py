@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0002_balance_buckets'),
+        ('fraud_detection', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountFeatures',
+            fields=[
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fraud_features', serialize=False, to='banking.bankaccount')),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('amount_mean', models.FloatField(default=0)),
+                ('amount_m2', models.FloatField(default=0)),
+                ('recent_sends', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Account Features',
+                'verbose_name_plural': 'Account Features',
+                'db_table': 'fraud_account_features',
+            },
+        ),
+    ]
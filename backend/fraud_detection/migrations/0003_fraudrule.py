@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fraud_detection', '0002_accountfeatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FraudRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('enabled', models.BooleanField(default=True)),
+                ('weight', models.FloatField(blank=True, null=True)),
+                ('params', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'fraud_rules',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -1,6 +1,16 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.db import models
+from banking.models import BankAccount
 from transactions.models import Transaction
 
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def epoch_micros(moment):
+    """Exact integer microseconds since the epoch of an aware datetime"""
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
 
 class FraudAlert(models.Model):
     """
@@ -49,3 +59,101 @@ class FraudAlert(models.Model):
 
     def __str__(self):
         return f"Alert {self.id} - {self.transaction.transaction_id} ({self.severity})"
+
+    @staticmethod
+    def severity_for(score):
+        """Severity of an alert raised with fraud score score"""
+        score = float(score)
+        if score >= 0.9:
+            return 'critical'
+        if score >= 0.8:
+            return 'high'
+        if score >= 0.7:
+            return 'medium'
+        return 'low'
+
+
+class AccountFeatures(models.Model):
+    """
+    Rolling per-account inputs for fraud rules, so evaluating a transfer is
+    a single primary key read instead of scans over the account's history.
+    Maintained by fraud_detection.features; rebuild with rebuild_fraud_features.
+    """
+    account = models.OneToOneField(
+        BankAccount,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fraud_features'
+    )
+    # Running mean and sum of squared deviations (Welford) of completed sent amounts
+    completed_count = models.PositiveIntegerField(default=0)
+    amount_mean = models.FloatField(default=0)
+    amount_m2 = models.FloatField(default=0)
+    # Ring buffer of the latest send times (epoch microseconds, comma separated, oldest first)
+    recent_sends = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'fraud_account_features'
+        verbose_name = 'Account Features'
+        verbose_name_plural = 'Account Features'
+
+    def __str__(self):
+        return f"Features of {self.account_id}"
+
+    def add_amount(self, amount):
+        """Welford update with one completed sent amount"""
+        amount = float(amount)
+        self.completed_count += 1
+        delta = amount - self.amount_mean
+        self.amount_mean += delta / self.completed_count
+        self.amount_m2 += delta * (amount - self.amount_mean)
+
+    @property
+    def amount_variance(self):
+        """Sample variance of completed sent amounts (None below two transfers)"""
+        if self.completed_count < 2:
+            return None
+        return self.amount_m2 / (self.completed_count - 1)
+
+    @property
+    def amount_std(self):
+        variance = self.amount_variance
+        return None if variance is None else math.sqrt(variance)
+
+    def send_times(self):
+        return [int(value) for value in self.recent_sends.split(',') if value]
+
+    def add_send(self, timestamp, window, limit):
+        """Push a send time, dropping entries older than window before its newest entry"""
+        times = self.send_times()
+        times.append(epoch_micros(timestamp))
+        times.sort()
+        cutoff = times[-1] - window // timedelta(microseconds=1)
+        self.recent_sends = ','.join(str(value) for value in times[-limit:] if value >= cutoff)
+
+    def recent_count(self, since):
+        """Sends at or after since; a lower bound once the ring buffer is full"""
+        cutoff = epoch_micros(since)
+        return sum(1 for value in self.send_times() if value >= cutoff)
+
+
+class FraudRule(models.Model):
+    """
+    Database override of a fraud rule declared in settings.FRAUD_RULES.
+    Lets operators retune or switch off a rule without a deploy; blank
+    fields keep the settings value.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    enabled = models.BooleanField(default=True)
+    weight = models.FloatField(null=True, blank=True)
+    # JSON object merged over the rule's settings params (TextField for SQLite compatibility)
+    params = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'fraud_rules'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({'on' if self.enabled else 'off'})"
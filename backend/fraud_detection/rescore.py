@@ -0,0 +1,217 @@
+"""
+Retroactive fraud scoring of completed transactions, one primary key range
+at a time (see the rescore_transactions command).
+Each range costs three reads (its rows, its senders' totals before it and
+their sends in the window before it) and at most three writes; features are
+computed column-wise with numpy and the rules run through their batch twins,
+so the result matches screening each transfer as it was made. Verdicts are
+only ever raised, as by deep scoring (fraud_detection.deep).
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from banking.models import BankAccount
+from ledger.services import adjust_flagged_counts
+from transactions.models import Transaction
+from .anomaly import feature_matrix, get_model
+from .features import RECENT_WINDOW
+from .models import FraudAlert, epoch_micros
+from .rules import evaluate_columns
+
+WINDOW_MICROS = RECENT_WINDOW // timedelta(microseconds=1)
+SCORE_PLACES = Decimal('0.01')
+
+
+def group_starts(keys):
+    """Start index of each run of equal keys in a sorted array, and each element's run"""
+    starts = np.r_[True, keys[1:] != keys[:-1]] if len(keys) else np.zeros(0, bool)
+    return np.flatnonzero(starts), np.cumsum(starts) - 1
+
+
+def exclusive_group_cumsum(values, keys):
+    """Per element, the sum of earlier values with the same key (keys sorted)"""
+    totals = np.cumsum(values) - values
+    starts, runs = group_starts(keys)
+    return totals - totals[starts][runs]
+
+
+def range_columns(rows, start_id):
+    """Rule and model inputs of rows, completed transactions ordered by id"""
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    senders = np.array([row[1] for row in rows], dtype=np.int64)
+    amounts = np.array([float(row[2]) for row in rows])
+    times = np.array([epoch_micros(row[3]) for row in rows], dtype=np.int64)
+    hours = np.array([row[3].hour + row[3].minute / 60 for row in rows])
+
+    # Completed totals before each row: everything before the range, then
+    # the earlier rows of the range
+    unique_senders = np.unique(senders)
+    before = {
+        row['sender_account_id']: row
+        for row in Transaction.objects.filter(
+            sender_account_id__in=unique_senders.tolist(), status='completed', id__lt=start_id
+        ).order_by().values('sender_account_id').annotate(
+            count=Count('id'), total=Sum('amount'), squares=Sum(F('amount') * F('amount'))
+        )
+    }
+    base = np.array([
+        [before[sender]['count'], float(before[sender]['total']), float(before[sender]['squares'])]
+        if sender in before else [0, 0.0, 0.0]
+        for sender in unique_senders.tolist()
+    ]).reshape(-1, 3)[np.searchsorted(unique_senders, senders)]
+    order = np.lexsort((ids, senders))
+    counts, totals, squares = np.empty(len(rows)), np.empty(len(rows)), np.empty(len(rows))
+    counts[order] = base[order, 0] + exclusive_group_cumsum(np.ones(len(rows)), senders[order])
+    totals[order] = base[order, 1] + exclusive_group_cumsum(amounts[order], senders[order])
+    squares[order] = base[order, 2] + exclusive_group_cumsum(amounts[order] ** 2, senders[order])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(counts > 0, totals / counts, 0.0)
+        variances = np.where(counts > 1, (squares - totals * means) / (counts - 1), 0.0)
+    stds = np.sqrt(np.clip(variances, 0, None))
+
+    # Sends (any status) in the window before each row, and the gap to the last one
+    moments = [row[3] for row in rows]
+    sends = (
+        Transaction.objects.filter(
+            sender_account_id__in=unique_senders.tolist(),
+            timestamp__gte=min(moments) - RECENT_WINDOW, timestamp__lte=max(moments)
+        ).order_by('sender_account_id', 'timestamp').values_list('sender_account_id', 'timestamp')
+    )
+    send_senders = np.array([sender for sender, _ in sends], dtype=np.int64)
+    send_times = np.array([epoch_micros(moment) for _, moment in sends], dtype=np.int64)
+    recent = np.zeros(len(rows))
+    since_last = np.full(len(rows), RECENT_WINDOW.total_seconds())
+    for sender in unique_senders:
+        mine = np.flatnonzero(senders == sender)
+        low, high = np.searchsorted(send_senders, [sender, sender + 1])
+        history = send_times[low:high]
+        earlier = np.searchsorted(history, times[mine], side='left')
+        recent[mine] = earlier - np.searchsorted(history, times[mine] - WINDOW_MICROS, side='left')
+        gaps = (times[mine] - history[np.maximum(earlier - 1, 0)]) / 1e6
+        since_last[mine] = np.where(earlier > 0, np.minimum(gaps, since_last[mine]), since_last[mine])
+
+    return {
+        'amount': amounts, 'hour': np.floor(hours), 'fractional_hour': hours,
+        'amount_mean': means, 'amount_std': stds, 'completed_count': counts,
+        'recent_sends': recent, 'seconds_since_last_send': since_last,
+    }
+
+
+def score_columns(columns, size, use_model=True):
+    """(scores, reasons) from the rules and, when trained, the Isolation Forest"""
+    scores, reasons = evaluate_columns(columns, size)
+    bundle = get_model() if use_model else None
+    if bundle is not None:
+        raw = np.column_stack([
+            columns['amount'], columns['fractional_hour'], columns['amount_mean'], columns['amount_std'],
+            columns['completed_count'], columns['recent_sends'], columns['seconds_since_last_send'],
+        ])
+        # The forest's own anomaly score, 0..1; above 0.5 is an outlier
+        anomaly = -(bundle.forest.decision_function(feature_matrix(raw)) + bundle.forest.offset_)
+        for index in np.flatnonzero(anomaly > 0.5):
+            if scores[index] < settings.FRAUD_FLAG_THRESHOLD:
+                scores[index] = max(scores[index], anomaly[index])
+                reason = f"Isolation Forest anomaly (score {anomaly[index]:.2f})"
+                reasons[index] = f'{reasons[index]}; {reason}' if reasons[index] else reason
+    return scores, reasons
+
+
+def rescore_range(start_id, end_id, use_model=True, dry_run=False):
+    """
+    Rescore completed transactions with start_id <= id < end_id and apply
+    the results with apply_verdicts().
+    Returns counts of rows scanned, rows changed, rows flagged and alerts created.
+    """
+    rows = list(
+        Transaction.objects.filter(id__gte=start_id, id__lt=end_id, status='completed')
+        .order_by('id')
+        .values_list('id', 'sender_account_id', 'amount', 'timestamp',
+                     'receiver_account_id', 'flagged', 'fraud_score', 'fraud_reason')
+    )
+    if not rows:
+        return {'rows': 0, 'changed': 0, 'flagged': 0, 'alerts': 0}
+    scores, reasons = score_columns(range_columns(rows, start_id), len(rows), use_model)
+    return apply_verdicts(rows, scores, reasons, dry_run)
+
+
+def apply_verdicts(rows, scores, reasons, dry_run=False):
+    """
+    Write new scores of rows (as loaded by rescore_range), raise-only like
+    every later verdict: a score never goes down and a flag is never
+    cleared, since the earlier verdict may come from rules or a review that
+    still stand. Rows reaching the threshold are flagged, monthly flagged
+    counts and the accounts' conditional GET validators follow, and every
+    flagged row gets its alert created or upgraded.
+    Returns counts of rows, rows changed, rows flagged and alerts created.
+    """
+    threshold = settings.FRAUD_FLAG_THRESHOLD
+    now = timezone.now()
+    changed, flag_changes, hits = [], [], []
+    for row, score, reason in zip(rows, scores.tolist(), reasons):
+        pk, sender_id, _, moment, receiver_id, was_flagged, old_score, old_reason = row
+        transaction_obj = Transaction(
+            pk=pk, sender_account_id=sender_id, receiver_account_id=receiver_id, timestamp=moment,
+            flagged=was_flagged, fraud_score=old_score, fraud_reason=old_reason, updated_at=now
+        )
+        new_score = Decimal(str(score)).quantize(SCORE_PLACES)
+        if old_score is None or new_score > old_score:
+            transaction_obj.fraud_score = new_score
+            transaction_obj.fraud_reason = reason
+            transaction_obj.flagged = was_flagged or score >= threshold
+            changed.append(transaction_obj)
+            if transaction_obj.flagged and not was_flagged:
+                flag_changes.append((transaction_obj, 1))
+        if transaction_obj.flagged:
+            # Flagged rows get an alert if they have none yet, changed or not
+            hits.append(transaction_obj)
+    result = {'rows': len(rows), 'changed': len(changed), 'flagged': len(hits), 'alerts': 0}
+    if dry_run or not (changed or hits):
+        return result
+
+    with db_transaction.atomic():
+        Transaction.objects.bulk_update(
+            changed, ['flagged', 'fraud_score', 'fraud_reason', 'updated_at'], batch_size=1000
+        )
+        adjust_flagged_counts(flag_changes)
+        if flag_changes:
+            BankAccount.objects.filter(pk__in={
+                account_id for transaction_obj, _ in flag_changes
+                for account_id in (transaction_obj.sender_account_id, transaction_obj.receiver_account_id)
+            }).update(updated_at=now)
+        result['alerts'] = upsert_alerts(hits)
+    return result
+
+
+def upsert_alerts(transactions):
+    """
+    Create the alerts flagged transactions lack and raise the score and
+    severity of the rest. Returns the number created.
+    """
+    alerts = {
+        alert.transaction_id: alert
+        for alert in FraudAlert.objects.select_for_update()
+        .filter(transaction_id__in=[transaction_obj.pk for transaction_obj in transactions])
+    }
+    created, upgraded = [], []
+    for transaction_obj in transactions:
+        alert = alerts.get(transaction_obj.pk)
+        if alert is None:
+            created.append(FraudAlert(
+                transaction_id=transaction_obj.pk,
+                severity=FraudAlert.severity_for(transaction_obj.fraud_score),
+                detection_reason=transaction_obj.fraud_reason,
+                fraud_score=transaction_obj.fraud_score
+            ))
+        elif transaction_obj.fraud_score > alert.fraud_score:
+            alert.fraud_score = transaction_obj.fraud_score
+            alert.severity = FraudAlert.severity_for(transaction_obj.fraud_score)
+            alert.detection_reason = transaction_obj.fraud_reason
+            upgraded.append(alert)
+    FraudAlert.objects.bulk_create(created, batch_size=1000, ignore_conflicts=True)
+    FraudAlert.objects.bulk_update(upgraded, ['fraud_score', 'severity', 'detection_reason'], batch_size=1000)
+    return len(created)
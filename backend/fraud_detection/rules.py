@@ -0,0 +1,301 @@
+"""
+Fraud rule engine.
+Rules are plain functions registered by name; which ones run, their weights
+and their parameters are data: settings.FRAUD_RULES, overridden per rule by
+FraudRule rows. The merged configuration is cached and dropped whenever a
+FraudRule changes.
+
+Rules run in descending weight order and stop once the score reaches
+settings.FRAUD_FLAG_THRESHOLD; since the score is the highest weight that
+fired, skipping the rest never changes it. Each rule's run time goes into
+an in-process latency histogram (rule_timings) and into the Verdict, which
+the transfer views report in a Server-Timing header.
+"""
+
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from .features import RECENT_LIMIT, RECENT_WINDOW, features_for
+from .models import FraudRule
+
+logger = logging.getLogger(__name__)
+
+RULES_CACHE_KEY = 'fraud:rules'
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50)
+
+RULES = {}
+BATCH_RULES = {}
+
+ActiveRule = namedtuple('ActiveRule', 'name weight params')
+Verdict = namedtuple('Verdict', 'flagged score reason duration_ms rule_ms')
+
+
+def rule(name):
+    """Register a rule: func(check, **params) returns a reason when it fires, else None"""
+    def register(func):
+        RULES[name] = func
+        return func
+    return register
+
+
+def batch_rule(name):
+    """
+    Register the column-wise twin of rule name, for rescoring history:
+    func(columns, **params) returns (fired mask, reason), where reason is a
+    string or a function of the row index.
+    """
+    def register(func):
+        BATCH_RULES[name] = func
+        return func
+    return register
+
+
+class Check:
+    """
+    A transfer being screened.
+    counted_send is the timestamp of a send already in the feature store
+    (a pending transfer being settled), which must not count against itself;
+    earlier_legs counts the legs screened before this one in the same batch,
+    which can share one features row. Otherwise it is read on first use.
+    """
+
+    def __init__(self, sender_account, amount, now=None, counted_send=None, earlier_legs=0, features=None):
+        self.sender_account = sender_account
+        self.amount = amount
+        self.now = now or timezone.now()
+        self.counted_send = counted_send
+        self.earlier_legs = earlier_legs
+        self._features = features
+
+    @property
+    def features(self):
+        if self._features is None:
+            self._features = features_for(self.sender_account)
+        return self._features
+
+
+@rule('large_amount')
+def large_amount(check, threshold):
+    threshold = Decimal(str(threshold))
+    if check.amount > threshold:
+        return f"Transaction amount exceeds ${threshold:,}"
+
+
+@rule('rapid_transfers')
+def rapid_transfers(check, max_count):
+    since = check.now - RECENT_WINDOW
+    recent_count = check.features.recent_count(since) + check.earlier_legs
+    if check.counted_send is not None and check.counted_send >= since:
+        recent_count -= 1
+    if recent_count > max_count:
+        return f"Multiple transactions in short time ({recent_count} in 10 min)"
+
+
+@rule('unusual_amount')
+def unusual_amount(check, multiplier):
+    features = check.features
+    if features.completed_count and float(check.amount) > features.amount_mean * multiplier:
+        return f"Transaction amount {multiplier}x higher than user's average"
+
+
+@rule('night_time')
+def night_time(check, start_hour, end_hour):
+    hour = check.now.hour
+    if hour >= start_hour or hour < end_hour:
+        return "Transaction during unusual hours"
+
+
+# Column-wise twins of the rules above. columns holds numpy arrays: amount,
+# hour, amount_mean, completed_count and recent_sends (sends in the window
+# before each transfer).
+
+@batch_rule('large_amount')
+def large_amount_batch(columns, threshold):
+    threshold = Decimal(str(threshold))
+    return columns['amount'] > float(threshold), f"Transaction amount exceeds ${threshold:,}"
+
+
+@batch_rule('rapid_transfers')
+def rapid_transfers_batch(columns, max_count):
+    recent = columns['recent_sends']
+    return recent > max_count, lambda i: f"Multiple transactions in short time ({int(recent[i])} in 10 min)"
+
+
+@batch_rule('unusual_amount')
+def unusual_amount_batch(columns, multiplier):
+    fired = (columns['completed_count'] > 0) & (columns['amount'] > columns['amount_mean'] * multiplier)
+    return fired, f"Transaction amount {multiplier}x higher than user's average"
+
+
+@batch_rule('night_time')
+def night_time_batch(columns, start_hour, end_hour):
+    hour = columns['hour']
+    return (hour >= start_hour) | (hour < end_hour), "Transaction during unusual hours"
+
+
+def params_problem(name, params):
+    """Why params cannot work for rule name, or None if they can"""
+    if name == 'rapid_transfers':
+        try:
+            max_count = int(params.get('max_count', 0))
+        except (TypeError, ValueError):
+            return 'rapid_transfers max_count must be a whole number'
+        # The feature store keeps the latest RECENT_LIMIT sends, so a count
+        # at or above it could never be exceeded
+        if max_count >= RECENT_LIMIT:
+            return f'rapid_transfers max_count must be below {RECENT_LIMIT}, the number of recent sends kept'
+    return None
+
+
+def load_rules():
+    """Merge settings.FRAUD_RULES with FraudRule overrides, highest weight first"""
+    overrides = {override.name: override for override in FraudRule.objects.all()}
+    active = []
+    for declared in settings.FRAUD_RULES:
+        name = declared['name']
+        if name not in RULES:
+            raise ImproperlyConfigured(f"FRAUD_RULES: unknown fraud rule '{name}'")
+        weight = declared['weight']
+        params = dict(declared.get('params', {}))
+        problem = params_problem(name, params)
+        if problem:
+            raise ImproperlyConfigured(f'FRAUD_RULES: {problem}')
+        enabled = declared.get('enabled', True)
+        override = overrides.pop(name, None)
+        if override is not None:
+            enabled = override.enabled
+            if override.weight is not None:
+                weight = override.weight
+            if override.params:
+                try:
+                    overridden = {**params, **json.loads(override.params)}
+                except (TypeError, ValueError):
+                    logger.error('Ignoring invalid params of fraud rule override %s', name)
+                else:
+                    problem = params_problem(name, overridden)
+                    if problem:
+                        logger.error('Ignoring params of fraud rule override %s: %s', name, problem)
+                    else:
+                        params = overridden
+        if enabled:
+            active.append(ActiveRule(name, weight, params))
+    for name in overrides:
+        logger.warning('Fraud rule override %s matches no rule in FRAUD_RULES', name)
+    return sorted(active, key=lambda active_rule: -active_rule.weight)
+
+
+def active_rules():
+    rules = cache.get(RULES_CACHE_KEY)
+    if rules is None:
+        rules = load_rules()
+        cache.set(RULES_CACHE_KEY, rules, settings.FRAUD_RULES_CACHE_TIMEOUT)
+    return rules
+
+
+def clear_rules_cache():
+    cache.delete(RULES_CACHE_KEY)
+
+
+class RuleTimings:
+    """Per-rule latency histograms of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = {}
+
+    def record(self, name, ms):
+        with self._lock:
+            entry = self._rules.get(name)
+            if entry is None:
+                entry = self._rules[name] = {'count': 0, 'total_ms': 0.0, 'buckets': [0] * (len(BUCKETS_MS) + 1)}
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['buckets'][bisect_left(BUCKETS_MS, ms)] += 1
+
+    def snapshot(self):
+        """{rule: {count, mean_ms, buckets: {"<=0.05": n, ..., "+Inf": n}}}"""
+        labels = [f'<={bound:g}' for bound in BUCKETS_MS] + ['+Inf']
+        with self._lock:
+            return {
+                name: {
+                    'count': entry['count'],
+                    'mean_ms': round(entry['total_ms'] / entry['count'], 4),
+                    'buckets': dict(zip(labels, entry['buckets'])),
+                }
+                for name, entry in self._rules.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._rules.clear()
+
+
+rule_timings = RuleTimings()
+
+
+def evaluate(check):
+    """Run the active rules against check and return a Verdict"""
+    threshold = settings.FRAUD_FLAG_THRESHOLD
+    started = time.perf_counter()
+    score, reasons, rule_ms = 0.0, [], {}
+    for active_rule in active_rules():
+        rule_started = time.perf_counter()
+        reason = RULES[active_rule.name](check, **active_rule.params)
+        ms = (time.perf_counter() - rule_started) * 1000
+        rule_ms[active_rule.name] = ms
+        rule_timings.record(active_rule.name, ms)
+        if reason:
+            score = max(score, active_rule.weight)
+            reasons.append(reason)
+            if score >= threshold:
+                break
+    duration_ms = (time.perf_counter() - started) * 1000
+    return Verdict(score >= threshold, score, '; '.join(reasons) or None, duration_ms, rule_ms)
+
+
+def evaluate_columns(columns, size):
+    """
+    evaluate() for size transfers at once: (scores, reasons) with the same
+    short-circuit per row, so the results match screening one by one.
+    """
+    threshold = settings.FRAUD_FLAG_THRESHOLD
+    scores = np.zeros(size)
+    reasons = [[] for _ in range(size)]
+    for active_rule in active_rules():
+        still_open = scores < threshold
+        if not still_open.any():
+            break
+        fired, reason = BATCH_RULES[active_rule.name](columns, **active_rule.params)
+        hits = np.flatnonzero(fired & still_open)
+        scores[hits] = np.maximum(scores[hits], active_rule.weight)
+        for index in hits:
+            reasons[index].append(reason(index) if callable(reason) else reason)
+    return scores, ['; '.join(row) or None for row in reasons]
+
+
+def screen_transfer(sender_account, amount, **kwargs):
+    """Verdict for a transfer of amount from sender_account; kwargs as for Check"""
+    return evaluate(Check(sender_account, amount, **kwargs))
+
+
+def server_timing(verdicts):
+    """Server-Timing header value with the fraud engine's share of a request"""
+    total, per_rule = 0.0, {}
+    for verdict in verdicts:
+        total += verdict.duration_ms
+        for name, ms in verdict.rule_ms.items():
+            per_rule[name] = per_rule.get(name, 0.0) + ms
+    metrics = [f'fraud;dur={total:.3f};desc="Fraud rules"']
+    metrics += [f'fraud-{name};dur={ms:.3f}' for name, ms in per_rule.items()]
+    return ', '.join(metrics)
@@ -0,0 +1,16 @@
+"""
+Django signals for fraud_detection app.
+Drops the cached rule configuration when a FraudRule override changes.
+"""
+
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import FraudRule
+from .rules import clear_rules_cache
+
+
+@receiver(post_save, sender=FraudRule)
+@receiver(post_delete, sender=FraudRule)
+def reload_fraud_rules(sender, instance, **kwargs):
+    db_transaction.on_commit(clear_rules_cache)
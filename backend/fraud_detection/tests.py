@@ -1,8 +1,34 @@
-from django.test import TestCase
+from io import StringIO
+import json
+import math
+import os
+import tempfile
+from unittest import mock
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models import Avg
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
 from banking.models import BankAccount
+from ledger.services import monthly_summary
 from transactions.models import Transaction
+from transactions.services import (
+    execute_batch_transfer, execute_transfer, process_pending_transfers, submit_transfer
+)
+from . import anomaly, deep, features
 from .detector import FraudDetector
+from .features import RECENT_LIMIT, RECENT_WINDOW, features_for
+from .models import AccountFeatures, FraudAlert, FraudRule
+from .rescore import range_columns
+from .admin import FraudRuleForm
+from .rules import active_rules, evaluate_columns, load_rules, rule_timings, screen_transfer
 from decimal import Decimal
 
 User = get_user_model()
@@ -55,3 +81,453 @@ class FraudDetectionTestCase(TestCase):
         is_flagged, fraud_score, reason = detector.analyze()
 
         self.assertFalse(is_flagged)
+
+
+class AccountFeaturesTestCase(TestCase):
+    """The feature store must agree with the queries it replaces"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        self.sender.balance = Decimal('50000.00')
+        self.sender.save()
+        self.receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='Test@1234', role='customer'
+        ).bank_account
+
+    def make_transfers(self):
+        # Features change in the transfers' own transactions, no commit hooks needed
+        for amount in ('120.50', '75.25', '980.00'):
+            execute_transfer(self.sender, self.receiver, Decimal(amount))
+        execute_batch_transfer(self.sender, [
+            {'receiver_account': self.receiver.account_number, 'amount': Decimal('10.10')},
+            {'receiver_account': self.receiver.account_number, 'amount': Decimal('4999.99')},
+        ])
+        submit_transfer(self.sender, self.receiver, Decimal('333.33'))
+        submit_transfer(self.sender, self.receiver, Decimal('99999.00'))  # fails: balance
+        process_pending_transfers()
+
+    def assert_matches_queries(self, features):
+        completed = Transaction.objects.filter(sender_account=self.sender, status='completed')
+        since = timezone.now() - RECENT_WINDOW
+        self.assertEqual(
+            features.recent_count(since),
+            Transaction.objects.filter(sender_account=self.sender, timestamp__gte=since).count()
+        )
+        self.assertEqual(features.completed_count, completed.count())
+        average = completed.aggregate(Avg('amount'))['amount__avg']
+        self.assertTrue(math.isclose(features.amount_mean, float(average), rel_tol=1e-9))
+        amounts = [float(amount) for amount in completed.values_list('amount', flat=True)]
+        variance = sum((amount - features.amount_mean) ** 2 for amount in amounts) / (len(amounts) - 1)
+        self.assertTrue(math.isclose(features.amount_variance, variance, rel_tol=1e-9))
+
+    def test_incremental_updates_match_queries(self):
+        self.make_transfers()
+        self.assert_matches_queries(features_for(self.sender))
+
+    def test_rebuild_matches_incremental_updates(self):
+        self.make_transfers()
+        incremental = features_for(self.sender)
+        AccountFeatures.objects.all().delete()
+        call_command('rebuild_fraud_features', stdout=StringIO())
+        rebuilt = features_for(self.sender)
+        self.assertEqual(rebuilt.send_times(), incremental.send_times())
+        self.assertEqual(rebuilt.completed_count, incremental.completed_count)
+        self.assertTrue(math.isclose(rebuilt.amount_mean, incremental.amount_mean, rel_tol=1e-9))
+        self.assertTrue(math.isclose(rebuilt.amount_m2, incremental.amount_m2, rel_tol=1e-9))
+        self.assert_matches_queries(rebuilt)
+
+    def test_old_sends_leave_the_window(self):
+        features = AccountFeatures(account=self.sender)
+        now = timezone.now()
+        for minutes in (30, 12, 9, 1):
+            features.add_send(now - timedelta(minutes=minutes), RECENT_WINDOW, 32)
+        self.assertEqual(len(features.send_times()), 2)
+        self.assertEqual(features.recent_count(now - RECENT_WINDOW), 2)
+
+    def test_detector_reads_one_row(self):
+        self.make_transfers()
+        active_rules()  # rule configuration comes from the cache
+        transaction = Transaction(sender_account=self.sender, receiver_account=self.receiver,
+                                  amount=Decimal('9000.00'))
+        with self.assertNumQueries(1):
+            is_flagged, fraud_score, reason = FraudDetector(transaction).analyze()
+        # Seven sends in the last 10 minutes
+        self.assertTrue(is_flagged)
+        self.assertEqual(fraud_score, 0.8)
+        self.assertIn('Multiple transactions', reason)
+
+
+class AccountFeaturesRetryTestCase(TransactionTestCase):
+    """A lock conflict on the features row retries the transfer, losing nothing"""
+
+    def test_database_error_retries_with_transfer(self):
+        sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        sender.balance = Decimal('1000.00')
+        sender.save()
+        receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        real = features.lock_features
+        calls = []
+
+        def locked_once(account_ids):
+            calls.append(account_ids)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return real(account_ids)
+
+        with mock.patch.object(features, 'lock_features', side_effect=locked_once):
+            execute_transfer(sender, receiver, Decimal('250.00'))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Transaction.objects.count(), 1)
+        stored = features_for(sender)
+        self.assertEqual((stored.completed_count, stored.amount_mean), (1, 250.0))
+        self.assertEqual(len(stored.send_times()), 1)
+
+
+class FraudRuleEngineTestCase(APITestCase):
+    """Test suite for the configurable rule engine"""
+
+    def setUp(self):
+        cache.clear()  # reset rate limit counters and the rule configuration
+        rule_timings.reset()
+        self.user = User.objects.create_user(
+            username='sender', email='sender@example.com', password='Test@1234', role='customer'
+        )
+        self.sender = self.user.bank_account
+        self.sender.balance = Decimal('50000.00')
+        self.sender.save()
+        self.receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='Test@1234', role='admin'
+        )
+        AccountFeatures.objects.create(account=self.sender, completed_count=4, amount_mean=100.0)
+        self.noon = timezone.now().replace(hour=12)
+
+    def test_flag_threshold_short_circuits(self):
+        active_rules()
+        with self.assertNumQueries(0):
+            verdict = screen_transfer(self.sender, Decimal('15000.00'), now=self.noon)
+        # The strongest rule fired first; the others never ran
+        self.assertTrue(verdict.flagged)
+        self.assertEqual(verdict.score, 0.9)
+        self.assertEqual(list(verdict.rule_ms), ['large_amount'])
+        self.assertIn('10,000', verdict.reason)
+
+    def test_unusual_amount_and_night_time_rules_run(self):
+        verdict = screen_transfer(self.sender, Decimal('600.00'), now=self.noon)
+        self.assertTrue(verdict.flagged)
+        self.assertIn('5x', verdict.reason)
+
+        verdict = screen_transfer(self.sender, Decimal('50.00'), now=self.noon.replace(hour=3))
+        self.assertFalse(verdict.flagged)
+        self.assertEqual(verdict.score, 0.5)
+        self.assertEqual(set(verdict.rule_ms), {'large_amount', 'rapid_transfers', 'unusual_amount', 'night_time'})
+
+    def test_table_override_reloads_rules(self):
+        self.assertFalse(screen_transfer(self.sender, Decimal('450.00'), now=self.noon).flagged)
+        self.assertTrue(screen_transfer(self.sender, Decimal('800.00'), now=self.noon).flagged)
+        with self.captureOnCommitCallbacks(execute=True):
+            FraudRule.objects.create(name='unusual_amount', params='{"multiplier": 10}')
+        self.assertFalse(screen_transfer(self.sender, Decimal('800.00'), now=self.noon).flagged)
+        with self.captureOnCommitCallbacks(execute=True):
+            override = FraudRule.objects.get(name='unusual_amount')
+            override.enabled = False
+            override.save()
+        self.assertNotIn('unusual_amount', [active_rule.name for active_rule in active_rules()])
+
+    def test_velocity_limit_beyond_kept_sends_rejected(self):
+        rapid = [dict(declared) for declared in settings.FRAUD_RULES]
+        for declared in rapid:
+            if declared['name'] == 'rapid_transfers':
+                declared['params'] = {'max_count': RECENT_LIMIT}
+        with override_settings(FRAUD_RULES=rapid), self.assertRaises(ImproperlyConfigured):
+            load_rules()
+
+        # A table override that could never fire is ignored, the admin refuses it
+        FraudRule.objects.create(name='rapid_transfers', params=json.dumps({'max_count': 40}))
+        with self.assertLogs('fraud_detection.rules', 'ERROR'):
+            params = {active_rule.name: active_rule.params for active_rule in load_rules()}
+        self.assertEqual(params['rapid_transfers'], {'max_count': 5})
+        form = FraudRuleForm(data={'name': 'rapid_transfers', 'enabled': True, 'params': '{"max_count": 40}'})
+        self.assertIn('params', form.errors)
+        form = FraudRuleForm(data={'name': 'rapid_transfers', 'enabled': True, 'params': '{"max_count": 20}'},
+                             instance=FraudRule.objects.get())
+        self.assertTrue(form.is_valid())
+
+    def test_transfer_reports_fraud_timing(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        response = self.client.post('/api/transactions/transfer/', {
+            'receiver_account': self.receiver.account_number, 'amount': '15000.00'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['flagged'])
+        self.assertRegex(response['Server-Timing'], r'^fraud;dur=[0-9.]+;desc="Fraud rules", fraud-large_amount;dur=')
+        self.assertEqual(rule_timings.snapshot()['large_amount']['count'], 1)
+
+    def test_rules_endpoint_admin_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/fraud/rules/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        screen_transfer(self.sender, Decimal('50.00'), now=self.noon)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/fraud/rules/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rules = {entry['name']: entry for entry in response.data['rules']}
+        self.assertEqual(rules['large_amount']['weight'], 0.9)
+        self.assertEqual(rules['rapid_transfers']['timings']['count'], 1)
+
+
+class FraudModelTestCase(TestCase):
+    """Test suite for Isolation Forest training and scoring"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        self.receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        Transaction.objects.bulk_create([
+            Transaction(
+                transaction_id=Transaction.generate_transaction_id(),
+                sender_account=(self.sender, self.receiver)[i % 2],
+                receiver_account=(self.receiver, self.sender)[i % 2],
+                amount=Decimal(100 + i % 50),
+                status='completed'
+            )
+            for i in range(300)
+        ])
+        call_command('rebuild_fraud_features', stdout=StringIO())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'fraud_model.joblib')
+        settings_override = override_settings(FRAUD_MODEL_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(anomaly.reset_model)
+        anomaly.reset_model()
+
+    def test_no_model_scores_none(self):
+        self.assertIsNone(anomaly.score_transfer(self.sender, Decimal('100.00')))
+        self.assertIsNone(anomaly.score_transactions(Transaction.objects.all()[:5]))
+
+    def test_train_and_score(self):
+        call_command('train_fraud_model', '--estimators', '20', stdout=StringIO())
+        bundle = anomaly.get_model()
+        self.assertEqual(bundle.rows, 300)
+        self.assertIs(anomaly.get_model(), bundle)  # loaded once per process
+
+        usual = anomaly.score_transfer(self.sender, Decimal('120.00'))
+        unusual = anomaly.score_transfer(self.sender, Decimal('90000.00'))
+        self.assertLess(unusual, usual)
+        self.assertLess(unusual, 0)
+
+    def test_batch_scores_in_one_call(self):
+        call_command('train_fraud_model', '--estimators', '20', stdout=StringIO())
+        transactions = list(Transaction.objects.filter(sender_account=self.sender)[:50])
+        forest = anomaly.get_model().forest
+        with mock.patch.object(forest, 'decision_function', wraps=forest.decision_function) as decision:
+            with self.assertNumQueries(1):
+                scores = anomaly.score_transactions(transactions)
+        self.assertEqual(decision.call_count, 1)
+        self.assertEqual(len(scores), 50)
+
+        single = anomaly.score_transfer(self.sender, transactions[0].amount, now=transactions[0].timestamp)
+        self.assertAlmostEqual(scores[0], single)
+
+
+class RescoreTestCase(TestCase):
+    """Test suite for retroactive re-scoring"""
+
+    def setUp(self):
+        cache.clear()
+        self.sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        self.sender.balance = Decimal('100000.00')
+        self.sender.save()
+        self.receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        # Made before the rules were wired in: nothing is flagged
+        noon = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        moments = [noon + timedelta(minutes=minute) for minute in (0, 1, 2, 3, 4, 5, 6, 30, 31)]
+        moments.append(noon.replace(hour=3))
+        amounts = ['100.00', '120.00', '80.00', '90.00', '110.00', '100.00', '95.00', '2500.00', '15000.00', '60.00']
+        for moment, amount in zip(moments, amounts):
+            transaction_obj = execute_transfer(self.sender, self.receiver, Decimal(amount))
+            Transaction.objects.filter(pk=transaction_obj.pk).update(timestamp=moment)
+        self.rows = list(
+            Transaction.objects.order_by('id').values_list(
+                'id', 'sender_account_id', 'amount', 'timestamp',
+                'receiver_account_id', 'flagged', 'fraud_score', 'fraud_reason'
+            )
+        )
+
+    def test_batch_rules_match_screening_each_transfer(self):
+        start_id = self.rows[3][0]
+        columns = range_columns(self.rows[3:], start_id)
+        scores, reasons = evaluate_columns(columns, len(self.rows) - 3)
+
+        # Replay: screen each transfer against the features it would have seen
+        positions = {row[0]: position for position, row in enumerate(self.rows[3:])}
+        state = AccountFeatures(account=self.sender)
+        for pk, _, amount, moment, *_ in sorted(self.rows, key=lambda row: row[3]):
+            if pk in positions:
+                verdict = screen_transfer(self.sender, amount, now=moment, features=state)
+                position = positions[pk]
+                self.assertEqual(verdict.score, scores[position])
+                self.assertEqual(verdict.reason, reasons[position])
+            state.add_send(moment, RECENT_WINDOW, RECENT_LIMIT)
+            state.add_amount(amount)
+
+    def test_rescore_flags_alerts_and_checkpoints(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        checkpoint = os.path.join(directory.name, 'rescore.json')
+        options = ['--workers', '1', '--no-model', '--range-size', '3', '--checkpoint', checkpoint]
+        call_command('rescore_transactions', *options, stdout=StringIO())
+
+        flagged = Transaction.objects.filter(flagged=True)
+        # The seventh send within 10 minutes (rapid), 2500.00 (25x the average), 15000.00 (large)
+        self.assertEqual(sorted(flagged.values_list('amount', flat=True)),
+                         [Decimal('95.00'), Decimal('2500.00'), Decimal('15000.00')])
+        self.assertEqual(FraudAlert.objects.count(), 3)
+        alert = FraudAlert.objects.get(transaction__amount=Decimal('15000.00'))
+        self.assertEqual(alert.severity, 'critical')
+        self.assertIn('10,000', alert.detection_reason)
+        night = Transaction.objects.get(amount=Decimal('60.00'))
+        self.assertFalse(night.flagged)
+        self.assertEqual(night.fraud_score, Decimal('0.50'))
+
+        # Monthly rollups follow the new flags
+        for account in (self.sender, self.receiver):
+            self.assertEqual(sum(row['flagged_count'] for row in monthly_summary(account)), 3)
+
+        # Done ranges are not redone
+        with open(checkpoint) as saved:
+            self.assertEqual(json.load(saved)['next_id'], self.rows[-1][0] + 1)
+        output = StringIO()
+        call_command('rescore_transactions', *options, stdout=output)
+        self.assertIn('Nothing to rescore', output.getvalue())
+
+    def test_rescore_only_raises_verdicts(self):
+        small = Transaction.objects.get(amount=Decimal('120.00'))
+        Transaction.objects.filter(pk=small.pk).update(
+            flagged=True, fraud_score=Decimal('0.95'), fraud_reason='Reported by the receiver'
+        )
+        FraudAlert.objects.create(
+            transaction=small, severity='critical', detection_reason='Reported by the receiver',
+            fraud_score=Decimal('0.95'), status='confirmed'
+        )
+        updated_at = BankAccount.objects.get(pk=self.sender.pk).updated_at
+        call_command('rescore_transactions', '--workers', '1', '--no-model', stdout=StringIO())
+
+        small.refresh_from_db()
+        self.assertTrue(small.flagged)
+        self.assertEqual(small.fraud_reason, 'Reported by the receiver')
+        self.assertEqual(small.fraud_alert.status, 'confirmed')
+        self.assertEqual(FraudAlert.objects.count(), 4)
+        # New flags change the accounts' conditional GET validators
+        self.assertGreater(BankAccount.objects.get(pk=self.sender.pk).updated_at, updated_at)
+
+
+@override_settings(FRAUD_DEEP_SCORING='sync')
+class DeepScoringTestCase(TestCase):
+    """Test suite for post-commit deep scoring"""
+
+    def setUp(self):
+        cache.clear()
+        self.sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        self.sender.balance = Decimal('100000.00')
+        self.sender.save()
+        self.receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='Test@1234', role='customer'
+        ).bank_account
+
+    def flagged_count(self, account):
+        return sum(row['flagged_count'] for row in monthly_summary(account))
+
+    def test_flags_what_inline_screening_missed(self):
+        updated_at = BankAccount.objects.get(pk=self.sender.pk).updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction_obj = execute_transfer(self.sender, self.receiver, Decimal('15000.00'))
+        transaction_obj.refresh_from_db()
+        self.assertTrue(transaction_obj.flagged)
+        self.assertEqual(transaction_obj.fraud_score, Decimal('0.90'))
+        self.assertEqual(transaction_obj.fraud_alert.severity, 'critical')
+        self.assertEqual(self.flagged_count(self.sender), 1)
+        self.assertEqual(self.flagged_count(self.receiver), 1)
+        # Conditional GET validators moved with the flag
+        self.assertGreater(BankAccount.objects.get(pk=self.sender.pk).updated_at, updated_at)
+
+    def test_never_lowers_an_inline_verdict(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction_obj = execute_transfer(
+                self.sender, self.receiver, Decimal('50.00'),
+                flagged=True, fraud_score=0.95, fraud_reason='Reported by the receiver'
+            )
+        transaction_obj.refresh_from_db()
+        self.assertTrue(transaction_obj.flagged)
+        self.assertEqual(transaction_obj.fraud_reason, 'Reported by the receiver')
+        alert = transaction_obj.fraud_alert
+        self.assertEqual((alert.severity, alert.fraud_score), ('critical', Decimal('0.95')))
+        self.assertEqual(self.flagged_count(self.sender), 1)
+
+    def test_upgrades_existing_alert(self):
+        transaction_obj = execute_transfer(self.sender, self.receiver, Decimal('15000.00'))
+        FraudAlert.objects.create(
+            transaction=transaction_obj, severity='low', detection_reason='Manual', fraud_score=Decimal('0.40')
+        )
+        self.assertEqual(deep.deep_score([transaction_obj.transaction_id]), 1)
+        alert = FraudAlert.objects.get(transaction=transaction_obj)
+        self.assertEqual((alert.severity, alert.fraud_score), ('critical', Decimal('0.90')))
+
+    def test_batch_legs_are_scored(self):
+        legs = [
+            {'receiver_account': self.receiver.account_number, 'amount': Decimal('20000.00')},
+            {'receiver_account': self.receiver.account_number, 'amount': Decimal('40.00')},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            execute_batch_transfer(self.sender, legs)
+        large = Transaction.objects.get(sender_account=self.sender, amount=Decimal('20000.00'))
+        self.assertTrue(large.flagged)
+        self.assertEqual(large.fraud_alert.severity, 'critical')
+        self.assertEqual(FraudAlert.objects.count(), 1)
+        self.assertEqual(self.flagged_count(self.sender), 1)
+
+    @override_settings(FRAUD_DEEP_SCORING='off')
+    def test_off(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            execute_transfer(self.sender, self.receiver, Decimal('15000.00'))
+        self.assertFalse(FraudAlert.objects.exists())
+
+
+@override_settings(FRAUD_DEEP_SCORING='thread')
+class DeepScoringThreadTestCase(TransactionTestCase):
+    """The thread pool scores committed transfers off the request thread"""
+
+    def test_scored_in_worker_thread(self):
+        sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        sender.balance = Decimal('100000.00')
+        sender.save()
+        receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='Test@1234', role='customer'
+        ).bank_account
+        with mock.patch.object(deep, 'deep_score', wraps=deep.deep_score) as deep_score:
+            transaction_obj = execute_transfer(sender, receiver, Decimal('15000.00'))
+            self.assertTrue(deep.flush(timeout=10))
+        deep_score.assert_called_once_with([transaction_obj.transaction_id])
+        self.assertEqual(FraudAlert.objects.get(transaction=transaction_obj).severity, 'critical')
@@ -1,8 +1,8 @@
 from django.urls import path
+from .views import FraudRulesView
 
 app_name = 'fraud_detection'
 
 urlpatterns = [
-    # Fraud detection is handled internally, no direct endpoints for MVP
-    # Future: Add ML model training and prediction endpoints
+    path('rules/', FraudRulesView.as_view(), name='rules'),
 ]
@@ -0,0 +1,29 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .rules import active_rules, rule_timings
+
+
+class FraudRulesView(APIView):
+    """Active fraud rules and their per-rule latency in this worker (admin only)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response(
+                {'error': 'Only admins can view fraud rules'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        timings = rule_timings.snapshot()
+        return Response({
+            'rules': [
+                {
+                    'name': active_rule.name,
+                    'weight': active_rule.weight,
+                    'params': active_rule.params,
+                    'timings': timings.get(active_rule.name)
+                }
+                for active_rule in active_rules()
+            ]
+        })
@@ -0,0 +1,38 @@
+from django.contrib import admin
+from .models import BalanceSnapshot, LedgerEntry, MonthlySummary
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['transaction', 'account', 'entry_type', 'amount', 'created_at']
+    list_filter = ['entry_type', 'created_at']
+    search_fields = ['account__account_number', 'transaction__transaction_id']
+
+    def has_add_permission(self, request):
+        # Entries are only written by the transfer engine
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        # The ledger is append-only
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['account', 'as_of', 'balance', 'created_at']
+    search_fields = ['account__account_number']
+    readonly_fields = ['created_at']
+
+
+@admin.register(MonthlySummary)
+class MonthlySummaryAdmin(admin.ModelAdmin):
+    list_display = [
+        'account', 'month', 'bucket', 'sent_total', 'sent_count',
+        'received_total', 'received_count', 'flagged_count'
+    ]
+    list_filter = ['month']
+    search_fields = ['account__account_number']
+    readonly_fields = ['updated_at']
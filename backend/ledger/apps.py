@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class LedgerConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'ledger'
+
+    def ready(self):
+        """Import signals when the app is ready"""
+        import ledger.signals
@@ -0,0 +1,85 @@
+"""
+Rebuild the per-account monthly summaries from the transactions table.
+
+The rows are aggregated and then replaced, while transfers to balance
+bucketed accounts and re-scoring update them without locking the account,
+so a transfer landing during the rebuild can be lost or counted twice.
+Stop transfers, the settlement worker, the scheduler and re-scoring first;
+the command refuses to run without --force.
+
+Usage:
+    python manage.py rebuild_monthly_summaries --force              # current month only
+    python manage.py rebuild_monthly_summaries --force --months 12  # backfill the last 12 months
+    python manage.py rebuild_monthly_summaries --force --all
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from ledger.models import MonthlySummary
+from ledger.services import SUMMARY_COUNTERS, summary_month
+from transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or backfill monthly account summaries from completed transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=1,
+                            help='Number of UTC months to rebuild, ending with the current one')
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild summaries for the whole transaction history')
+        parser.add_argument('--force', action='store_true',
+                            help='Confirm that writes are stopped for the duration of the rebuild')
+
+    def handle(self, *args, **options):
+        if not options['force']:
+            raise CommandError(
+                'Rebuilding replaces summary rows that live transfers and re-scoring update. '
+                'Stop writes, then re-run with --force.'
+            )
+
+        current = summary_month(timezone.now())
+        first_month = None
+        if not options['all']:
+            index = current.year * 12 + current.month - 1 - (options['months'] - 1)
+            first_month = current.replace(year=index // 12, month=index % 12 + 1)
+
+        transactions = Transaction.objects.filter(status='completed')
+        summaries = MonthlySummary.objects.all()
+        if first_month:
+            transactions = transactions.filter(timestamp__date__gte=first_month)
+            summaries = summaries.filter(month__gte=first_month)
+
+        rows = {}
+        for side in ('sent', 'received'):
+            account_field = 'sender_account' if side == 'sent' else 'receiver_account'
+            totals = (
+                transactions
+                .annotate(month=TruncMonth('timestamp', output_field=DateField()))
+                .values(account_field, 'month')
+                .annotate(total=Sum('amount'), count=Count('id'), flagged=Count('id', filter=Q(flagged=True)))
+                .order_by()
+            )
+            for total in totals.iterator():
+                row = rows.setdefault((total[account_field], total['month']), dict.fromkeys(SUMMARY_COUNTERS, 0))
+                row[f'{side}_total'] = total['total']
+                row[f'{side}_count'] = total['count']
+                row['flagged_count'] += total['flagged']
+
+        with db_transaction.atomic():
+            deleted, _ = summaries.delete()
+            created = MonthlySummary.objects.bulk_create(
+                [
+                    MonthlySummary(account_id=account_id, month=month, **row)
+                    for (account_id, month), row in rows.items()
+                ],
+                batch_size=1000
+            )
+
+        scope = 'all months' if first_month is None else f'{first_month:%Y-%m} to {current:%Y-%m}'
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(created)} monthly summaries ({deleted} replaced) for {scope}'
+        ))
@@ -0,0 +1,55 @@
+"""
+Write a balance snapshot for every account with ledger activity since its
+last snapshot, which keeps balance-as-of range scans short.
+Meant to run periodically (e.g. hourly cron).
+
+Entries newer than --lag seconds are left for the next run so a transfer
+that is still committing cannot be skipped.
+
+Usage:
+    python manage.py snapshot_balances
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.utils import timezone
+from banking.models import BankAccount
+from ledger.models import BalanceSnapshot, LedgerEntry
+
+
+class Command(BaseCommand):
+    help = 'Snapshot balances of accounts with new ledger entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag', type=int, default=60,
+                            help='Seconds to stay behind the current time')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Snapshots inserted per statement')
+
+    def handle(self, *args, **options):
+        as_of = timezone.now() - timedelta(seconds=options['lag'])
+        latest = BalanceSnapshot.objects.filter(account=OuterRef('pk')).order_by('-as_of')
+        accounts = BankAccount.objects.annotate(
+            snapshot_as_of=Subquery(latest.values('as_of')[:1]),
+            snapshot_balance=Subquery(latest.values('balance')[:1]),
+        ).values_list('pk', 'snapshot_as_of', 'snapshot_balance')
+
+        snapshots = []
+        for account_id, snapshot_as_of, snapshot_balance in accounts.iterator():
+            if snapshot_as_of and snapshot_as_of >= as_of:
+                continue
+            entries = LedgerEntry.objects.filter(account_id=account_id, created_at__lte=as_of)
+            if snapshot_as_of:
+                entries = entries.filter(created_at__gt=snapshot_as_of)
+            totals = entries.aggregate(total=Sum('amount'), count=Count('id'))
+            if not totals['count']:
+                continue
+            snapshots.append(BalanceSnapshot(
+                account_id=account_id,
+                as_of=as_of,
+                balance=(snapshot_balance or 0) + totals['total']
+            ))
+
+        BalanceSnapshot.objects.bulk_create(snapshots, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(snapshots)} balance snapshots'))
@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.models import Sum
+from django.utils import timezone
+
+
+def create_opening_snapshots(apps, schema_editor):
+    """
+    Balances that predate the ledger have no entries behind them, so each
+    existing account starts from a snapshot of its current balance.
+    """
+    BankAccount = apps.get_model('banking', 'BankAccount')
+    BalanceBucket = apps.get_model('banking', 'BalanceBucket')
+    BalanceSnapshot = apps.get_model('ledger', 'BalanceSnapshot')
+
+    now = timezone.now()
+    parked = dict(
+        BalanceBucket.objects.values('account_id')
+        .annotate(total=Sum('balance'))
+        .values_list('account_id', 'total')
+    )
+    BalanceSnapshot.objects.bulk_create([
+        BalanceSnapshot(account_id=pk, as_of=now, balance=balance + (parked.get(pk) or 0))
+        for pk, balance in BankAccount.objects.values_list('pk', 'balance').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_opening_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0002_balance_buckets'),
+        ('ledger', '0002_opening_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('bucket', models.PositiveSmallIntegerField(default=0)),
+                ('sent_total', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('received_total', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('received_count', models.PositiveIntegerField(default=0)),
+                ('flagged_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='banking.bankaccount')),
+            ],
+            options={
+                'verbose_name': 'Monthly Summary',
+                'verbose_name_plural': 'Monthly Summaries',
+                'db_table': 'monthly_summaries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlysummary',
+            constraint=models.UniqueConstraint(fields=('account', 'month', 'bucket'), name='unique_monthly_summary'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+from django.db import models
+from django.utils import timezone
+from banking.models import BankAccount
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only double-entry ledger.
+    Every completed transfer writes one debit (negative amount) for the
+    sender and one credit (positive amount) for the receiver, so the sum
+    of an account's entries is the net effect of its transfers.
+    """
+    ENTRY_TYPE_CHOICES = [
+        ('debit', 'Debit'),
+        ('credit', 'Credit'),
+    ]
+
+    # Keyed on transaction_id, which is assigned before insert, so batch
+    # bulk_create does not need the transactions' primary keys back
+    transaction = models.ForeignKey(
+        'transactions.Transaction',
+        on_delete=models.CASCADE,
+        to_field='transaction_id',
+        related_name='ledger_entries'
+    )
+    account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.CASCADE,
+        related_name='ledger_entries'
+    )
+    entry_type = models.CharField(max_length=10, choices=ENTRY_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)  # signed
+    # When the money moved, not when the transaction row was first written
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'ledger_entries'
+        verbose_name = 'Ledger Entry'
+        verbose_name_plural = 'Ledger Entries'
+        indexes = [
+            models.Index(fields=['account', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.account.account_number} {self.entry_type} {self.amount} ({self.transaction_id})"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Balance of an account at a point in time, so balance-as-of queries
+    only have to add up the ledger entries written since the snapshot.
+    """
+    account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.CASCADE,
+        related_name='balance_snapshots'
+    )
+    as_of = models.DateTimeField()
+    balance = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'balance_snapshots'
+        verbose_name = 'Balance Snapshot'
+        verbose_name_plural = 'Balance Snapshots'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'as_of'], name='unique_balance_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.account.account_number} @ {self.as_of}: ${self.balance}"
+
+
+class MonthlySummary(models.Model):
+    """
+    Per-account monthly rollup of completed transfers, kept up to date by
+    the transfer engine. Hot accounts spread their rows over buckets the
+    same way their balances are; readers sum the buckets of a month.
+    """
+    account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.CASCADE,
+        related_name='monthly_summaries'
+    )
+    month = models.DateField()  # first day of the month
+    bucket = models.PositiveSmallIntegerField(default=0)
+    sent_total = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    received_total = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    received_count = models.PositiveIntegerField(default=0)
+    flagged_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'monthly_summaries'
+        verbose_name = 'Monthly Summary'
+        verbose_name_plural = 'Monthly Summaries'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'month', 'bucket'], name='unique_monthly_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.account.account_number} {self.month:%Y-%m} (bucket {self.bucket})"
@@ -0,0 +1,181 @@
+"""
+Ledger writes, monthly rollups and point-in-time balance queries.
+"""
+
+import operator
+import random
+from decimal import Decimal
+from functools import reduce
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import (
+    Case, DecimalField, F, IntegerField, Q, Sum, Value, When
+)
+from django.utils import timezone
+from .models import BalanceSnapshot, LedgerEntry, MonthlySummary
+
+SUMMARY_COUNTERS = ('sent_total', 'sent_count', 'received_total', 'received_count', 'flagged_count')
+
+
+def record_transfers(transactions, now):
+    """
+    Write the debit and credit entries for completed transfers in one INSERT.
+    Must run in the same database transaction as the money movement.
+    """
+    entries = []
+    for transaction_obj in transactions:
+        entries.append(LedgerEntry(
+            transaction_id=transaction_obj.transaction_id,
+            account_id=transaction_obj.sender_account_id,
+            entry_type='debit',
+            amount=-transaction_obj.amount,
+            created_at=now
+        ))
+        entries.append(LedgerEntry(
+            transaction_id=transaction_obj.transaction_id,
+            account_id=transaction_obj.receiver_account_id,
+            entry_type='credit',
+            amount=transaction_obj.amount,
+            created_at=now
+        ))
+    LedgerEntry.objects.bulk_create(entries)
+    apply_monthly_deltas(monthly_deltas(transactions))
+
+
+def summary_month(timestamp):
+    return timestamp.date().replace(day=1)
+
+
+def monthly_deltas(transactions):
+    """
+    Counter increments per (account_id, month, bucket) for completed transfers.
+    Months follow the transaction timestamp, as rebuild_monthly_summaries does.
+    Hot receivers get one random bucket per call so concurrent transfers to
+    them rarely touch the same row.
+    """
+    deltas = {}
+    buckets = {}
+    for transaction_obj in transactions:
+        month = summary_month(transaction_obj.timestamp)
+        flagged = 1 if transaction_obj.flagged else 0
+        for account, side in ((transaction_obj.sender_account, 'sent'),
+                              (transaction_obj.receiver_account, 'received')):
+            if account.pk not in buckets:
+                hot = side == 'received' and account.bucket_count
+                buckets[account.pk] = random.randrange(account.bucket_count) if hot else 0
+            row = deltas.setdefault((account.pk, month, buckets[account.pk]), dict.fromkeys(SUMMARY_COUNTERS, 0))
+            row[f'{side}_total'] += transaction_obj.amount
+            row[f'{side}_count'] += 1
+            row['flagged_count'] += flagged
+    return deltas
+
+
+def adjust_flagged_counts(changes):
+    """
+    Move monthly flagged counts after completed transfers were flagged or
+    unflagged later on. changes are (transaction, +1 or -1) pairs; both
+    accounts' months change, through bucket 0.
+    """
+    deltas = {}
+    for transaction_obj, delta in changes:
+        month = summary_month(transaction_obj.timestamp)
+        for account_id in (transaction_obj.sender_account_id, transaction_obj.receiver_account_id):
+            row = deltas.setdefault((account_id, month, 0), dict.fromkeys(SUMMARY_COUNTERS, 0))
+            row['flagged_count'] += delta
+    apply_monthly_deltas({key: row for key, row in deltas.items() if row['flagged_count']})
+
+
+def apply_monthly_deltas(deltas):
+    """
+    Add deltas to the summary rows in one UPDATE, creating missing rows.
+    Locked accounts cannot race here; for hot-account buckets a concurrent
+    insert of the same row is absorbed by retrying the missing keys.
+    """
+    if not deltas:
+        return
+
+    def match(key):
+        account_id, month, bucket = key
+        return Q(account_id=account_id, month=month, bucket=bucket)
+
+    updates = {}
+    for name in SUMMARY_COUNTERS:
+        if not any(row[name] for row in deltas.values()):
+            continue
+        output_field = DecimalField(max_digits=17, decimal_places=2) if name.endswith('_total') else IntegerField()
+        updates[name] = F(name) + Case(
+            *[When(match(key), then=Value(row[name])) for key, row in deltas.items()],
+            default=Value(0),
+            output_field=output_field
+        )
+    condition = reduce(operator.or_, (match(key) for key in deltas))
+    updated = MonthlySummary.objects.filter(condition).update(updated_at=timezone.now(), **updates)
+    if updated == len(deltas):
+        return
+
+    existing = set()
+    if updated:
+        existing = set(MonthlySummary.objects.filter(condition).values_list('account_id', 'month', 'bucket'))
+    missing = {key: row for key, row in deltas.items() if key not in existing}
+    try:
+        with db_transaction.atomic():
+            MonthlySummary.objects.bulk_create([
+                MonthlySummary(account_id=account_id, month=month, bucket=bucket, **row)
+                for (account_id, month, bucket), row in missing.items()
+            ])
+    except IntegrityError:
+        # Another transfer created one of the rows first; it exists now
+        apply_monthly_deltas(missing)
+
+
+def monthly_summary(account, start_month=None, end_month=None):
+    """
+    Monthly totals for account, oldest first, summed over buckets.
+    Costs one query over at most months x buckets rows.
+    """
+    rows = MonthlySummary.objects.filter(account=account)
+    if start_month:
+        rows = rows.filter(month__gte=start_month)
+    if end_month:
+        rows = rows.filter(month__lte=end_month)
+    totals = (
+        rows.values('month')
+        .annotate(**{f'{name}_sum': Sum(name) for name in SUMMARY_COUNTERS})
+        .order_by('month')
+    )
+    return [
+        {'month': row['month'], **{name: row[f'{name}_sum'] for name in SUMMARY_COUNTERS}}
+        for row in totals
+    ]
+
+
+def snapshot_balance(account, as_of=None):
+    """
+    Snapshot account's balance after it changed outside a transfer (account
+    creation, admin edits, seeding), which writes no ledger entries.
+    """
+    BalanceSnapshot.objects.update_or_create(
+        account=account, as_of=as_of or timezone.now(),
+        defaults={'balance': account.total_balance}
+    )
+
+
+def balance_as_of(account, when):
+    """
+    Balance of account at time when.
+    Costs one snapshot lookup plus a sum over the entries written between
+    that snapshot and when, which snapshot_balances keeps short.
+    Accounts without a snapshot start from zero.
+    """
+    snapshot = (
+        BalanceSnapshot.objects
+        .filter(account=account, as_of__lte=when)
+        .order_by('-as_of')
+        .only('as_of', 'balance')
+        .first()
+    )
+    entries = LedgerEntry.objects.filter(account=account, created_at__lte=when)
+    opening = Decimal('0.00')
+    if snapshot:
+        entries = entries.filter(created_at__gt=snapshot.as_of)
+        opening = snapshot.balance
+    return opening + (entries.aggregate(total=Sum('amount'))['total'] or 0)
@@ -0,0 +1,24 @@
+"""
+Django signals for the ledger app.
+Balances saved directly on the account bypass the transfer engine, so
+they are recorded as snapshots for balance-as-of queries.
+"""
+
+from decimal import Decimal
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from banking.models import BankAccount
+from .services import snapshot_balance
+
+
+@receiver(post_save, sender=BankAccount)
+def snapshot_saved_balance(sender, instance, created, update_fields=None, **kwargs):
+    """Snapshot the balance when a save sets a new one"""
+    if update_fields is not None and 'balance' not in update_fields:
+        return
+    # New accounts start from zero; instances not loaded from the database
+    # have no known previous balance
+    previous = Decimal('0.00') if created else getattr(instance, '_saved_balance', None)
+    if previous is None or instance.balance != previous:
+        snapshot_balance(instance)
+    instance._saved_balance = instance.balance
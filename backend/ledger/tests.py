@@ -0,0 +1,173 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from banking.buckets import set_bucket_count
+from banking.models import BankAccount
+from transactions.services import execute_batch_transfer, execute_transfer
+from .models import BalanceSnapshot, LedgerEntry
+from .services import balance_as_of, monthly_summary
+
+User = get_user_model()
+
+
+class LedgerTestCase(APITestCase):
+    """Test suite for ledger entries and balance-as-of queries"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.sender_account = BankAccount.objects.get(pk=self.sender.bank_account.pk)
+        self.receiver_account = BankAccount.objects.get(pk=self.receiver.bank_account.pk)
+        # Funded outside the transfer engine, as seed_data.py and the admin do
+        self.sender_account.balance = Decimal('1000.00')
+        self.sender_account.save()
+
+    def test_transfers_write_balanced_entries(self):
+        """Test that single and batch transfers write one debit and one credit each"""
+        transaction_obj = execute_transfer(self.sender_account, self.receiver_account, Decimal('100.00'))
+        execute_batch_transfer(self.sender_account, [
+            {'receiver_account': self.receiver_account.account_number, 'amount': Decimal('10.00')},
+            {'receiver_account': self.receiver_account.account_number, 'amount': Decimal('20.00')},
+        ])
+
+        self.assertEqual(LedgerEntry.objects.count(), 6)
+        entries = transaction_obj.ledger_entries.order_by('entry_type')
+        self.assertEqual(
+            [(entry.entry_type, entry.account_id, entry.amount) for entry in entries],
+            [('credit', self.receiver_account.pk, Decimal('100.00')),
+             ('debit', self.sender_account.pk, Decimal('-100.00'))]
+        )
+        self.assertEqual(balance_as_of(self.sender_account, timezone.now()), Decimal('870.00'))
+        self.assertEqual(balance_as_of(self.receiver_account, timezone.now()), Decimal('130.00'))
+
+    def test_balance_as_of_uses_latest_snapshot(self):
+        """Test point-in-time balances before and after a snapshot"""
+        execute_transfer(self.sender_account, self.receiver_account, Decimal('100.00'))
+        between = timezone.now()
+        call_command('snapshot_balances', '--lag', '0', stdout=StringIO())
+        execute_transfer(self.sender_account, self.receiver_account, Decimal('50.00'))
+
+        self.assertEqual(BalanceSnapshot.objects.filter(account=self.sender_account).count(), 2)
+        self.assertEqual(balance_as_of(self.sender_account, between), Decimal('900.00'))
+        with self.assertNumQueries(2):
+            self.assertEqual(balance_as_of(self.sender_account, timezone.now()), Decimal('850.00'))
+        self.assertEqual(
+            balance_as_of(self.sender_account, timezone.now() - timedelta(days=2)),
+            Decimal('0.00')
+        )
+
+    def test_directly_set_balances_are_snapshotted(self):
+        """Test that balances saved outside transfers match the ledger view"""
+        user = User.objects.create_user(
+            username='seeded', email='seeded@example.com', password='Test@1234', role='customer'
+        )
+        user.bank_account.balance = Decimal('10000.00')
+        user.bank_account.save()
+        account = BankAccount.objects.get(pk=user.bank_account.pk)
+        execute_transfer(account, self.receiver_account, Decimal('100.00'))
+        self.assertEqual(balance_as_of(account, timezone.now()), Decimal('9900.00'))
+
+        # Admin edits are snapshotted too; saves that keep the balance are not
+        account = BankAccount.objects.get(pk=account.pk)
+        account.balance = Decimal('5000.00')
+        account.save()
+        account.daily_limit = Decimal('100.00')
+        account.save()
+        self.assertEqual(BalanceSnapshot.objects.filter(account=account).count(), 2)
+        self.assertEqual(balance_as_of(account, timezone.now()), Decimal('5000.00'))
+
+    def test_balance_endpoint(self):
+        """Test the balance-as-of API and its input validation"""
+        before = timezone.now()
+        execute_transfer(self.sender_account, self.receiver_account, Decimal('100.00'))
+        self.client.force_authenticate(user=User.objects.get(pk=self.sender.pk))
+
+        response = self.client.get('/api/ledger/balance/', {'as_of': before.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['balance'], '1000.00')
+
+        response = self.client.get('/api/ledger/balance/')
+        self.assertEqual(response.data['balance'], '900.00')
+
+        response = self.client.get('/api/ledger/balance/', {'as_of': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MonthlySummaryTestCase(APITestCase):
+    """Test suite for the monthly rollups"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        BankAccount.objects.filter(pk=self.sender.bank_account.pk).update(balance=Decimal('1000.00'))
+        self.sender_account = BankAccount.objects.get(pk=self.sender.bank_account.pk)
+        self.receiver_account = BankAccount.objects.get(pk=self.receiver.bank_account.pk)
+
+    def make_transfers(self):
+        execute_transfer(self.sender_account, self.receiver_account, Decimal('100.00'))
+        execute_transfer(self.sender_account, self.receiver_account, Decimal('50.00'), flagged=True)
+        execute_batch_transfer(self.sender_account, [
+            {'receiver_account': self.receiver_account.account_number, 'amount': Decimal('10.00')},
+            {'receiver_account': self.receiver_account.account_number, 'amount': Decimal('20.00')},
+        ])
+
+    def test_transfer_path_maintains_rollups(self):
+        """Test the endpoint totals after single and batch transfers to a hot account"""
+        set_bucket_count(self.receiver_account, 4)
+        self.make_transfers()
+
+        self.client.force_authenticate(user=User.objects.get(pk=self.receiver.pk))
+        with self.assertNumQueries(2):  # bank account + one grouped query
+            response = self.client.get('/api/ledger/summary/', {'start': '2020-01'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [month] = response.data['months']
+        self.assertEqual(month['month'], f'{timezone.now():%Y-%m}')
+        self.assertEqual((month['received_total'], month['received_count']), ('180.00', 4))
+        self.assertEqual((month['sent_total'], month['sent_count']), ('0.00', 0))
+        self.assertEqual(month['flagged_count'], 1)
+
+        response = self.client.get('/api/ledger/summary/', {'start': 'last-year'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        """Test that the rebuild command reproduces what the transfer path wrote"""
+        self.make_transfers()
+        incremental = [monthly_summary(account) for account in (self.sender_account, self.receiver_account)]
+
+        call_command('rebuild_monthly_summaries', '--all', '--force', stdout=StringIO())
+
+        rebuilt = [monthly_summary(account) for account in (self.sender_account, self.receiver_account)]
+        self.assertEqual(rebuilt, incremental)
+        self.assertEqual(incremental[0][0]['sent_total'], Decimal('180.00'))
+
+    def test_rebuild_requires_force(self):
+        """Test that the rebuild refuses to replace rows unless writes are declared stopped"""
+        self.make_transfers()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_monthly_summaries', '--all', stdout=StringIO())
+        self.assertEqual(monthly_summary(self.sender_account)[0]['sent_total'], Decimal('180.00'))
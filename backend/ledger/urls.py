@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import BalanceAsOfView, MonthlySummaryView
+
+app_name = 'ledger'
+
+urlpatterns = [
+    path('balance/', BalanceAsOfView.as_view(), name='balance'),
+    path('summary/', MonthlySummaryView.as_view(), name='summary'),
+]
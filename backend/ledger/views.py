@@ -0,0 +1,92 @@
+from datetime import datetime
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from banking.models import BankAccount
+from .services import balance_as_of, monthly_summary
+
+
+class BalanceAsOfView(APIView):
+    """
+    Balance of the user's account at a point in time.
+    Query param as_of takes an ISO 8601 datetime and defaults to now.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            account = request.user.bank_account
+        except BankAccount.DoesNotExist:
+            return Response(
+                {'error': 'You do not have a bank account'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        as_of = request.query_params.get('as_of')
+        if as_of:
+            when = parse_datetime(as_of)
+            if when is None:
+                return Response(
+                    {'error': 'as_of must be an ISO 8601 datetime'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(when):
+                when = timezone.make_aware(when)
+        else:
+            when = timezone.now()
+
+        return Response({
+            'account_number': account.account_number,
+            'as_of': when,
+            'balance': str(balance_as_of(account, when))
+        })
+
+
+class MonthlySummaryView(APIView):
+    """
+    Monthly sent/received totals for the user's account, oldest first.
+    Optional query params start and end take YYYY-MM (inclusive).
+    Served from the monthly rollups, so cost grows with months, not transactions.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            account = request.user.bank_account
+        except BankAccount.DoesNotExist:
+            return Response(
+                {'error': 'You do not have a bank account'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bounds = {}
+        for param in ('start', 'end'):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                bounds[param] = datetime.strptime(value, '%Y-%m').date()
+            except ValueError:
+                return Response(
+                    {'error': f'{param} must be a month like 2025-01'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        months = monthly_summary(account, bounds.get('start'), bounds.get('end'))
+        return Response({
+            'account_number': account.account_number,
+            'months': [
+                {
+                    'month': f"{row['month']:%Y-%m}",
+                    'sent_total': f"{row['sent_total']:.2f}",
+                    'sent_count': row['sent_count'],
+                    'received_total': f"{row['received_total']:.2f}",
+                    'received_count': row['received_count'],
+                    'flagged_count': row['flagged_count'],
+                }
+                for row in months
+            ]
+        })
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Transaction
+from .models import DailySpend, ScheduledTransfer, Transaction
 
 
 @admin.register(Transaction)
@@ -14,3 +14,22 @@ class TransactionAdmin(admin.ModelAdmin):
         'receiver_account__account_number'
     ]
     readonly_fields = ['transaction_id', 'timestamp', 'updated_at']
+
+
+@admin.register(DailySpend)
+class DailySpendAdmin(admin.ModelAdmin):
+    list_display = ['account', 'date', 'amount', 'updated_at']
+    list_filter = ['date']
+    search_fields = ['account__account_number']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(ScheduledTransfer)
+class ScheduledTransferAdmin(admin.ModelAdmin):
+    list_display = [
+        'sender_account', 'receiver_account', 'amount', 'frequency',
+        'next_run_at', 'is_active', 'last_status'
+    ]
+    list_filter = ['frequency', 'is_active', 'last_status']
+    search_fields = ['sender_account__account_number', 'receiver_account__account_number']
+    readonly_fields = ['occurrences', 'last_run_at', 'last_transaction_id', 'created_at', 'updated_at']
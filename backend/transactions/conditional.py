@@ -0,0 +1,73 @@
+"""
+Conditional GET support for account polling.
+The validators of an account are its updated_at, the newest transaction
+it sent or received and the latest change to any of them (settlement,
+failure, flagging), all read in one query over the history indexes. A
+poll whose If-None-Match / If-Modified-Since still matches gets 304 Not
+Modified before any queryset or serializer runs.
+"""
+
+import hashlib
+from django.db.models import OuterRef, Subquery
+from django.views.decorators.http import condition
+from banking.models import BankAccount
+from .models import Transaction
+
+_CACHE_ATTR = '_account_validators'
+
+
+def _latest(field, value, order='-timestamp'):
+    return Subquery(
+        Transaction.objects.filter(**{field: OuterRef('pk')})
+        .order_by(order, '-id')
+        .values(value)[:1]
+    )
+
+
+def account_validators(request):
+    """
+    (etag, last_modified) for the requesting user's account, or (None, None)
+    if there is none. Cached on the request, since condition() asks twice.
+    """
+    if not hasattr(request, _CACHE_ATTR):
+        row = (
+            BankAccount.objects.filter(user_id=request.user.pk)
+            .annotate(
+                last_sent_id=_latest('sender_account', 'transaction_id'),
+                last_received_id=_latest('receiver_account', 'transaction_id'),
+                # Status and flag changes update existing rows in place
+                sent_changed_at=_latest('sender_account', 'updated_at', '-updated_at'),
+                received_changed_at=_latest('receiver_account', 'updated_at', '-updated_at'),
+            )
+            .values('pk', 'updated_at', 'last_sent_id', 'last_received_id', 'sent_changed_at', 'received_changed_at')
+            .first()
+        )
+        validators = (None, None)
+        if row:
+            fingerprint = '|'.join(str(row[key]) for key in (
+                'pk', 'updated_at', 'last_sent_id', 'last_received_id', 'sent_changed_at', 'received_changed_at'
+            ))
+            etag = hashlib.sha1(fingerprint.encode()).hexdigest()
+            last_modified = max(
+                value for value in (row['updated_at'], row['sent_changed_at'], row['received_changed_at'])
+                if value is not None
+            )
+            validators = (etag, last_modified)
+        setattr(request, _CACHE_ATTR, validators)
+    return getattr(request, _CACHE_ATTR)
+
+
+def _etag(request, *args, **kwargs):
+    etag = account_validators(request)[0]
+    if etag is None:
+        return None
+    # Different query strings (cursor, fields) are different representations
+    return hashlib.sha1(f'{etag}|{request.get_full_path()}'.encode()).hexdigest()
+
+
+def _last_modified(request, *args, **kwargs):
+    return account_validators(request)[1]
+
+
+# Decorator for GET handlers that only depend on the user's account and its transactions
+account_condition = condition(etag_func=_etag, last_modified_func=_last_modified)
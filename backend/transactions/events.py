@@ -0,0 +1,130 @@
+"""
+In-process publish/subscribe for account events.
+The transfer engine publishes completed transfers once their database
+transaction commits; the SSE stream (transactions.stream) subscribes per
+account. Only subscribers in the publishing process see an event, so serve
+the stream from the same ASGI workers that handle transfers. Transfers made
+elsewhere (other workers, the settlement worker, the scheduler, management
+commands) are not pushed; clients only see them in the replay after a
+reconnect.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+from django.db import transaction as db_transaction
+
+# Events a slow client may fall behind by before its backlog is dropped
+QUEUE_LIMIT = 100
+RESYNC = {'event': 'resync', 'data': {}}
+
+
+def transaction_event(transaction_obj, account_id):
+    """The event an account sees for one of its transactions"""
+    sent = transaction_obj.sender_account_id == account_id
+    counterparty = transaction_obj.receiver_account if sent else transaction_obj.sender_account
+    return {
+        'event': 'transaction',
+        'id': transaction_obj.transaction_id,
+        'data': {
+            'transaction_id': transaction_obj.transaction_id,
+            'direction': 'sent' if sent else 'received',
+            'counterparty': counterparty.account_number,
+            'amount': str(transaction_obj.amount),
+            'status': transaction_obj.status,
+            'timestamp': transaction_obj.timestamp.isoformat(),
+        },
+    }
+
+
+class Subscription:
+    """Events for one account, queued on the subscriber's event loop"""
+
+    def __init__(self, broker, account_id, loop):
+        self.broker = broker
+        self.account_id = account_id
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, event):
+        # Runs on self.loop
+        if self.queue.qsize() >= QUEUE_LIMIT:
+            # Slow client: drop the backlog and tell it to refetch
+            self.drain()
+            event = RESYNC
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def drain(self):
+        """Everything already queued, without waiting"""
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Thread-safe fan-out from publishing threads to asyncio subscribers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, account_id):
+        """Must be called from the event loop that will consume the events"""
+        subscription = Subscription(self, account_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[account_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.account_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.account_id]
+
+    def subscriber_count(self, account_id=None):
+        with self._lock:
+            if account_id is not None:
+                return len(self._subscriptions.get(account_id, ()))
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, account_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(account_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it unsubscribes on its way out
+                pass
+
+
+broker = Broker()
+
+
+def publish_transfers(transactions):
+    """
+    Publish completed transfers to both accounts' subscribers when the
+    current database transaction commits. The events are built now, from
+    the in-memory objects, so publishing costs no queries.
+    """
+    if not broker.subscriber_count():
+        return
+    events = []
+    for transaction_obj in transactions:
+        for account_id in {transaction_obj.sender_account_id, transaction_obj.receiver_account_id}:
+            events.append((account_id, transaction_event(transaction_obj, account_id)))
+
+    def publish():
+        for account_id, event in events:
+            broker.publish(account_id, event)
+
+    db_transaction.on_commit(publish)
@@ -0,0 +1,128 @@
+"""
+Streaming statement export.
+Rows are read through server-side cursors and written out in chunks, so
+memory use does not depend on how many transactions an account has.
+"""
+
+import csv
+import json
+import zlib
+from rest_framework import renderers, serializers
+
+EXPORT_COLUMNS = [
+    'transaction_id', 'timestamp', 'sender_account', 'receiver_account',
+    'amount', 'status', 'description', 'flagged', 'fraud_score',
+]
+# ORM paths for EXPORT_COLUMNS, loaded with values_list()
+EXPORT_FIELDS = [
+    'timestamp', 'id', 'transaction_id', 'sender_account__account_number',
+    'receiver_account__account_number', 'amount', 'status', 'description',
+    'flagged', 'fraud_score',
+]
+ROWS_PER_CHUNK = 500
+# Leading characters that make spreadsheet apps read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+_timestamp_field = serializers.DateTimeField()
+
+
+class _Echo:
+    """File-like object whose write() hands back the formatted line"""
+
+    def write(self, value):
+        return value
+
+
+def export_row(values):
+    """Map a values_list() row (EXPORT_FIELDS) to the exported columns"""
+    timestamp, _, transaction_id, sender, receiver, amount, status, description, flagged, fraud_score = values
+    return [
+        transaction_id,
+        _timestamp_field.to_representation(timestamp),
+        sender,
+        receiver,
+        str(amount),
+        status,
+        description or '',
+        flagged,
+        None if fraud_score is None else str(fraud_score),
+    ]
+
+
+def csv_safe(value):
+    """Quote user-controlled text that a spreadsheet would run as a formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([csv_safe(value) for value in export_row(row)])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, export_row(row))), separators=(',', ':')) + '\n'
+
+
+def chunked(lines, size=ROWS_PER_CHUNK):
+    """Group lines into encoded chunks so each write carries many rows"""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer).encode()
+            buffer = []
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def gzipped(chunks):
+    """Compress a byte stream on the fly into a gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    text/csv for ?format=csv. Exports stream their own body; this only
+    renders regular responses such as validation errors.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        return ''.join(csv_lines_for_dict(data)).encode()
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """application/x-ndjson for ?format=ndjson (see CSVRenderer)"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, separators=(',', ':'), default=str) + '\n').encode()
+
+
+def csv_lines_for_dict(data):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(list(data))
+    yield writer.writerow([
+        csv_safe('; '.join(map(str, value)) if isinstance(value, list) else value)
+        for value in data.values()
+    ])
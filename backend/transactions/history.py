@@ -0,0 +1,149 @@
+"""
+Transaction history of one account as a UNION ALL query.
+An OR over sender_account and receiver_account makes most planners give up
+on indexes; two branches that each walk their own (account, timestamp)
+index and are merged by the database scale with the page, not the account.
+"""
+
+import heapq
+from datetime import datetime, time as dt_time, timedelta
+from django.db import connection
+from django.db.models import Q, Subquery
+from django.utils import timezone
+from banking.models import BankAccount
+from .models import Transaction
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+class AccountHistory:
+    """
+    Queryset-like view of an account's sent and received transactions.
+    Supports the subset the history views and pagination need: filter(),
+    order_by(), count() and slicing. Slicing runs the UNION ALL over ids
+    only, then loads the page's rows (with the base queryset's
+    select_related/only, or as its values_list rows) by primary key.
+
+    direction ('sent' or 'received') keeps a single branch, and counterparty
+    (an account pk or expression) narrows each branch to the other side of
+    the transfer, where the (sender, receiver, timestamp) index serves both.
+    """
+
+    def __init__(self, account, base=None, direction=None, counterparty=None):
+        self.account = account
+        self.base = base if base is not None else Transaction.objects.all()
+        self.direction = direction
+        self.counterparty = counterparty
+        self.filters = ()
+        self.ordering = ('-timestamp', '-id')
+
+    def _clone(self, **changes):
+        clone = AccountHistory(self.account, self.base, self.direction, self.counterparty)
+        clone.filters = self.filters
+        clone.ordering = self.ordering
+        clone.__dict__.update(changes)
+        return clone
+
+    def narrow(self, direction=None, counterparty=None):
+        return self._clone(direction=direction, counterparty=counterparty)
+
+    def filter(self, *args, **kwargs):
+        return self._clone(filters=self.filters + args + ((Q(**kwargs),) if kwargs else ()))
+
+    def order_by(self, *fields):
+        # Compound queries order by selected column names, so 'pk' becomes 'id'
+        return self._clone(ordering=tuple(
+            field.replace('pk', 'id') if field.lstrip('-') == 'pk' else field for field in fields
+        ))
+
+    def branches(self):
+        """The sent and/or received querysets; self-transfers only count once"""
+        branches = []
+        if self.direction != 'received':
+            sent = self.base.filter(sender_account=self.account, *self.filters)
+            if self.counterparty is not None:
+                sent = sent.filter(receiver_account=self.counterparty)
+            branches.append(sent)
+        if self.direction != 'sent':
+            received = self.base.filter(receiver_account=self.account, *self.filters)
+            if self.counterparty is not None:
+                received = received.filter(sender_account=self.counterparty)
+            if branches:
+                received = received.exclude(sender_account=self.account)
+            branches.append(received)
+        return branches
+
+    def count(self):
+        return sum(branch.count() for branch in self.branches())
+
+    def id_queryset(self, stop=None):
+        """UNION ALL of the branches' (id, timestamp), ordered and limited to stop rows"""
+        branches = [branch.order_by().values('id', 'timestamp') for branch in self.branches()]
+        if len(branches) == 1:
+            combined = branches[0].order_by(*self.ordering)
+            return combined if stop is None else combined[:stop]
+        if stop is not None and connection.features.supports_slicing_ordering_in_compound:
+            # Each branch needs at most stop rows, so both can stop early on their index
+            branches = [branch.order_by(*self.ordering)[:stop] for branch in branches]
+        combined = branches[0].union(branches[1], all=True).order_by(*self.ordering)
+        return combined if stop is None else combined[:stop]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        ids = [row['id'] for row in self.id_queryset(stop)][start:]
+        if self.base.query.values_select:
+            # Named values_list() rows (see backend.fastpath) carry a pk field
+            rows = {row.pk: row for row in self.base.filter(pk__in=ids)}
+        else:
+            rows = self.base.in_bulk(ids)
+        # Rows deleted between the two queries are skipped
+        return [rows[pk] for pk in ids if pk in rows]
+
+    def __iter__(self):
+        return iter(self[:None])
+
+    def iterator(self, *fields, chunk_size=2000):
+        """
+        Stream every row as a values_list(*fields) tuple, merging the two
+        branches' server-side cursors in (timestamp, id) order.
+        fields must start with 'timestamp', 'id'.
+        """
+        descending = self.ordering[0].startswith('-')
+        ordering = ('-timestamp', '-id') if descending else ('timestamp', 'id')
+        streams = [
+            branch.order_by(*ordering).values_list(*fields).iterator(chunk_size=chunk_size)
+            for branch in self.branches()
+        ]
+        return heapq.merge(*streams, key=lambda row: (row[0], row[1]), reverse=descending)
+
+
+def filter_history(history, params):
+    """
+    Apply validated HistoryFilterSerializer params as sargable predicates:
+    half-open timestamp and amount ranges, and the counterparty as a scalar
+    subquery on the unique account number, so no extra round trip is needed.
+    """
+    if params.get('start_date'):
+        history = history.filter(timestamp__gte=start_of_day(params['start_date']))
+    if params.get('end_date'):
+        history = history.filter(timestamp__lt=start_of_day(params['end_date'] + timedelta(days=1)))
+    if params.get('min_amount') is not None:
+        history = history.filter(amount__gte=params['min_amount'])
+    if params.get('max_amount') is not None:
+        history = history.filter(amount__lte=params['max_amount'])
+    if params.get('status'):
+        history = history.filter(status=params['status'])
+    if params.get('flagged') is not None:
+        history = history.filter(flagged=params['flagged'])
+    counterparty = None
+    if params.get('counterparty'):
+        counterparty = Subquery(
+            BankAccount.objects.filter(account_number=params['counterparty']).values('pk')[:1]
+        )
+    if params.get('direction') or counterparty is not None:
+        history = history.narrow(params.get('direction'), counterparty)
+    return history
@@ -0,0 +1,149 @@
+"""
+Idempotency-Key support for transfer endpoints.
+A request carrying an Idempotency-Key header is processed at most once per
+user and key; retries within the TTL get the stored response back.
+"""
+
+import hashlib
+import json
+import time
+from functools import wraps
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+# Seconds between checks while waiting on an in-flight duplicate
+POLL_INTERVAL = 0.1
+
+
+def request_fingerprint(request):
+    """Hash of the endpoint and payload, used to detect key reuse"""
+    payload = json.dumps(request.data, cls=JSONEncoder, sort_keys=True)
+    return hashlib.sha256(f'{request.path}\n{payload}'.encode()).hexdigest()
+
+
+def replay(record):
+    """Rebuild the stored response for a repeated request"""
+    return Response(
+        json.loads(record.response_body),
+        status=record.response_status,
+        headers={REPLAY_HEADER: 'true'}
+    )
+
+
+def reclaimable(record, fingerprint, now):
+    """Whether a stored key may be taken over by a new request"""
+    if record.created_at < now - settings.IDEMPOTENCY_KEY_TTL:
+        # Expired keys are treated as never seen
+        return True
+    # A claim whose lease ran out without a response belongs to a worker
+    # that died mid-request; only a retry of the same request may take it
+    return (
+        record.response_status is None
+        and record.request_hash == fingerprint
+        and (record.claimed_at is None or record.claimed_at < now - settings.IDEMPOTENCY_KEY_LEASE)
+    )
+
+
+def claim(user, key, fingerprint):
+    """
+    (record, created) for the user's key, in its own short transaction so
+    the claim is visible to duplicates at once. Expired keys and abandoned
+    claims are reset in place under a row lock; the update is conditional
+    on the row being unchanged, so only one of two racing requests wins.
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        record, created = IdempotencyKey.objects.get_or_create(
+            user=user,
+            key=key,
+            defaults={'request_hash': fingerprint, 'claimed_at': now}
+        )
+        if created or not reclaimable(record, fingerprint, now):
+            return record, created
+
+        record = IdempotencyKey.objects.select_for_update().get(pk=record.pk)
+        if not reclaimable(record, fingerprint, now):
+            return record, False
+        reclaimed = IdempotencyKey.objects.filter(
+            pk=record.pk,
+            created_at=record.created_at,
+            claimed_at=record.claimed_at
+        ).update(
+            request_hash=fingerprint,
+            response_status=None,
+            response_body=None,
+            created_at=now,
+            claimed_at=now
+        )
+        record.refresh_from_db()
+    return record, bool(reclaimed)
+
+
+def idempotent(view_method):
+    """
+    Decorator for view methods that move money.
+
+    The key is claimed in a short transaction of its own before the view
+    runs, so the transfer keeps its deadlock retries and fraud screening
+    holds no locks. A duplicate arriving while the first request is still
+    running waits up to IDEMPOTENCY_KEY_WAIT for its response and replays
+    it; if the first request is still running after that it gets 409.
+    Server errors release the key so the client can retry, and a claim
+    left behind by a dead worker is taken over once its
+    IDEMPOTENCY_KEY_LEASE runs out.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, created = claim(request.user, key, fingerprint)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_KEY_WAIT.total_seconds()
+        while (not created and record.response_status is None
+               and record.request_hash == fingerprint and time.monotonic() < deadline):
+            time.sleep(POLL_INTERVAL)
+            record, created = claim(request.user, key, fingerprint)
+        if not created:
+            if record.request_hash != fingerprint:
+                return Response(
+                    {'error': 'Idempotency-Key was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.response_status is None:
+                return Response(
+                    {'error': 'A request with this Idempotency-Key is still being processed'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return replay(record)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+            return response
+
+        record.response_status = response.status_code
+        record.response_body = json.dumps(response.data, cls=JSONEncoder)
+        record.save(update_fields=['response_status', 'response_body'])
+        return response
+
+    return wrapper
@@ -0,0 +1,133 @@
+"""
+Time-ordered transaction ID generator.
+Snowflake-style IDs built in-process without a database round trip.
+
+Bit layout (82 bits, most significant first):
+    42 bits  milliseconds since 2025-01-01 UTC (good for ~139 years)
+     8 bits  node id (TRANSACTION_ID_NODE setting)
+    22 bits  process id (Linux pids never exceed 2**22)
+    10 bits  per-process sequence within one millisecond
+
+Without TRANSACTION_ID_NODE the node and process fields are replaced by
+30 random bits per process: hostname hashes collide across a fleet and
+containers tend to share pid 1.
+
+The number is rendered as 16 fixed-width base36 digits after the TXN
+prefix (19 characters), so IDs sort lexicographically in creation order.
+"""
+
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+
+PREFIX = 'TXN'
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+
+NODE_BITS = 8
+PROCESS_BITS = 22
+SEQUENCE_BITS = 10
+WIDTH = 16
+
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+PROCESS_MASK = (1 << PROCESS_BITS) - 1
+NODE_MASK = (1 << NODE_BITS) - 1
+TIMESTAMP_SHIFT = NODE_BITS + PROCESS_BITS + SEQUENCE_BITS
+
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+# Every 3-digit base36 string, so encoding takes 6 divmods instead of 16
+TRIPLETS = [a + b + c for a in DIGITS for b in DIGITS for c in DIGITS]
+
+
+def default_node_id():
+    """Node id from settings, or None when it is not configured"""
+    node = getattr(settings, 'TRANSACTION_ID_NODE', None)
+    if node in (None, ''):
+        return None
+    return int(node) & NODE_MASK
+
+
+def to_base36(number):
+    """Fixed-width (16 digit) base36 rendering of a non-negative integer"""
+    number, e = divmod(number, 46656)
+    number, d = divmod(number, 46656)
+    number, c = divmod(number, 46656)
+    number, b = divmod(number, 46656)
+    number, a = divmod(number, 46656)
+    return DIGITS[number] + TRIPLETS[a] + TRIPLETS[b] + TRIPLETS[c] + TRIPLETS[d] + TRIPLETS[e]
+
+
+class SnowflakeGenerator:
+    """
+    Thread-safe, fork-aware generator of unique, time-ordered integers.
+    The process identity (node and pid, or random bits) is part of every
+    ID, so workers never need to coordinate.
+    """
+
+    def __init__(self, node_id=None):
+        self.node_id = node_id
+        self._lock = threading.Lock()
+        self._pid = None
+        self._identity = 0
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def next_int(self):
+        with self._lock:
+            pid = os.getpid()
+            if pid != self._pid:
+                # First call in this process (or first after a fork)
+                node_id = self.node_id if self.node_id is not None else default_node_id()
+                if node_id is None:
+                    self._identity = secrets.randbits(NODE_BITS + PROCESS_BITS)
+                else:
+                    self._identity = (node_id << PROCESS_BITS) | (pid & PROCESS_MASK)
+                self._pid = pid
+                self._last_ms = -1
+                self._sequence = 0
+
+            now = time.time_ns() // 1_000_000 - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # Same millisecond, or the wall clock stepped back: keep
+                # counting on the last timestamp so IDs stay monotonic
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    # Sequence exhausted, borrow the next millisecond
+                    self._last_ms += 1
+
+            return (
+                (self._last_ms << TIMESTAMP_SHIFT)
+                | (self._identity << SEQUENCE_BITS)
+                | self._sequence
+            )
+
+    def next_id(self):
+        return PREFIX + to_base36(self.next_int())
+
+
+_generator = SnowflakeGenerator()
+
+if hasattr(os, 'register_at_fork'):
+    # A lock held by another thread at fork time would never be released in the child
+    os.register_at_fork(after_in_child=_generator._reset)
+
+
+def generate_transaction_id():
+    """Generate a unique, k-sortable transaction ID like TXN00B3VQ8K1Z0H2C5D"""
+    return _generator.next_id()
+
+
+def transaction_id_timestamp(transaction_id):
+    """Creation time (UTC, millisecond precision) encoded in a transaction ID"""
+    number = int(transaction_id[len(PREFIX):], 36)
+    milliseconds = (number >> TIMESTAMP_SHIFT) + EPOCH_MS
+    return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(milliseconds=milliseconds)
@@ -0,0 +1,218 @@
+"""
+Latency benchmark for transaction history pagination.
+Spreads transactions over throwaway accounts with a Zipf-like skew (the
+account of rank r is picked with weight 1 / r ** skew), so one hot account
+holds a large share of the rows and most accounts have a short history.
+Times fetching one of the hot account's pages at increasing depths, with
+OFFSET pagination (plus its COUNT) against keyset cursors, both over the OR
+query and over the UNION ALL history query. Then times the first page of
+typical filtered histories (date range, amounts, counterparty, direction,
+status, flagged) and reports p50/p95 for a typical (median) account and
+for the hot one.
+
+Seeding is chunked, so the table can be made as large as the disk allows.
+
+Usage:
+    python manage.py benchmark_history --transactions 50000 --depths 1,10,100,1000
+    python manage.py benchmark_history --transactions 10000000 --accounts 5000 --skip-pagination --repeat 100
+"""
+
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from transactions.history import AccountHistory, filter_history
+from transactions.models import Transaction
+from transactions.pagination import KeysetPagination, encode_cursor
+from transactions.serializers import HistoryFilterSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare OFFSET and keyset history pagination latency at several page depths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=20000,
+                            help='Transactions spread over the benchmark accounts')
+        parser.add_argument('--depths', default='1,10,100,500',
+                            help='Comma separated page numbers to fetch')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Timed fetches per depth or filter')
+        parser.add_argument('--accounts', type=int, default=200,
+                            help='Benchmark accounts the transactions are spread over')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of account activity; 0 spreads rows evenly')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, so runs seed the same distribution')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows inserted per seeding round trip')
+        parser.add_argument('--skip-pagination', action='store_true',
+                            help='Only run the filtered history benchmark')
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        depths = [int(d) for d in options['depths'].split(',') if d.strip()]
+        tag = uuid.uuid4().hex[:8]
+        # Ranked by activity: accounts[0] is the hot account
+        accounts = self.create_accounts(tag, max(options['accounts'], 2))
+        try:
+            counts = self.create_transactions(
+                accounts, options['transactions'], options['chunk_size'],
+                options['skew'], random.Random(options['seed'])
+            )
+            hot = accounts[0]
+            active = sorted((account for account in accounts if counts[account.pk]), key=lambda a: counts[a.pk])
+            typical = active[len(active) // 2]
+            self.stdout.write(
+                f"Database: {connection.vendor}, {options['transactions']} transactions over "
+                f"{len(accounts)} accounts; hot account {counts[hot.pk]} rows, "
+                f"typical (median) account {counts[typical.pk]} rows"
+            )
+            if not options['skip_pagination']:
+                self.report_pagination(hot, depths, page_size, counts[hot.pk], options['repeat'])
+            self.report_filters(
+                [('typical', typical, hot), ('hot', hot, accounts[1])], page_size, options['repeat']
+            )
+        finally:
+            User.objects.filter(username__startswith=f'bench_{tag}_').delete()
+
+    def report_pagination(self, account, depths, page_size, transactions, repeat):
+        queryset = Transaction.objects.filter(
+            Q(sender_account=account) | Q(receiver_account=account)
+        )
+        history = AccountHistory(account)
+        self.stdout.write(f"{'page':>8} {'offset ms':>10} {'keyset ms':>10} {'union ms':>10}")
+        for depth in depths:
+            offset = (depth - 1) * page_size
+            if offset >= transactions:
+                break
+            offset_ms = statistics.median(self.time(repeat, self.fetch_offset, queryset, offset, page_size))
+            request = self.keyset_request(queryset, offset, page_size)
+            keyset_ms = statistics.median(self.time(repeat, self.fetch_keyset, queryset, request))
+            union_ms = statistics.median(self.time(repeat, self.fetch_keyset, history, request))
+            self.stdout.write(f"{depth:>8} {offset_ms:>10.2f} {keyset_ms:>10.2f} {union_ms:>10.2f}")
+
+    def report_filters(self, subjects, page_size, repeat):
+        """
+        First page of each filtered history, as the history view builds it.
+        subjects are (label, account, counterparty) triples, reported side by side.
+        """
+        request = self.keyset_request(None, 0, page_size)
+        header = ''.join(f" {label + ' p50':>12} {label + ' p95':>12}" for label, _, _ in subjects)
+        self.stdout.write(f"{'filter':>16}{header}")
+        rows = {}
+        for label, account, counterparty in subjects:
+            newest = AccountHistory(account)[0].timestamp.date()
+            week = {'start_date': newest - timedelta(days=7), 'end_date': newest}
+            scenarios = [
+                ('last 7 days', week),
+                ('amount >= 990', {'min_amount': '990'}),
+                ('amount 100-200', {'min_amount': '100', 'max_amount': '200'}),
+                ('counterparty', {'counterparty': counterparty.account_number}),
+                ('received', {'direction': 'received'}),
+                ('flagged', {'flagged': 'true'}),
+                ('failed', {'status': 'failed'}),
+                ('combined', dict(week, counterparty=counterparty.account_number, min_amount='500')),
+            ]
+            for name, params in scenarios:
+                filters = HistoryFilterSerializer(data=params)
+                filters.is_valid(raise_exception=True)
+                history = filter_history(AccountHistory(account), filters.validated_data)
+                samples = self.time(repeat, self.fetch_keyset, history, request)
+                p95 = statistics.quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
+                rows.setdefault(name, []).extend([statistics.median(samples), p95])
+        for name, values in rows.items():
+            self.stdout.write(f"{name:>16}" + ''.join(f" {value:>12.2f}" for value in values))
+
+    def create_accounts(self, tag, count):
+        """Create benchmark users; the banking signal opens an account for each"""
+        users = [
+            User.objects.create(username=f'bench_{tag}_{i}', email=f'bench_{tag}_{i}@example.com', role='customer')
+            for i in range(count)
+        ]
+        return [user.bank_account for user in users]
+
+    def create_transactions(self, accounts, count, chunk_size, skew, rng):
+        """
+        Seed count transfers between accounts, a second apart, with varied
+        amounts and a sprinkling of flagged and failed rows. Both ends are
+        drawn with weight 1 / rank ** skew. Returns the rows per account pk.
+        """
+        cum_weights = []
+        total = 0
+        for rank in range(1, len(accounts) + 1):
+            total += 1 / rank ** skew
+            cum_weights.append(total)
+        ranks = range(len(accounts))
+        counts = Counter()
+
+        started = timezone.now() - timedelta(seconds=count)
+        last_pk = Transaction.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for offset in range(0, count, chunk_size):
+            indexes = range(offset, min(offset + chunk_size, count))
+            senders = rng.choices(ranks, cum_weights=cum_weights, k=len(indexes))
+            receivers = rng.choices(ranks, cum_weights=cum_weights, k=len(indexes))
+            transactions = []
+            for i, sender, receiver in zip(indexes, senders, receivers):
+                if sender == receiver:
+                    receiver = (receiver + 1) % len(accounts)
+                counts[accounts[sender].pk] += 1
+                counts[accounts[receiver].pk] += 1
+                transactions.append(Transaction(
+                    transaction_id=Transaction.generate_transaction_id(),
+                    sender_account=accounts[sender],
+                    receiver_account=accounts[receiver],
+                    amount=Decimal(1 + i % 1000),
+                    status='failed' if i % 53 == 0 else 'completed',
+                    flagged=i % 97 == 0
+                ))
+            transactions = Transaction.objects.bulk_create(transactions, batch_size=1000)
+            # bulk_create stamps every row with the same time; spread them a
+            # second apart like real traffic
+            if transactions[0].pk is None:
+                transactions = list(Transaction.objects.filter(pk__gt=last_pk).order_by('pk').only('pk'))
+            for i, transaction_obj in zip(indexes, transactions):
+                transaction_obj.timestamp = started + timedelta(seconds=i)
+            Transaction.objects.bulk_update(transactions, ['timestamp'], batch_size=1000)
+            last_pk = max(transaction_obj.pk for transaction_obj in transactions)
+        return counts
+
+    @staticmethod
+    def time(repeat, func, *args):
+        """Wall time of each call in milliseconds"""
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(*args)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    @staticmethod
+    def fetch_offset(queryset, offset, page_size):
+        queryset.count()
+        return list(queryset.order_by('-timestamp', '-pk')[offset:offset + page_size])
+
+    @staticmethod
+    def keyset_request(queryset, offset, page_size):
+        """Request carrying the cursor a client holds after reading the previous page"""
+        params = {'page_size': page_size}
+        if offset:
+            last = queryset.order_by('-timestamp', '-pk').values('timestamp', 'pk')[offset - 1]
+            params['cursor'] = encode_cursor(last['timestamp'], last['pk'])
+        return Request(APIRequestFactory().get('/api/transactions/history/', params, HTTP_HOST='localhost'))
+
+    @staticmethod
+    def fetch_keyset(queryset, request):
+        return KeysetPagination().paginate_queryset(queryset, request)
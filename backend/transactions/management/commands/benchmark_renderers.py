@@ -0,0 +1,107 @@
+"""
+Microbenchmark for list page rendering.
+Times loading, serializing and rendering one page of transactions the
+regular way (model instances, TransactionSerializer, JSONRenderer) against
+the fast path (values_list rows, compiled plan, FastJSONRenderer), and
+checks that both produce the same bytes.
+
+Usage:
+    python manage.py benchmark_renderers --page-size 100 --repeat 200
+"""
+
+import statistics
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from backend import fastpath
+from transactions.models import Transaction
+from transactions.serializers import TransactionSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare regular and fast-path serialization and JSON rendering of a list page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=100,
+                            help='Timed runs per step; the median is reported')
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        tag = uuid.uuid4().hex[:8]
+        users = [
+            User.objects.create(username=f'bench_{tag}_{i}', email=f'bench_{tag}_{i}@example.com', role='customer')
+            for i in range(2)
+        ]
+        try:
+            sender, receiver = (user.bank_account for user in users)
+            Transaction.objects.bulk_create([
+                Transaction(
+                    transaction_id=Transaction.generate_transaction_id(),
+                    sender_account=sender,
+                    receiver_account=receiver,
+                    amount=Decimal(i % 5000) + Decimal('0.25'),
+                    description=f'benchmark payment {i}',
+                    flagged=i % 3 == 0,
+                    fraud_score=0.35 if i % 3 == 0 else None,
+                    fraud_reason='Unusual amount' if i % 3 == 0 else None
+                )
+                for i in range(page_size)
+            ])
+            self.report(Transaction.objects.filter(sender_account=sender).order_by('-timestamp', '-pk'),
+                        page_size, options['repeat'])
+        finally:
+            User.objects.filter(username__startswith=f'bench_{tag}_').delete()
+
+    def report(self, queryset, page_size, repeat):
+        plan = fastpath.compile_rows(TransactionSerializer(context={'fields': None}), ('timestamp',))
+        instances = queryset.select_related('sender_account__user', 'receiver_account__user')[:page_size]
+        rows = queryset.values_list(*plan.columns, named=True)[:page_size]
+
+        def envelope(results):
+            return {'next': None, 'previous': None, 'results': results}
+
+        regular_page, fast_page = list(instances), list(rows)
+        regular_data = envelope(TransactionSerializer(regular_page, many=True).data)
+        fast_data = envelope(plan(fast_page))
+        expected = JSONRenderer().render(regular_data)
+        if fastpath.FastJSONRenderer().render(fast_data) != expected:
+            raise CommandError('Fast path output differs from the serializer output')
+
+        def stdlib_render():
+            with mock.patch.object(fastpath, 'orjson', None):
+                return fastpath.FastJSONRenderer().render(fast_data)
+
+        steps = [
+            ('load', lambda: list(instances.all()), lambda: list(rows.all())),
+            ('serialize', lambda: TransactionSerializer(regular_page, many=True).data, lambda: plan(fast_page)),
+            ('render', lambda: JSONRenderer().render(regular_data),
+             lambda: fastpath.FastJSONRenderer().render(fast_data)),
+        ]
+        encoder = 'orjson' if fastpath.orjson is not None else 'json (install orjson for the fast encoder)'
+        self.stdout.write(f'{page_size} rows per page, fast encoder: {encoder}')
+        self.stdout.write(f"{'step':>10} {'regular ms':>11} {'fast ms':>8} {'speedup':>8}")
+        totals = [0, 0]
+        for name, regular, fast in steps:
+            regular_ms, fast_ms = self.time(repeat, regular), self.time(repeat, fast)
+            totals[0] += regular_ms
+            totals[1] += fast_ms
+            self.stdout.write(f'{name:>10} {regular_ms:>11.3f} {fast_ms:>8.3f} {regular_ms / fast_ms:>7.1f}x')
+        self.stdout.write(f"{'total':>10} {totals[0]:>11.3f} {totals[1]:>8.3f} {totals[0] / totals[1]:>7.1f}x")
+        if fastpath.orjson is not None:
+            self.stdout.write(f"{'render (stdlib json)':>21} {self.time(repeat, stdlib_render):.3f} ms")
+
+    @staticmethod
+    def time(repeat, func):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
@@ -0,0 +1,117 @@
+"""
+Concurrency benchmark for the transfer engine.
+Runs random transfers between throwaway accounts with an increasing number
+of worker threads and reports transfers per second for each level.
+
+With --hot-buckets N every transfer goes to one receiver, first with the
+receiver unsharded and then split over N balance buckets, to show the
+effect of sharding a high fan-in account.
+
+Run it against PostgreSQL (DATABASE_URL) to measure scaling. SQLite takes
+one writer at a time, so extra workers only queue and retry on the
+database lock there; its numbers are single-writer throughput and fall as
+workers are added.
+
+Usage:
+    python manage.py benchmark_transfers --workers 1,2,4,8 --transfers 500
+    python manage.py benchmark_transfers --hot-buckets 16
+"""
+
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from banking.buckets import set_bucket_count
+from banking.models import BankAccount
+from transactions.services import TransferError, execute_transfer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Measure transfer throughput against the configured database at several worker counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4,8',
+                            help='Comma separated worker counts to benchmark')
+        parser.add_argument('--transfers', type=int, default=500,
+                            help='Transfers executed per worker count')
+        parser.add_argument('--accounts', type=int, default=20,
+                            help='Number of benchmark accounts to spread transfers over')
+        parser.add_argument('--hot-buckets', type=int, default=0,
+                            help='Send every transfer to one receiver and compare it unsharded '
+                                 'against this many balance buckets')
+
+    def handle(self, *args, **options):
+        worker_counts = [int(w) for w in options['workers'].split(',') if w.strip()]
+        tag = uuid.uuid4().hex[:8]
+        accounts = self.create_accounts(tag, options['accounts'])
+
+        self.stdout.write(f"Database: {connection.vendor}")
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite serializes writers: these numbers are single-writer throughput '
+                'and do not show scaling. Use PostgreSQL to compare worker counts.'
+            ))
+        try:
+            if options['hot_buckets']:
+                hot, senders = accounts[0], accounts[1:]
+                for buckets in (0, options['hot_buckets']):
+                    set_bucket_count(hot, buckets)
+                    self.stdout.write(f"Hot receiver with {buckets} balance buckets")
+                    self.report(senders, worker_counts, options['transfers'], receiver=hot)
+            else:
+                self.report(accounts, worker_counts, options['transfers'])
+        finally:
+            User.objects.filter(username__startswith=f'bench_{tag}_').delete()
+
+    def create_accounts(self, tag, count):
+        """Create benchmark users; the banking signal opens an account for each"""
+        for i in range(count):
+            User.objects.create(
+                username=f'bench_{tag}_{i}',
+                email=f'bench_{tag}_{i}@example.com',
+                role='customer'
+            )
+        accounts = BankAccount.objects.filter(user__username__startswith=f'bench_{tag}_')
+        accounts.update(balance=Decimal('1000000.00'), daily_limit=Decimal('99999999.99'))
+        return list(accounts)
+
+    def report(self, accounts, worker_counts, transfers, receiver=None):
+        self.stdout.write(f"{'workers':>8} {'transfers':>10} {'failed':>7} {'seconds':>8} {'tps':>9}")
+        for workers in worker_counts:
+            completed, failed, elapsed = self.run(accounts, workers, transfers, receiver)
+            self.stdout.write(
+                f"{workers:>8} {completed:>10} {failed:>7} {elapsed:>8.2f} {completed / elapsed:>9.1f}"
+            )
+
+    def run(self, accounts, workers, transfers, hot_receiver=None):
+        """Split transfers over worker threads, each with its own DB connection"""
+        def worker(count):
+            completed = 0
+            try:
+                for _ in range(count):
+                    if hot_receiver:
+                        sender, receiver = random.choice(accounts), hot_receiver
+                    else:
+                        sender, receiver = random.sample(accounts, 2)
+                    try:
+                        execute_transfer(sender, receiver, Decimal('1.00'), description='benchmark')
+                        completed += 1
+                    except (TransferError, DatabaseError):
+                        # Counted as failed; the run carries on
+                        pass
+            finally:
+                connection.close()
+            return completed
+
+        shares = [transfers // workers + (1 if i < transfers % workers else 0) for i in range(workers)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            completed = sum(pool.map(worker, shares))
+        elapsed = time.perf_counter() - started
+        return completed, transfers - completed, elapsed
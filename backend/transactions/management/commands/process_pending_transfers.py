@@ -0,0 +1,45 @@
+"""
+Worker that settles transfers submitted with "Prefer: respond-async".
+Pending rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+workers can run side by side (on SQLite, claims are serialized instead).
+
+Usage:
+    python manage.py process_pending_transfers            # drain the queue and exit
+    python manage.py process_pending_transfers --loop     # keep polling
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from transactions.services import process_pending_transfers
+
+
+class Command(BaseCommand):
+    help = 'Settle pending asynchronous transfers in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Pending transfers claimed per database transaction')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new transfers instead of exiting when idle')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty (with --loop)')
+
+    def handle(self, *args, **options):
+        total_completed = total_failed = 0
+        while True:
+            close_old_connections()
+            completed, failed = process_pending_transfers(options['batch_size'])
+            total_completed += completed
+            total_failed += failed
+
+            if completed or failed:
+                self.stdout.write(f'Settled batch: {completed} completed, {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {total_completed} completed, {total_failed} failed'
+        ))
@@ -0,0 +1,34 @@
+"""
+Delete idempotency keys older than IDEMPOTENCY_KEY_TTL.
+Meant to run periodically (e.g. hourly cron).
+
+Usage:
+    python manage.py purge_idempotency_keys
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from transactions.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Sweep expired idempotency keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows deleted per statement to keep locks short')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+        expired = IdempotencyKey.objects.filter(created_at__lt=cutoff)
+
+        total = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+            total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {total} expired idempotency keys'))
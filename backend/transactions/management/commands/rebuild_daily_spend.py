@@ -0,0 +1,59 @@
+"""
+Rebuild the per-account daily spend counters from the transactions table.
+
+Usage:
+    python manage.py rebuild_daily_spend            # today only
+    python manage.py rebuild_daily_spend --days 30  # backfill the last 30 days
+    python manage.py rebuild_daily_spend --all
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from transactions.models import DailySpend, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or backfill daily spend counters from completed transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1,
+                            help='Number of UTC days to rebuild, ending today')
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild counters for the whole transaction history')
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        first_day = None if options['all'] else today - timedelta(days=options['days'] - 1)
+
+        transactions = Transaction.objects.filter(status='completed')
+        counters = DailySpend.objects.all()
+        if first_day:
+            transactions = transactions.filter(timestamp__date__gte=first_day)
+            counters = counters.filter(date__gte=first_day)
+
+        totals = (
+            transactions
+            .annotate(day=TruncDate('timestamp'))
+            .values('sender_account', 'day')
+            .annotate(total=Sum('amount'))
+            .order_by()
+        )
+
+        with db_transaction.atomic():
+            deleted, _ = counters.delete()
+            created = DailySpend.objects.bulk_create(
+                [
+                    DailySpend(account_id=row['sender_account'], date=row['day'], amount=row['total'])
+                    for row in totals.iterator()
+                ],
+                batch_size=1000
+            )
+
+        scope = 'all days' if first_day is None else f'{first_day} to {today}'
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(created)} daily spend counters ({deleted} replaced) for {scope}'
+        ))
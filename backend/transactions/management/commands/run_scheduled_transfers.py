@@ -0,0 +1,50 @@
+"""
+Runner for standing orders (scheduled and recurring transfers).
+Due schedules are claimed with SELECT ... FOR UPDATE SKIP LOCKED and
+executed per sender through the batch transfer engine.
+
+Usage:
+    python manage.py run_scheduled_transfers            # run everything due and exit
+    python manage.py run_scheduled_transfers --loop     # keep polling (instead of cron)
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from transactions.scheduler import run_scheduled_transfers
+
+
+class Command(BaseCommand):
+    help = 'Execute due scheduled transfers in batches and report throughput and lag'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Schedules claimed per database transaction')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for due schedules instead of exiting when idle')
+        parser.add_argument('--interval', type=float, default=10.0,
+                            help='Seconds to sleep when nothing is due (with --loop)')
+
+    def handle(self, *args, **options):
+        total_completed = total_rejected = 0
+        while True:
+            close_old_connections()
+            stats = run_scheduled_transfers(options['batch_size'])
+            total_completed += stats['completed']
+            total_rejected += stats['rejected']
+
+            if stats['claimed']:
+                self.stdout.write(
+                    f"Ran {stats['claimed']} schedules for {stats['senders']} senders: "
+                    f"{stats['completed']} completed, {stats['rejected']} rejected in "
+                    f"{stats['seconds']:.2f}s ({stats['claimed'] / stats['seconds']:.1f}/s), "
+                    f"lag avg {stats['avg_lag']:.1f}s max {stats['max_lag']:.1f}s"
+                )
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {total_completed} completed, {total_rejected} rejected'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='failure_reason',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0002_balance_buckets'),
+        ('transactions', '0004_transaction_failure_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('frequency', models.CharField(choices=[('once', 'Once'), ('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='monthly', max_length=10)),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField(blank=True, null=True)),
+                ('next_run_at', models.DateTimeField()),
+                ('occurrences', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(blank=True, choices=[('completed', 'Completed'), ('rejected', 'Rejected')], max_length=10, null=True)),
+                ('last_error', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_transaction_id', models.CharField(blank=True, max_length=20, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('receiver_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_scheduled_transfers', to='banking.bankaccount')),
+                ('sender_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_transfers', to='banking.bankaccount')),
+            ],
+            options={
+                'verbose_name': 'Scheduled Transfer',
+                'verbose_name_plural': 'Scheduled Transfers',
+                'db_table': 'scheduled_transfers',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='scheduledtransfer',
+            index=models.Index(fields=['is_active', 'next_run_at'], name='scheduled_t_is_acti_c88566_idx'),
+        ),
+    ]
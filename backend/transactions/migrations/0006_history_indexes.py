@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0002_balance_buckets'),
+        ('transactions', '0005_scheduledtransfer'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender_account', 'timestamp', 'id'], name='txn_sender_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['receiver_account', 'timestamp', 'id'], name='txn_receiver_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('flagged', True)), fields=['timestamp'], name='txn_flagged_ts_idx'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='receiver_account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='received_transactions', to='banking.bankaccount'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='sender_account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sent_transactions', to='banking.bankaccount'),
+        ),
+    ]
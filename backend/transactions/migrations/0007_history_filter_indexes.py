@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender_account', 'receiver_account', 'timestamp', 'id'], name='txn_pair_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('flagged', True), models.Q(('status', 'completed'), _negated=True), _connector='OR'), fields=['sender_account', 'timestamp', 'id'], name='txn_sender_review_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('flagged', True), models.Q(('status', 'completed'), _negated=True), _connector='OR'), fields=['receiver_account', 'timestamp', 'id'], name='txn_receiver_review_idx'),
+        ),
+    ]
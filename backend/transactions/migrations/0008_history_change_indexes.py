@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_history_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender_account', 'updated_at'], name='txn_sender_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['receiver_account', 'updated_at'], name='txn_receiver_updated_idx'),
+        ),
+    ]
@@ -1,8 +1,8 @@
 from django.db import models
+from django.db.models import Q
+from django.conf import settings
 from banking.models import BankAccount
-from django.utils import timezone
-import random
-import string
+from .ids import generate_transaction_id
 
 
 class Transaction(models.Model):
@@ -18,15 +18,18 @@ class Transaction(models.Model):
     ]
 
     transaction_id = models.CharField(max_length=20, unique=True, editable=False)
+    # Covered by the composite history indexes below
     sender_account = models.ForeignKey(
         BankAccount,
         on_delete=models.CASCADE,
-        related_name='sent_transactions'
+        related_name='sent_transactions',
+        db_index=False
     )
     receiver_account = models.ForeignKey(
         BankAccount,
         on_delete=models.CASCADE,
-        related_name='received_transactions'
+        related_name='received_transactions',
+        db_index=False
     )
     amount = models.DecimalField(max_digits=15, decimal_places=2)
     description = models.TextField(blank=True, null=True)
@@ -34,6 +37,7 @@ class Transaction(models.Model):
     flagged = models.BooleanField(default=False)
     fraud_score = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
     fraud_reason = models.TextField(blank=True, null=True)
+    failure_reason = models.CharField(max_length=255, blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -42,6 +46,27 @@ class Transaction(models.Model):
         verbose_name = 'Transaction'
         verbose_name_plural = 'Transactions'
         ordering = ['-timestamp']
+        indexes = [
+            # One per branch of the history UNION ALL (see transactions.history)
+            models.Index(fields=['sender_account', 'timestamp', 'id'], name='txn_sender_ts_idx'),
+            models.Index(fields=['receiver_account', 'timestamp', 'id'], name='txn_receiver_ts_idx'),
+            # History filtered by counterparty, for either direction
+            models.Index(fields=['sender_account', 'receiver_account', 'timestamp', 'id'], name='txn_pair_ts_idx'),
+            # History filtered to flagged or unfinished rows, which are rare
+            models.Index(
+                fields=['sender_account', 'timestamp', 'id'], name='txn_sender_review_idx',
+                condition=Q(flagged=True) | ~Q(status='completed')
+            ),
+            models.Index(
+                fields=['receiver_account', 'timestamp', 'id'], name='txn_receiver_review_idx',
+                condition=Q(flagged=True) | ~Q(status='completed')
+            ),
+            # Latest change per account, for the conditional GET validators
+            models.Index(fields=['sender_account', 'updated_at'], name='txn_sender_updated_idx'),
+            models.Index(fields=['receiver_account', 'updated_at'], name='txn_receiver_updated_idx'),
+            # Review queue: flagged rows are a small fraction of the table
+            models.Index(fields=['timestamp'], name='txn_flagged_ts_idx', condition=Q(flagged=True)),
+        ]
 
     def __str__(self):
         return f"{self.transaction_id} - ${self.amount} ({self.sender_account.account_number} → {self.receiver_account.account_number})"
@@ -53,7 +78,118 @@ class Transaction(models.Model):
 
     @staticmethod
     def generate_transaction_id():
-        """Generate unique transaction ID with format TXN{timestamp}{random}"""
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        random_suffix = ''.join(random.choices(string.digits, k=4))
-        return f"TXN{timestamp}{random_suffix}"
+        """Generate unique, time-ordered transaction ID (see transactions.ids)"""
+        return generate_transaction_id()
+
+
+class DailySpend(models.Model):
+    """
+    Running total of what an account has sent on a given UTC day.
+    Updated in the same database transaction as the balance change so the
+    daily limit check is a single unique-key lookup.
+    """
+    account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.CASCADE,
+        related_name='daily_spend'
+    )
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_spend'
+        verbose_name = 'Daily Spend'
+        verbose_name_plural = 'Daily Spend'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'date'], name='unique_daily_spend'),
+        ]
+
+    def __str__(self):
+        return f"{self.account.account_number} - {self.date}: ${self.amount}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored outcome of a transfer request sent with an Idempotency-Key header.
+    Retries with the same key replay the stored response instead of moving money again.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Start of the in-flight lease; a claim with no response past the lease is abandoned
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.response_status})"
+
+
+class ScheduledTransfer(models.Model):
+    """
+    Standing order: a transfer repeated on a fixed schedule.
+    Due schedules are executed in batches by run_scheduled_transfers.
+    Occurrence n is due at start_at plus n periods, so monthly schedules
+    keep their day of month (clamped to short months) without drifting.
+    """
+    FREQUENCY_CHOICES = [
+        ('once', 'Once'),
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
+    LAST_STATUS_CHOICES = [
+        ('completed', 'Completed'),
+        ('rejected', 'Rejected'),
+    ]
+
+    sender_account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.CASCADE,
+        related_name='scheduled_transfers'
+    )
+    receiver_account = models.ForeignKey(
+        BankAccount,
+        on_delete=models.CASCADE,
+        related_name='incoming_scheduled_transfers'
+    )
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    description = models.TextField(blank=True, null=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='monthly')
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField(null=True, blank=True)
+    next_run_at = models.DateTimeField()
+    occurrences = models.PositiveIntegerField(default=0)  # runs attempted so far
+    is_active = models.BooleanField(default=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=10, choices=LAST_STATUS_CHOICES, blank=True, null=True)
+    last_error = models.CharField(max_length=255, blank=True, null=True)
+    last_transaction_id = models.CharField(max_length=20, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'scheduled_transfers'
+        verbose_name = 'Scheduled Transfer'
+        verbose_name_plural = 'Scheduled Transfers'
+        indexes = [
+            # The runner's claim query: active schedules by due time
+            models.Index(fields=['is_active', 'next_run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.frequency} ${self.amount} ({self.sender_account.account_number} → {self.receiver_account.account_number})"
@@ -0,0 +1,148 @@
+"""
+Keyset pagination for transaction lists.
+Pages are addressed by the (timestamp, id) of the last row seen instead of
+an OFFSET, so every page costs the same index range scan and rows inserted
+while a client is paging never shift or duplicate results.
+"""
+
+import base64
+import json
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(timestamp, pk, reverse=False):
+    """Opaque cursor pointing just past the row (timestamp, pk)"""
+    payload = {'t': timestamp.isoformat(), 'i': pk}
+    if reverse:
+        payload['r'] = 1
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, pk, reverse); raises ValueError on anything malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp = parse_datetime(payload['t'])
+        pk = int(payload['i'])
+    except (TypeError, KeyError, ValueError, UnicodeError):
+        raise ValueError(cursor)
+    if timestamp is None:
+        raise ValueError(cursor)
+    return timestamp, pk, bool(payload.get('r'))
+
+
+def estimate_count(queryset):
+    """
+    Row estimate for a queryset.
+    Uses the planner's estimate on PostgreSQL so no COUNT(*) scan runs;
+    other backends fall back to an exact count. Compound sources such as
+    AccountHistory are estimated branch by branch.
+    """
+    branches = getattr(queryset, 'branches', None)
+    if branches:
+        return sum(estimate_count(branch) for branch in branches())
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Newest-first pagination keyed on (timestamp, id).
+    Responses carry next/previous links with opaque cursors. The total is
+    only reported when the client asks for it with ?count=estimate.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.count = estimate_count(queryset)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                timestamp, pk, self.reverse = decode_cursor(cursor)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            if self.reverse:
+                # Walking back towards newer rows: scan ascending, then flip
+                queryset = queryset.filter(
+                    Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk),
+                    timestamp__gte=timestamp
+                ).order_by('timestamp', 'pk')
+            else:
+                # The redundant bound gives planners a range to seek to
+                queryset = queryset.filter(
+                    Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk),
+                    timestamp__lte=timestamp
+                ).order_by('-timestamp', '-pk')
+        else:
+            self.reverse = False
+            queryset = queryset.order_by('-timestamp', '-pk')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, bool(cursor)
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        return replace_query_param(self.base_url, self.cursor_query_param, encode_cursor(last.timestamp, last.pk))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        first = self.page[0]
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encode_cursor(first.timestamp, first.pk, reverse=True)
+        )
+
+    def get_paginated_response(self, data):
+        body = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            body = {'count_estimate': self.count, **body}
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_estimate'] = {'type': 'integer', 'nullable': True}
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [{
+            'name': self.count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Pass "estimate" to include an estimated total',
+            'schema': {'type': 'string', 'enum': ['estimate']},
+        }]
@@ -0,0 +1,160 @@
+"""
+Standing order runner.
+Due schedules are read in large batches and grouped by sender, so each
+sender's balance and daily limit are checked once per run and its legs are
+executed as one best-effort batch with bulk inserts. Every sender group is
+claimed and committed in a transaction of its own: it only locks that
+sender's rows, and a failure retries or skips just that group.
+"""
+
+import calendar
+import logging
+import time
+from datetime import timedelta
+from django.utils import timezone
+from fraud_detection.features import features_for
+from fraud_detection.rules import screen_transfer
+from .models import ScheduledTransfer
+from .services import TransferError, execute_batch_transfer, run_with_retries
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+
+def add_months(when, months):
+    """Shift a datetime by whole months, clamping to the end of shorter months"""
+    month_index = when.month - 1 + months
+    year, month = when.year + month_index // 12, month_index % 12 + 1
+    day = min(when.day, calendar.monthrange(year, month)[1])
+    return when.replace(year=year, month=month, day=day)
+
+
+def occurrence_at(schedule, n):
+    """When occurrence n (0-based) of a schedule is due, or None if there is none"""
+    if schedule.frequency == 'once':
+        when = schedule.start_at if n == 0 else None
+    elif schedule.frequency == 'monthly':
+        when = add_months(schedule.start_at, n)
+    else:
+        when = schedule.start_at + PERIODS[schedule.frequency] * n
+    if when is None or (schedule.end_at and when > schedule.end_at):
+        return None
+    return when
+
+
+def run_scheduled_transfers(batch_size=1000, now=None):
+    """
+    Execute up to batch_size due schedules.
+    Each sender group claims its rows with SELECT ... FOR UPDATE SKIP
+    LOCKED, so several runners can work side by side. A missed occurrence
+    runs once and the schedule then moves to its next occurrence, so a
+    runner that was down catches up one occurrence per schedule per run.
+    A group that fails is logged and stays due for the next run.
+
+    Returns a dict with claimed, completed, rejected, senders, seconds and
+    the average and maximum lag (seconds past the due time).
+    """
+    started = time.perf_counter()
+    now = now or timezone.now()
+    due = (
+        ScheduledTransfer.objects
+        .filter(is_active=True, next_run_at__lte=now)
+        .order_by('next_run_at', 'id')
+        .values_list('id', 'sender_account_id')[:batch_size]
+    )
+    by_sender = {}
+    for schedule_id, sender_id in due:
+        by_sender.setdefault(sender_id, []).append(schedule_id)
+
+    stats = {'claimed': 0, 'completed': 0, 'rejected': 0, 'senders': 0}
+    lags = []
+    for sender_id, schedule_ids in by_sender.items():
+        try:
+            group = run_with_retries(_run_sender_group, schedule_ids, now)
+        except Exception:
+            logger.exception('Scheduled transfers of sender account %s failed', sender_id)
+            continue
+        if not group['claimed']:
+            continue
+        stats['senders'] += 1
+        for name in ('claimed', 'completed', 'rejected'):
+            stats[name] += group[name]
+        lags.extend(group['lags'])
+
+    stats['avg_lag'] = sum(lags) / len(lags) if lags else 0.0
+    stats['max_lag'] = max(lags, default=0.0)
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def _run_sender_group(schedule_ids, now):
+    """Claim one sender's due schedules, execute them as one batch and advance them"""
+    # Another runner may hold or have advanced some of them since they were read
+    group = list(
+        ScheduledTransfer.objects
+        .select_for_update(skip_locked=True, of=('self',))
+        .select_related('sender_account', 'receiver_account')
+        .filter(pk__in=schedule_ids, is_active=True, next_run_at__lte=now)
+        .order_by('next_run_at', 'id')
+    )
+    if not group:
+        return {'claimed': 0, 'completed': 0, 'rejected': 0, 'lags': []}
+
+    sender_account = group[0].sender_account
+    receivers = {
+        schedule.receiver_account.account_number: schedule.receiver_account
+        for schedule in group
+    }
+    legs = []
+    features = features_for(sender_account)
+    for index, schedule in enumerate(group):
+        verdict = screen_transfer(
+            sender_account, schedule.amount, earlier_legs=index, features=features
+        )
+        legs.append({
+            'receiver_account': schedule.receiver_account.account_number,
+            'amount': schedule.amount,
+            'description': schedule.description or '',
+            'flagged': verdict.flagged,
+            'fraud_score': verdict.score,
+            'fraud_reason': verdict.reason,
+        })
+
+    try:
+        results = execute_batch_transfer(sender_account, legs, atomic=False, receivers=receivers)
+    except TransferError as e:
+        results = [{'status': 'rejected', 'error': e.message} for _ in group]
+
+    completed = rejected = 0
+    lags = []
+    for schedule, result in zip(group, results):
+        if result['status'] == 'completed':
+            completed += 1
+            schedule.last_status = 'completed'
+            schedule.last_error = None
+            schedule.last_transaction_id = result['transaction_id']
+        else:
+            rejected += 1
+            schedule.last_status = 'rejected'
+            schedule.last_error = result['error']
+
+        lags.append((now - schedule.next_run_at).total_seconds())
+        schedule.last_run_at = now
+        schedule.occurrences += 1
+        next_run_at = occurrence_at(schedule, schedule.occurrences)
+        if next_run_at is None:
+            schedule.is_active = False
+        else:
+            schedule.next_run_at = next_run_at
+        schedule.updated_at = now
+
+    ScheduledTransfer.objects.bulk_update(group, [
+        'last_run_at', 'last_status', 'last_error', 'last_transaction_id',
+        'occurrences', 'next_run_at', 'is_active', 'updated_at'
+    ], batch_size=500)
+
+    return {'claimed': len(group), 'completed': completed, 'rejected': rejected, 'lags': lags}
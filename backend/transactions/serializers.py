@@ -1,9 +1,11 @@
+from decimal import Decimal
 from rest_framework import serializers
-from .models import Transaction
-from banking.models import BankAccount
+from backend.projection import SparseFieldsetSerializerMixin
+from .models import ScheduledTransfer, Transaction
 
 
 class TransferSerializer(serializers.Serializer):
+    # The receiver is resolved (once) by the transfer engine, not here
     receiver_account = serializers.CharField(max_length=12)
     amount = serializers.DecimalField(max_digits=15, decimal_places=2)
     description = serializers.CharField(required=False, allow_blank=True)
@@ -15,13 +17,53 @@ class TransferSerializer(serializers.Serializer):
             raise serializers.ValidationError("Amount exceeds maximum transfer limit")
         return value
 
-    def validate_receiver_account(self, value):
-        if not BankAccount.objects.filter(account_number=value).exists():
-            raise serializers.ValidationError("Receiver account does not exist")
-        return value
+
+class BatchTransferSerializer(serializers.Serializer):
+    """Many transfer legs from the authenticated user's account"""
+    MAX_LEGS = 500
+    MODE_CHOICES = [
+        ('atomic', 'All or nothing'),
+        ('best_effort', 'Best effort'),
+    ]
+
+    mode = serializers.ChoiceField(choices=MODE_CHOICES, default='atomic')
+    legs = TransferSerializer(many=True, allow_empty=False, max_length=MAX_LEGS)
+
+
+class DateRangeFilterSerializer(serializers.Serializer):
+    """Inclusive start_date/end_date query parameters"""
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({'end_date': 'End date must not be before start date'})
+        return data
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class ExportFilterSerializer(DateRangeFilterSerializer):
+    """Query parameters of the statement export"""
+    account = serializers.CharField(max_length=12, required=False)  # admins and auditors only
+
+
+class HistoryFilterSerializer(DateRangeFilterSerializer):
+    """Query parameters of the transaction history; amount bounds are inclusive"""
+    min_amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0'), required=False)
+    max_amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0'), required=False)
+    counterparty = serializers.CharField(max_length=12, required=False)
+    direction = serializers.ChoiceField(choices=['sent', 'received'], required=False)
+    status = serializers.ChoiceField(choices=Transaction.STATUS_CHOICES, required=False)
+    flagged = serializers.BooleanField(required=False, allow_null=True)
+
+    def validate(self, data):
+        data = super().validate(data)
+        if (data.get('min_amount') is not None and data.get('max_amount') is not None
+                and data['max_amount'] < data['min_amount']):
+            raise serializers.ValidationError({'max_amount': 'Maximum amount must not be below minimum amount'})
+        return data
+
+
+class TransactionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     sender_account_number = serializers.CharField(source='sender_account.account_number', read_only=True)
     receiver_account_number = serializers.CharField(source='receiver_account.account_number', read_only=True)
     sender_name = serializers.CharField(source='sender_account.user.username', read_only=True)
@@ -35,3 +77,35 @@ class TransactionSerializer(serializers.ModelSerializer):
             'flagged', 'fraud_score', 'fraud_reason', 'timestamp'
         ]
         read_only_fields = ['id', 'transaction_id', 'status', 'flagged', 'fraud_score', 'timestamp']
+
+
+class TransactionStatusSerializer(TransactionSerializer):
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ['failure_reason', 'updated_at']
+
+
+class ScheduledTransferSerializer(serializers.ModelSerializer):
+    """Standing order owned by the authenticated user's account"""
+    # Resolved by the view with the same lookup as a transfer
+    receiver_account = serializers.CharField(max_length=12, write_only=True)
+    receiver_account_number = serializers.CharField(source='receiver_account.account_number', read_only=True)
+
+    class Meta:
+        model = ScheduledTransfer
+        fields = [
+            'id', 'receiver_account', 'receiver_account_number', 'amount', 'description',
+            'frequency', 'start_at', 'end_at', 'next_run_at', 'is_active',
+            'last_run_at', 'last_status', 'last_error', 'last_transaction_id', 'created_at'
+        ]
+        read_only_fields = [
+            'id', 'next_run_at', 'is_active', 'last_run_at', 'last_status',
+            'last_error', 'last_transaction_id', 'created_at'
+        ]
+
+    def validate_amount(self, value):
+        return TransferSerializer().validate_amount(value)
+
+    def validate(self, data):
+        if data.get('end_at') and data['end_at'] < data['start_at']:
+            raise serializers.ValidationError({'end_at': 'End must not be before start'})
+        return data
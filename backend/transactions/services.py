@@ -0,0 +1,487 @@
+"""
+Transfer engine.
+Moves money between accounts under row locks taken in a fixed order, with
+conditional balance updates and automatic retry on deadlocks.
+"""
+
+import random
+import time
+from django.db import OperationalError, connection, transaction as db_transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+from banking.buckets import credit_bucket, fold_buckets
+from banking.cache import invalidate_accounts
+from banking.models import BankAccount
+from fraud_detection.deep import schedule_deep_scoring
+from fraud_detection.features import track_transfers
+from fraud_detection.rules import screen_transfer
+from ledger.services import record_transfers
+from .events import publish_transfers
+from .models import DailySpend, Transaction
+
+# Retry policy for deadlocks / serialization failures
+MAX_ATTEMPTS = 10
+RETRY_BACKOFF = 0.01  # seconds, doubled on every attempt
+
+# PostgreSQL SQLSTATE codes that are safe to retry
+RETRYABLE_PGCODES = ('40001', '40P01')  # serialization_failure, deadlock_detected
+
+
+class TransferError(Exception):
+    """
+    Business rule violation raised by the transfer engine.
+    Carries the HTTP status code the API should answer with.
+    """
+    status_code = 400
+    default_message = 'Transfer failed'
+
+    def __init__(self, message=None):
+        self.message = message or self.default_message
+        super().__init__(self.message)
+
+
+class NoBankAccount(TransferError):
+    default_message = 'You do not have a bank account'
+
+
+class ReceiverNotFound(TransferError):
+    default_message = 'Receiver account does not exist'
+
+
+class SameAccount(TransferError):
+    default_message = 'Cannot transfer to your own account'
+
+
+class InsufficientBalance(TransferError):
+    default_message = 'Insufficient balance'
+
+
+class DailyLimitExceeded(TransferError):
+    status_code = 429
+    default_message = 'Daily transfer limit exceeded'
+
+
+class BatchRejected(TransferError):
+    """All-or-nothing batch aborted; results holds the per-leg outcome"""
+    default_message = 'Batch rejected'
+
+    def __init__(self, results, message=None, status_code=None):
+        super().__init__(message)
+        self.results = results
+        if status_code:
+            self.status_code = status_code
+
+
+def is_retryable(exc):
+    """Check whether a database error is a transient locking conflict"""
+    cause = exc.__cause__
+    if getattr(cause, 'pgcode', None) in RETRYABLE_PGCODES:
+        return True
+    # SQLite reports writer contention as a plain OperationalError
+    return 'database is locked' in str(exc)
+
+
+def run_with_retries(func, *args, **kwargs):
+    """
+    Run func inside its own atomic block, retrying on deadlocks.
+    When called inside an outer atomic block the caller owns the
+    transaction, so the error is propagated instead of retried.
+    """
+    attempts = 1 if connection.in_atomic_block else MAX_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            with db_transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as exc:
+            if attempt == attempts or not is_retryable(exc):
+                raise
+            # Exponential backoff with jitter so colliding workers spread out
+            time.sleep(RETRY_BACKOFF * (2 ** (attempt - 1)) * (1 + random.random()))
+
+
+def resolve_accounts(user, account_numbers):
+    """
+    Load the user's account and the given receiver accounts, with their
+    users, in a single query.
+    Returns (sender_account, {account_number: account}).
+    """
+    accounts = BankAccount.objects.select_related('user').filter(
+        Q(user=user) | Q(account_number__in=account_numbers)
+    )
+    sender_account = None
+    receivers = {}
+    for account in accounts:
+        if account.user_id == user.pk:
+            sender_account = account
+        if account.account_number in account_numbers:
+            receivers[account.account_number] = account
+
+    if sender_account is None:
+        raise NoBankAccount()
+    return sender_account, receivers
+
+
+def resolve_transfer(user, receiver_account_number):
+    """Resolve and validate both sides of a single transfer (one query)"""
+    sender_account, receivers = resolve_accounts(user, {receiver_account_number})
+    receiver_account = receivers.get(receiver_account_number)
+    if receiver_account is None:
+        raise ReceiverNotFound()
+    if receiver_account.pk == sender_account.pk:
+        raise SameAccount()
+    return sender_account, receiver_account
+
+
+def lock_accounts(*accounts, spend_day=None):
+    """
+    Lock the given accounts with SELECT ... FOR UPDATE.
+    Rows are locked in primary key order so two transfers touching the
+    same pair of accounts can never deadlock on each other.
+    Each account is annotated with spent_today, its daily spend counter
+    for spend_day (None if there is no counter row yet), so the limit
+    check needs no extra query.
+    """
+    pks = sorted({account.pk for account in accounts})
+    queryset = BankAccount.objects.select_for_update().filter(pk__in=pks).order_by('pk')
+    if spend_day:
+        queryset = queryset.annotate(spent_today=Subquery(
+            DailySpend.objects.filter(account=OuterRef('pk'), date=spend_day).values('amount')[:1]
+        ))
+    return {account.pk: account for account in queryset}
+
+
+def record_spend(account_id, amount, day, exists=True):
+    """
+    Add amount to the account's daily counter, creating it on first use.
+    Callers hold the sender's row lock, so update-or-create cannot race.
+    """
+    if exists:
+        updated = DailySpend.objects.filter(account_id=account_id, date=day).update(
+            amount=F('amount') + amount
+        )
+        if updated:
+            return
+    DailySpend.objects.create(account_id=account_id, date=day, amount=amount)
+
+
+def debit(account_id, amount, now):
+    """
+    Conditionally debit an account in a single UPDATE statement.
+    Returns False if the balance does not cover the amount.
+    """
+    return BankAccount.objects.filter(pk=account_id, balance__gte=amount).update(
+        balance=F('balance') - amount,
+        updated_at=now
+    ) == 1
+
+
+def credit(account_id, amount, now):
+    """Credit an account in a single UPDATE statement"""
+    BankAccount.objects.filter(pk=account_id).update(
+        balance=F('balance') + amount,
+        updated_at=now
+    )
+
+
+def credit_many(amounts, now):
+    """Credit several accounts ({account_id: amount}) in one UPDATE statement"""
+    if not amounts:
+        return
+    increment = Case(
+        *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+        output_field=DecimalField(max_digits=15, decimal_places=2)
+    )
+    BankAccount.objects.filter(pk__in=list(amounts)).update(
+        balance=F('balance') + increment,
+        updated_at=now
+    )
+
+
+def execute_transfer(sender_account, receiver_account, amount, description='',
+                     flagged=False, fraud_score=None, fraud_reason=None):
+    """
+    Atomically move amount from sender_account to receiver_account.
+    Returns the created Transaction and refreshes the in-memory balances
+    of both account objects. Raises TransferError on rule violations.
+    """
+    return run_with_retries(
+        _execute_transfer, sender_account, receiver_account, amount,
+        description, flagged, fraud_score, fraud_reason
+    )
+
+
+def _execute_transfer(sender_account, receiver_account, amount, description,
+                      flagged, fraud_score, fraud_reason):
+    now = _move_money(sender_account, receiver_account, amount)
+
+    transaction_obj = Transaction.objects.create(
+        sender_account=sender_account,
+        receiver_account=receiver_account,
+        amount=amount,
+        description=description,
+        status='completed',
+        flagged=flagged,
+        fraud_score=fraud_score,
+        fraud_reason=fraud_reason
+    )
+    record_transfers([transaction_obj], now)
+    track_transfers([transaction_obj])
+    schedule_deep_scoring([transaction_obj])
+    invalidate_accounts([sender_account, receiver_account])
+    publish_transfers([transaction_obj])
+    return transaction_obj
+
+
+def _move_money(sender_account, receiver_account, amount):
+    """
+    Lock both accounts, enforce the daily limit and balance, and apply the
+    debit, credit and daily counter. Must run inside an atomic block.
+    Hot receivers (bucket_count > 0) are not locked; their credit goes to
+    a random balance bucket instead.
+    """
+    now = timezone.now()
+    hot_receiver = receiver_account.bucket_count > 0
+    if hot_receiver:
+        locked = lock_accounts(sender_account, spend_day=now.date())
+    else:
+        locked = lock_accounts(sender_account, receiver_account, spend_day=now.date())
+    sender = locked[sender_account.pk]
+
+    if (sender.spent_today or 0) + amount > sender.daily_limit:
+        raise DailyLimitExceeded()
+    if sender.bucket_count and sender.balance < amount:
+        # Credits parked in buckets count towards what a hot account can spend
+        sender.balance += fold_buckets(sender.pk, now)
+    if not debit(sender.pk, amount, now):
+        raise InsufficientBalance()
+    if hot_receiver:
+        credit_bucket(receiver_account, amount, now)
+    else:
+        credit(receiver_account.pk, amount, now)
+    record_spend(sender.pk, amount, now.date(), exists=sender.spent_today is not None)
+
+    # Balances were read under lock, so the new values are exact
+    sender_account.balance = sender.balance - amount
+    if not hot_receiver:
+        receiver_account.balance = locked[receiver_account.pk].balance + amount
+        receiver_account.updated_at = now
+    sender_account.updated_at = now
+    return now
+
+
+def submit_transfer(sender_account, receiver_account, amount, description=''):
+    """
+    Queue a transfer for asynchronous settlement.
+    Only a pending Transaction row is written; fraud screening and money
+    movement happen in process_pending_transfers.
+    """
+    return run_with_retries(_submit_transfer, sender_account, receiver_account, amount, description)
+
+
+def _submit_transfer(sender_account, receiver_account, amount, description):
+    transaction_obj = Transaction.objects.create(
+        sender_account=sender_account,
+        receiver_account=receiver_account,
+        amount=amount,
+        description=description,
+        status='pending'
+    )
+    track_transfers([transaction_obj])
+    return transaction_obj
+
+
+def process_pending_transfers(batch_size=100):
+    """
+    Claim up to batch_size pending transfers and settle them.
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number
+    of workers can drain the queue side by side without double settling.
+    Returns (completed, failed).
+    """
+    return run_with_retries(_process_pending_transfers, batch_size)
+
+
+def _process_pending_transfers(batch_size):
+    batch = list(
+        Transaction.objects
+        .select_for_update(skip_locked=True, of=('self',))
+        .select_related('sender_account', 'receiver_account')
+        .filter(status='pending')
+        .order_by('id')[:batch_size]
+    )
+
+    completed = failed = 0
+    for transaction_obj in batch:
+        verdict = screen_transfer(
+            transaction_obj.sender_account, transaction_obj.amount,
+            counted_send=transaction_obj.timestamp
+        )
+        try:
+            with db_transaction.atomic():
+                now = _move_money(
+                    transaction_obj.sender_account,
+                    transaction_obj.receiver_account,
+                    transaction_obj.amount
+                )
+                Transaction.objects.filter(pk=transaction_obj.pk).update(
+                    status='completed',
+                    flagged=verdict.flagged,
+                    fraud_score=verdict.score,
+                    fraud_reason=verdict.reason,
+                    updated_at=now
+                )
+                transaction_obj.flagged = verdict.flagged
+                record_transfers([transaction_obj], now)
+                invalidate_accounts([transaction_obj.sender_account, transaction_obj.receiver_account])
+                transaction_obj.status = 'completed'
+                # Already counted as a send when it was submitted
+                track_transfers([transaction_obj], new_rows=False)
+                schedule_deep_scoring([transaction_obj])
+                publish_transfers([transaction_obj])
+            completed += 1
+        except TransferError as e:
+            Transaction.objects.filter(pk=transaction_obj.pk).update(
+                status='failed',
+                failure_reason=e.message,
+                updated_at=timezone.now()
+            )
+            failed += 1
+
+    return completed, failed
+
+
+def execute_batch_transfer(sender_account, legs, atomic=True, receivers=None):
+    """
+    Execute many transfer legs from one sender in a single database transaction.
+    Each leg is a dict with receiver_account (account number), amount and
+    optionally description, flagged, fraud_score and fraud_reason.
+    receivers maps account numbers to already resolved accounts; when
+    omitted they are loaded with one IN query.
+
+    In atomic mode any invalid leg aborts the whole batch with BatchRejected.
+    In best-effort mode invalid or unaffordable legs are rejected individually
+    and the rest are executed. Returns one result dict per leg, in order.
+    """
+    if receivers is None:
+        receivers = BankAccount.objects.in_bulk(
+            {leg['receiver_account'] for leg in legs},
+            field_name='account_number'
+        )
+
+    results = []
+    for index, leg in enumerate(legs):
+        result = {
+            'index': index,
+            'receiver_account': leg['receiver_account'],
+            'amount': leg['amount'],
+            'status': 'pending',
+        }
+        receiver = receivers.get(leg['receiver_account'])
+        if receiver is None:
+            result.update(status='rejected', error=ReceiverNotFound.default_message)
+        elif receiver.pk == sender_account.pk:
+            result.update(status='rejected', error=SameAccount.default_message)
+        results.append(result)
+
+    if atomic and any(result['status'] == 'rejected' for result in results):
+        raise BatchRejected(_abort_pending(results))
+
+    return run_with_retries(_execute_batch, sender_account, legs, receivers, results, atomic)
+
+
+def _abort_pending(results):
+    for result in results:
+        if result['status'] == 'pending':
+            result.update(status='aborted', error='Batch rejected')
+    return results
+
+
+def _execute_batch(sender_account, legs, receivers, results, atomic):
+    # Work on copies so a deadlock retry starts from a clean slate
+    results = [dict(result) for result in results]
+    pending = [result for result in results if result['status'] == 'pending']
+    now = timezone.now()
+    locked = lock_accounts(
+        sender_account,
+        *(receivers[result['receiver_account']] for result in pending
+          if not receivers[result['receiver_account']].bucket_count),
+        spend_day=now.date()
+    )
+    sender = locked[sender_account.pk]
+    if sender.bucket_count:
+        sender.balance += fold_buckets(sender.pk, now)
+
+    # Balance and daily limit are checked once for the whole batch
+    available = sender.balance
+    limit_left = sender.daily_limit - (sender.spent_today or 0)
+
+    if atomic:
+        total = sum(result['amount'] for result in pending)
+        if total > available:
+            raise BatchRejected(_abort_pending(results), InsufficientBalance.default_message)
+        if total > limit_left:
+            raise BatchRejected(
+                _abort_pending(results), DailyLimitExceeded.default_message,
+                status_code=DailyLimitExceeded.status_code
+            )
+    else:
+        for result in pending:
+            if result['amount'] > available:
+                result.update(status='rejected', error=InsufficientBalance.default_message)
+            elif result['amount'] > limit_left:
+                result.update(status='rejected', error=DailyLimitExceeded.default_message)
+            else:
+                available -= result['amount']
+                limit_left -= result['amount']
+        pending = [result for result in pending if result['status'] == 'pending']
+
+    if not pending:
+        return results
+
+    total = sum(result['amount'] for result in pending)
+    if not debit(sender.pk, total, now):
+        raise InsufficientBalance()
+    record_spend(sender.pk, total, now.date(), exists=sender.spent_today is not None)
+
+    credits = {}
+    hot_credits = {}
+    for result in pending:
+        receiver = receivers[result['receiver_account']]
+        target = hot_credits if receiver.bucket_count else credits
+        target[receiver] = target.get(receiver, 0) + result['amount']
+    credit_many({receiver.pk: amount for receiver, amount in credits.items()}, now)
+    for receiver in sorted(hot_credits, key=lambda account: account.pk):
+        credit_bucket(receiver, hot_credits[receiver], now)
+
+    transaction_objs = []
+    for result in pending:
+        leg = legs[result['index']]
+        # bulk_create skips Transaction.save(), so IDs are assigned here
+        transaction_objs.append(Transaction(
+            transaction_id=Transaction.generate_transaction_id(),
+            sender_account=sender,
+            receiver_account=receivers[result['receiver_account']],
+            amount=result['amount'],
+            description=leg.get('description', ''),
+            status='completed',
+            flagged=leg.get('flagged', False),
+            fraud_score=leg.get('fraud_score'),
+            fraud_reason=leg.get('fraud_reason')
+        ))
+    Transaction.objects.bulk_create(transaction_objs)
+    record_transfers(transaction_objs, now)
+    track_transfers(transaction_objs)
+    schedule_deep_scoring(transaction_objs)
+    invalidate_accounts([sender, *(receivers[result['receiver_account']] for result in pending)])
+    publish_transfers(transaction_objs)
+
+    for result, transaction_obj in zip(pending, transaction_objs):
+        result.update(
+            status='completed',
+            transaction_id=transaction_obj.transaction_id,
+            timestamp=transaction_obj.timestamp,
+            flagged=transaction_obj.flagged
+        )
+
+    sender_account.balance = sender.balance - total
+    sender_account.updated_at = now
+    return results
@@ -0,0 +1,174 @@
+"""
+Server-Sent Events stream of an account's transactions and balance.
+A raw ASGI application mounted in backend/asgi.py, so each open stream is
+a coroutine waiting on its subscription rather than a worker thread.
+
+    GET /api/transactions/stream/?token=<access token>
+
+The access token may also be sent as "Authorization: Bearer <token>"
+(EventSource cannot set headers, hence the query parameter). Events:
+
+    balance      current balance; sent on connect and after each batch of transactions
+    transaction  a completed transfer to or from the account (id: transaction ID)
+    resync       events were lost; refetch history and balance
+
+A client that reconnects with Last-Event-ID gets the transactions it missed.
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from banking.models import BankAccount
+from .events import RESYNC, broker, transaction_event
+from .history import AccountHistory
+from .models import Transaction
+
+STREAM_PATH = '/api/transactions/stream/'
+REPLAY_LIMIT = 100
+RETRY_MS = 3000
+
+
+def format_event(event):
+    lines = []
+    if event.get('id'):
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['event']}")
+    lines.append(f"data: {json.dumps(event['data'], separators=(',', ':'))}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+def database_sync_to_async(func):
+    """
+    sync_to_async for a helper that queries the database. Django only
+    recycles connections around requests it handles itself, so a stream
+    does what a request would: drop stale or broken connections before
+    and after each call.
+    """
+    def call(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(call)
+
+
+def authenticate(token):
+    """The pk of the token owner's account, or None"""
+    authentication = JWTAuthentication()
+    try:
+        user = authentication.get_user(authentication.get_validated_token(token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return BankAccount.objects.filter(user=user).values_list('pk', flat=True).first()
+
+
+def balance_event(account_id):
+    account = BankAccount.objects.get(pk=account_id)
+    return {'event': 'balance', 'data': {'balance': str(account.total_balance)}}
+
+
+def missed_events(account_id, last_event_id):
+    """Transactions after last_event_id, oldest first; a resync if they don't fit"""
+    history = AccountHistory(
+        BankAccount(pk=account_id),
+        base=Transaction.objects.select_related('sender_account', 'receiver_account')
+    )
+    last = history.filter(transaction_id=last_event_id)[:1]
+    if not last:
+        return [RESYNC]
+    last = last[0]
+    missed = list(
+        history.filter(Q(timestamp__gt=last.timestamp) | Q(timestamp=last.timestamp, id__gt=last.pk))
+        .order_by('timestamp', 'id')[:REPLAY_LIMIT + 1]
+    )
+    if len(missed) > REPLAY_LIMIT:
+        return [RESYNC]
+    return [transaction_event(transaction_obj, account_id) for transaction_obj in missed]
+
+
+async def respond_error(send, status, message):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({'error': message}).encode()})
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def transaction_stream(scope, receive, send):
+    if scope['method'] != 'GET':
+        return await respond_error(send, 405, 'Method not allowed')
+
+    headers = dict(scope['headers'])
+    query = parse_qs(scope.get('query_string', b'').decode())
+    token = query.get('token', [''])[0]
+    authorization = headers.get(b'authorization', b'').decode()
+    if not token and authorization.startswith('Bearer '):
+        token = authorization[len('Bearer '):]
+    account_id = await database_sync_to_async(authenticate)(token) if token else None
+    if account_id is None:
+        return await respond_error(send, 401, 'A valid access token for an account holder is required')
+
+    # Subscribe before reading anything, so no commit falls in between
+    subscription = broker.subscribe(account_id)
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),  # keep nginx from buffering the stream
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': f'retry: {RETRY_MS}\n\n'.encode(), 'more_body': True})
+
+        last_event_id = headers.get(b'last-event-id', b'').decode() or query.get('last_event_id', [''])[0]
+        replayed = set()
+        if last_event_id:
+            for event in await database_sync_to_async(missed_events)(account_id, last_event_id):
+                replayed.add(event.get('id'))
+                await send({'type': 'http.response.body', 'body': format_event(event), 'more_body': True})
+        await send({
+            'type': 'http.response.body',
+            'body': format_event(await database_sync_to_async(balance_event)(account_id)),
+            'more_body': True,
+        })
+
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnect},
+                timeout=settings.TRANSACTION_STREAM_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event not in done:
+                next_event.cancel()
+                if disconnect in done:
+                    break
+                # Comment line; keeps proxies from timing out an idle stream
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                continue
+
+            # Send everything queued meanwhile, then one balance for the lot
+            events = [event for event in [next_event.result()] + subscription.drain()
+                      if event.get('id') is None or event['id'] not in replayed]
+            body = b''.join(format_event(event) for event in events)
+            body += format_event(await database_sync_to_async(balance_event)(account_id))
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        subscription.close()
+        disconnect.cancel()
@@ -1,9 +1,37 @@
-from django.test import TestCase
-from rest_framework.test import APITestCase
+import asyncio
+import csv
+import gzip
+import json
+import multiprocessing
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Q
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from backend import fastpath
+from backend.asgi import application
 from banking.models import BankAccount
-from .models import Transaction
+from .events import QUEUE_LIMIT, RESYNC, broker
+from . import services
+from .history import AccountHistory
+from .idempotency import request_fingerprint
+from .ids import (
+    NODE_BITS, PROCESS_BITS, SEQUENCE_BITS, SnowflakeGenerator, generate_transaction_id, transaction_id_timestamp
+)
+from .models import DailySpend, IdempotencyKey, ScheduledTransfer, Transaction
+from .scheduler import add_months, run_scheduled_transfers
+from .services import InsufficientBalance, execute_batch_transfer, execute_transfer, process_pending_transfers, submit_transfer
 from decimal import Decimal
 
 User = get_user_model()
@@ -102,3 +130,1208 @@ class MoneyTransferTestCase(APITestCase):
         response = self.client.post('/api/transactions/transfer/', payload, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(response.data['flagged'])
+
+
+class TransferEngineTestCase(TestCase):
+    """Test suite for the row-locked transfer engine"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        BankAccount.objects.filter(pk=self.sender.bank_account.pk).update(balance=Decimal('100.00'))
+
+    def test_transfer_moves_balance(self):
+        """Test that the engine debits and credits both accounts"""
+        sender_account = BankAccount.objects.get(pk=self.sender.bank_account.pk)
+        receiver_account = BankAccount.objects.get(pk=self.receiver.bank_account.pk)
+
+        transaction_obj = execute_transfer(sender_account, receiver_account, Decimal('40.00'))
+
+        self.assertEqual(transaction_obj.status, 'completed')
+        self.assertEqual(sender_account.balance, Decimal('60.00'))
+        self.assertEqual(BankAccount.objects.get(pk=sender_account.pk).balance, Decimal('60.00'))
+        self.assertEqual(BankAccount.objects.get(pk=receiver_account.pk).balance, Decimal('40.00'))
+
+    def test_conditional_debit_rejects_overdraft(self):
+        """Test that a stale in-memory balance cannot overdraw the account"""
+        sender_account = BankAccount.objects.get(pk=self.sender.bank_account.pk)
+        receiver_account = BankAccount.objects.get(pk=self.receiver.bank_account.pk)
+        sender_account.balance = Decimal('1000.00')  # stale copy
+
+        with self.assertRaises(InsufficientBalance):
+            execute_transfer(sender_account, receiver_account, Decimal('500.00'))
+
+        self.assertEqual(BankAccount.objects.get(pk=sender_account.pk).balance, Decimal('100.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+
+class BatchTransferTestCase(APITestCase):
+    """Test suite for the batch transfer endpoint"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.sender.bank_account.balance = Decimal('1000.00')
+        self.sender.bank_account.save()
+
+        self.receivers = [
+            User.objects.create_user(
+                username=f'receiver{i}',
+                email=f'receiver{i}@example.com',
+                password='Test@1234',
+                role='customer'
+            )
+            for i in range(3)
+        ]
+        self.url = '/api/transactions/transfer/batch/'
+        self.client.force_authenticate(user=self.sender)
+
+    def leg(self, receiver, amount):
+        return {'receiver_account': receiver.bank_account.account_number, 'amount': amount}
+
+    def test_atomic_batch_success(self):
+        """Test that every leg is executed and balances move once"""
+        payload = {'legs': [self.leg(receiver, '100.00') for receiver in self.receivers]}
+
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertEqual(response.data['completed'], 3)
+        self.assertEqual(response.data['sender_new_balance'], '700.00')
+        self.assertEqual(Transaction.objects.count(), 3)
+
+        for receiver in self.receivers:
+            receiver.bank_account.refresh_from_db()
+            self.assertEqual(receiver.bank_account.balance, Decimal('100.00'))
+
+    def test_atomic_batch_rejects_everything_on_bad_leg(self):
+        """Test that one unknown receiver aborts an all-or-nothing batch"""
+        payload = {'legs': [
+            self.leg(self.receivers[0], '100.00'),
+            {'receiver_account': 'ACC000000000', 'amount': '100.00'},
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][0]['status'], 'aborted')
+        self.assertEqual(response.data['results'][1]['status'], 'rejected')
+        self.assertFalse(Transaction.objects.exists())
+
+        self.sender.bank_account.refresh_from_db()
+        self.assertEqual(self.sender.bank_account.balance, Decimal('1000.00'))
+
+    def test_best_effort_batch_skips_unaffordable_legs(self):
+        """Test that best-effort mode executes the legs the balance covers"""
+        payload = {'mode': 'best_effort', 'legs': [
+            self.leg(self.receivers[0], '600.00'),
+            self.leg(self.receivers[1], '600.00'),
+            self.leg(self.receivers[2], '300.00'),
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'partial')
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['completed', 'rejected', 'completed']
+        )
+        self.assertEqual(response.data['sender_new_balance'], '100.00')
+
+
+class DailySpendTestCase(APITestCase):
+    """Test suite for the daily spend counter"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.sender.bank_account.balance = Decimal('5000.00')
+        self.sender.bank_account.daily_limit = Decimal('1000.00')
+        self.sender.bank_account.save()
+
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.client.force_authenticate(user=self.sender)
+
+    def transfer(self, amount):
+        payload = {
+            'receiver_account': self.receiver.bank_account.account_number,
+            'amount': amount
+        }
+        return self.client.post('/api/transactions/transfer/', payload, format='json')
+
+    def test_counter_enforces_daily_limit(self):
+        """Test that transfers accumulate in the counter until the limit is hit"""
+        self.assertEqual(self.transfer('600.00').status_code, status.HTTP_200_OK)
+
+        counter = DailySpend.objects.get(account=self.sender.bank_account)
+        self.assertEqual(counter.amount, Decimal('600.00'))
+        self.assertEqual(counter.date, timezone.now().date())
+
+        response = self.transfer('500.00')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response.data['error'], 'Daily transfer limit exceeded')
+
+    def test_rebuild_command_backfills_counters(self):
+        """Test that counters are rebuilt from the transactions table"""
+        self.transfer('200.00')
+        self.transfer('300.00')
+        DailySpend.objects.all().delete()
+
+        call_command('rebuild_daily_spend', '--days', '7', stdout=StringIO())
+
+        counter = DailySpend.objects.get(account=self.sender.bank_account)
+        self.assertEqual(counter.amount, Decimal('500.00'))
+
+
+class IdempotencyKeyTestCase(APITestCase):
+    """Test suite for Idempotency-Key handling on transfers"""
+
+    def setUp(self):
+        cache.clear()  # reset rate limit counters
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.sender.bank_account.balance = Decimal('1000.00')
+        self.sender.bank_account.save()
+
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.payload = {
+            'receiver_account': self.receiver.bank_account.account_number,
+            'amount': '100.00'
+        }
+        self.client.force_authenticate(user=self.sender)
+
+    def post(self, payload, key):
+        return self.client.post(
+            '/api/transactions/transfer/', payload, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_stored_response(self):
+        """Test that a retried request does not move money twice"""
+        first = self.post(self.payload, 'retry-1')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        # Savepoint, key lookup, release and the audit log: no balance queries
+        with self.assertNumQueries(4):
+            second = self.post(self.payload, 'retry-1')
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        self.sender.bank_account.refresh_from_db()
+        self.assertEqual(self.sender.bank_account.balance, Decimal('900.00'))
+
+    def test_key_reuse_with_different_payload_rejected(self):
+        """Test that a key cannot be reused for a different transfer"""
+        self.post(self.payload, 'retry-2')
+        response = self.post({**self.payload, 'amount': '200.00'}, 'retry-2')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_KEY_WAIT=timedelta(0))
+    def test_duplicate_in_flight_conflicts(self):
+        """Test that a duplicate of a request still running gets 409"""
+        IdempotencyKey.objects.create(
+            user=self.sender, key='retry-4', request_hash=self.request_hash(self.payload),
+            claimed_at=timezone.now()
+        )
+        response = self.post(self.payload, 'retry-4')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_duplicate_waits_for_in_flight_response(self):
+        """Test that a duplicate replays the first response once it is stored"""
+        record = IdempotencyKey.objects.create(
+            user=self.sender, key='retry-7', request_hash=self.request_hash(self.payload),
+            claimed_at=timezone.now()
+        )
+
+        def finish_first(seconds):
+            record.response_status = status.HTTP_200_OK
+            record.response_body = '{"message": "Transfer successful"}'
+            record.save()
+
+        with mock.patch('transactions.idempotency.time.sleep', side_effect=finish_first):
+            response = self.post(self.payload, 'retry-7')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_abandoned_claim_is_taken_over(self):
+        """Test that a claim whose lease ran out is retried instead of 409"""
+        IdempotencyKey.objects.create(
+            user=self.sender, key='retry-8', request_hash=self.request_hash(self.payload),
+            claimed_at=timezone.now() - timedelta(minutes=5)
+        )
+        response = self.post(self.payload, 'retry-8')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().response_status, status.HTTP_200_OK)
+
+    def test_expired_key_is_reclaimed(self):
+        """Test that a key past its TTL is reused for a new request in place"""
+        record = IdempotencyKey.objects.create(
+            user=self.sender, key='retry-9', request_hash='0' * 64,
+            response_status=status.HTTP_200_OK, response_body='{}',
+            claimed_at=timezone.now() - timedelta(days=2)
+        )
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        response = self.post(self.payload, 'retry-9')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Transaction.objects.count(), 1)
+        reclaimed = IdempotencyKey.objects.get()
+        self.assertEqual(reclaimed.pk, record.pk)
+        self.assertEqual(reclaimed.request_hash, self.request_hash(self.payload))
+        self.assertGreater(reclaimed.created_at, timezone.now() - timedelta(minutes=1))
+
+    def test_server_error_releases_key(self):
+        """Test that a failed request can be retried with the same key"""
+        with mock.patch('transactions.views.execute_transfer', side_effect=RuntimeError('boom')):
+            response = self.post(self.payload, 'retry-5')
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post(self.payload, 'retry-5').status_code, status.HTTP_200_OK)
+
+    def request_hash(self, payload):
+        request = mock.Mock(path='/api/transactions/transfer/', data=payload)
+        return request_fingerprint(request)
+
+    def test_purge_removes_expired_keys(self):
+        """Test that the sweeper deletes keys older than the TTL"""
+        self.post(self.payload, 'retry-3')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class IdempotencyRetryTestCase(APITransactionTestCase):
+    """Keyed transfers run outside the key's transaction, so deadlocks are retried"""
+
+    def setUp(self):
+        cache.clear()
+        self.sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='Test@1234', role='customer'
+        )
+        self.sender.bank_account.balance = Decimal('1000.00')
+        self.sender.bank_account.save()
+        self.receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='Test@1234', role='customer'
+        )
+        self.client.force_authenticate(user=self.sender)
+
+    def test_deadlock_is_retried(self):
+        real = services._execute_transfer
+        attempts = []
+
+        def deadlock_once(*args, **kwargs):
+            attempts.append(args)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            return real(*args, **kwargs)
+
+        with mock.patch.object(services, '_execute_transfer', side_effect=deadlock_once):
+            response = self.client.post('/api/transactions/transfer/', {
+                'receiver_account': self.receiver.bank_account.account_number, 'amount': '100.00'
+            }, format='json', HTTP_IDEMPOTENCY_KEY='retry-6')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().response_status, status.HTTP_200_OK)
+
+
+def _generate_ids(count):
+    return [generate_transaction_id() for _ in range(count)]
+
+
+class TransactionIdTestCase(TestCase):
+    """Test suite for the snowflake-style transaction ID generator"""
+
+    def test_ids_are_time_ordered(self):
+        """Test that IDs fit the column, sort by creation and decode to now"""
+        ids = _generate_ids(10000)
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(len(txn_id) == 19 and txn_id.startswith('TXN') for txn_id in ids))
+
+        created = transaction_id_timestamp(ids[0])
+        self.assertLess(abs((timezone.now() - created).total_seconds()), 5)
+
+    def test_no_collisions_across_processes(self):
+        """Test that two million IDs from four processes are all distinct"""
+        context = multiprocessing.get_context('fork')
+        with context.Pool(4) as pool:
+            batches = pool.map(_generate_ids, [500000] * 4)
+
+        ids = set()
+        for batch in batches:
+            ids.update(batch)
+        self.assertEqual(len(ids), 2000000)
+
+    def test_unconfigured_node_uses_random_identity(self):
+        """Test that hosts without TRANSACTION_ID_NODE do not share identities, even with equal pids"""
+        identity_bits = (1 << (NODE_BITS + PROCESS_BITS)) - 1
+        with override_settings(TRANSACTION_ID_NODE=None):
+            identities = {SnowflakeGenerator().next_int() >> SEQUENCE_BITS & identity_bits for _ in range(50)}
+        self.assertEqual(len(identities), 50)
+
+        with override_settings(TRANSACTION_ID_NODE='7'):
+            identity = SnowflakeGenerator().next_int() >> SEQUENCE_BITS & identity_bits
+        self.assertEqual(identity >> PROCESS_BITS, 7)
+
+
+class TransferQueryCountTestCase(APITestCase):
+    """Pin the SQL cost of the transfer path so regressions fail CI"""
+
+    def setUp(self):
+        cache.clear()  # reset rate limit counters
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.sender.bank_account.balance = Decimal('1000.00')
+        self.sender.bank_account.save()
+
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.payload = {
+            'receiver_account': self.receiver.bank_account.account_number,
+            'amount': '100.00'
+        }
+        # Fresh user object: nothing cached on it, as with JWT authentication
+        self.client.force_authenticate(user=User.objects.get(pk=self.sender.pk))
+
+    def test_successful_transfer_query_count(self):
+        """
+        1 accounts + users lookup, 1 fraud rule overrides load (then cached),
+        1 fraud features read, then inside the savepoint:
+        1 lock with daily counter, 1 debit, 1 credit, 1 counter insert,
+        1 transaction insert, 1 ledger insert, 1 monthly summary update
+        plus its first-of-month insert in a savepoint (3), the sender's fraud
+        features lock, first insert, re-lock and update (4); plus 2 savepoint
+        statements and 1 audit insert.
+        """
+        with self.assertNumQueries(20):
+            response = self.client.post('/api/transactions/transfer/', self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Once the day's counter and month's summaries exist, both are plain UPDATEs,
+        # the features row is locked and updated, and the rule configuration is cached
+        with self.assertNumQueries(14):
+            response = self.client.post('/api/transactions/transfer/', self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unknown_receiver_rejected_by_lookup(self):
+        """Test that the single lookup still reports a missing receiver"""
+        payload = {**self.payload, 'receiver_account': 'ACC000000000'}
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/transactions/transfer/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('receiver_account', response.data)
+
+
+class AsyncTransferTestCase(APITestCase):
+    """Test suite for asynchronous transfer submission"""
+
+    def setUp(self):
+        cache.clear()  # reset rate limit counters
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.sender.bank_account.balance = Decimal('1000.00')
+        self.sender.bank_account.save()
+
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.client.force_authenticate(user=self.sender)
+
+    def submit(self, amount):
+        payload = {
+            'receiver_account': self.receiver.bank_account.account_number,
+            'amount': amount
+        }
+        return self.client.post(
+            '/api/transactions/transfer/', payload, format='json', HTTP_PREFER='respond-async'
+        )
+
+    def test_async_transfer_settled_by_worker(self):
+        """Test that a queued transfer is pending until the worker settles it"""
+        response = self.submit('100.00')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        transaction_id = response.data['transaction_id']
+
+        self.sender.bank_account.refresh_from_db()
+        self.assertEqual(self.sender.bank_account.balance, Decimal('1000.00'))
+        status_response = self.client.get(response['Location'])
+        self.assertEqual(status_response.data['status'], 'pending')
+
+        call_command('process_pending_transfers', stdout=StringIO())
+
+        status_response = self.client.get(f'/api/transactions/status/{transaction_id}/')
+        self.assertEqual(status_response.data['status'], 'completed')
+        self.sender.bank_account.refresh_from_db()
+        self.assertEqual(self.sender.bank_account.balance, Decimal('900.00'))
+
+    def test_unaffordable_async_transfer_fails(self):
+        """Test that the worker marks transfers the balance no longer covers as failed"""
+        first = self.submit('800.00')
+        second = self.submit('800.00')
+
+        call_command('process_pending_transfers', stdout=StringIO())
+
+        self.assertEqual(Transaction.objects.get(transaction_id=first.data['transaction_id']).status, 'completed')
+        failed = Transaction.objects.get(transaction_id=second.data['transaction_id'])
+        self.assertEqual(failed.status, 'failed')
+        self.assertEqual(failed.failure_reason, 'Insufficient balance')
+
+
+class ScheduledTransferTestCase(APITestCase):
+    """Test suite for standing orders and the batched runner"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.sender.bank_account.balance = Decimal('1000.00')
+        self.sender.bank_account.save()
+
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.client.force_authenticate(user=self.sender)
+
+    def schedule(self, amount, frequency, start_at):
+        return self.client.post('/api/transactions/scheduled/', {
+            'receiver_account': self.receiver.bank_account.account_number,
+            'amount': amount,
+            'frequency': frequency,
+            'start_at': start_at.isoformat()
+        }, format='json')
+
+    def test_runner_executes_due_schedules_per_sender(self):
+        """Test that due schedules run as one batch and advance to their next occurrence"""
+        due = timezone.now() - timedelta(minutes=5)
+        rent = self.schedule('600.00', 'monthly', due)
+        self.assertEqual(rent.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(rent.data['next_run_at'], rent.data['start_at'])
+        gift = self.schedule('300.00', 'once', due)
+        too_much = self.schedule('500.00', 'weekly', due)
+        self.schedule('10.00', 'daily', timezone.now() + timedelta(hours=1))
+
+        stats = run_scheduled_transfers()
+
+        self.assertEqual((stats['claimed'], stats['senders']), (3, 1))
+        self.assertEqual((stats['completed'], stats['rejected']), (2, 1))
+        self.assertGreaterEqual(stats['max_lag'], 300)
+
+        rent = ScheduledTransfer.objects.get(pk=rent.data['id'])
+        self.assertEqual(rent.last_status, 'completed')
+        self.assertEqual(rent.next_run_at, add_months(rent.start_at, 1))
+        self.assertTrue(Transaction.objects.filter(transaction_id=rent.last_transaction_id).exists())
+        self.assertFalse(ScheduledTransfer.objects.get(pk=gift.data['id']).is_active)
+        too_much = ScheduledTransfer.objects.get(pk=too_much.data['id'])
+        self.assertEqual(too_much.last_error, 'Insufficient balance')
+        self.assertEqual(too_much.next_run_at, too_much.start_at + timedelta(weeks=1))
+
+        self.sender.bank_account.refresh_from_db()
+        self.assertEqual(self.sender.bank_account.balance, Decimal('100.00'))
+        self.assertEqual(run_scheduled_transfers()['claimed'], 0)
+
+    def test_failing_sender_does_not_block_others(self):
+        """Test that each sender group commits on its own and a failed one stays due"""
+        due = timezone.now() - timedelta(minutes=5)
+        self.schedule('100.00', 'monthly', due)
+        other = self.receiver.bank_account
+        other.balance = Decimal('500.00')
+        other.save()
+        failing = ScheduledTransfer.objects.create(
+            sender_account=other, receiver_account=self.sender.bank_account,
+            amount=Decimal('50.00'), frequency='monthly', start_at=due - timedelta(minutes=1),
+            next_run_at=due - timedelta(minutes=1)
+        )
+        real = execute_batch_transfer
+
+        def fail_for_other(sender_account, *args, **kwargs):
+            if sender_account.pk == other.pk:
+                raise RuntimeError('boom')
+            return real(sender_account, *args, **kwargs)
+
+        with mock.patch('transactions.scheduler.execute_batch_transfer', side_effect=fail_for_other), \
+                self.assertLogs('transactions.scheduler', 'ERROR'):
+            stats = run_scheduled_transfers()
+        self.assertEqual((stats['claimed'], stats['senders'], stats['completed']), (1, 1, 1))
+        failing.refresh_from_db()
+        self.assertEqual((failing.occurrences, failing.next_run_at), (0, due - timedelta(minutes=1)))
+        self.assertEqual(run_scheduled_transfers()['completed'], 1)
+
+    def test_monthly_schedule_keeps_day_of_month(self):
+        """Test that month-end schedules clamp to short months without drifting"""
+        start = datetime(2025, 1, 31, 9, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(add_months(start, 1), start.replace(month=2, day=28))
+        self.assertEqual(add_months(start, 2), start.replace(month=3))
+        self.assertEqual(add_months(start, 12), start.replace(year=2026))
+
+    def test_cancel_schedule(self):
+        """Test that deleting a schedule deactivates it"""
+        response = self.schedule('50.00', 'daily', timezone.now() - timedelta(minutes=1))
+        self.client.delete(f"/api/transactions/scheduled/{response.data['id']}/")
+
+        self.assertFalse(ScheduledTransfer.objects.get(pk=response.data['id']).is_active)
+        self.assertEqual(run_scheduled_transfers()['claimed'], 0)
+
+
+class HistoryPaginationTestCase(APITestCase):
+    """Test suite for keyset pagination of the transaction history"""
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        for i in range(25):
+            self.create_transaction()
+        # Ties on timestamp must still page deterministically
+        Transaction.objects.filter(pk__lte=Transaction.objects.order_by('pk')[10].pk).update(
+            timestamp=timezone.now() - timedelta(hours=1)
+        )
+        self.client.force_authenticate(user=self.sender)
+
+    def create_transaction(self):
+        return Transaction.objects.create(
+            sender_account=self.sender.bank_account,
+            receiver_account=self.receiver.bank_account,
+            amount=Decimal('1.00')
+        )
+
+    def test_pages_are_stable_under_inserts(self):
+        """Test that cursors walk every row once even when new rows arrive"""
+        seen = []
+        url = '/api/transactions/history/?page_size=10'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            # No COUNT(*) and no OFFSET, whatever the depth
+            self.assertFalse(any('COUNT(' in q['sql'] or 'OFFSET' in q['sql'] for q in queries))
+            self.assertNotIn('count_estimate', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+            # A transfer landing mid-walk is newer than every cursor
+            self.create_transaction()
+
+        expected = list(Transaction.objects.filter(pk__in=seen).order_by('-timestamp', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 25)
+
+    def test_previous_link_and_count_estimate(self):
+        """Test walking back one page and the opt-in total"""
+        first = self.client.get('/api/transactions/history/?page_size=10&count=estimate')
+        self.assertEqual(first.data['count_estimate'], 25)
+        self.assertIsNone(first.data['previous'])
+
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']]
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_invalid_cursor_rejected(self):
+        """Test that a tampered cursor is a 404, not a server error"""
+        response = self.client.get('/api/transactions/history/?cursor=bm90LWpzb24')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unchanged_poll_is_not_modified(self):
+        """Test that a repeated poll gets 304 from one query until a transaction lands"""
+        url = '/api/transactions/history/?page_size=5'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Another page of the same history is a different representation
+        other = self.client.get(url + '&fields=amount', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+
+        # A received transfer changes the validators too
+        Transaction.objects.create(
+            sender_account=self.receiver.bank_account,
+            receiver_account=self.sender.bank_account,
+            amount=Decimal('1.00')
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_status_change_is_modified(self):
+        """Test that settling a pending transfer in place changes the validators"""
+        url = '/api/transactions/history/?page_size=5'
+        transaction_obj = submit_transfer(
+            self.sender.bank_account, self.receiver.bank_account, Decimal('1000000.00')
+        )
+        first = self.client.get(url)
+        self.assertEqual(process_pending_transfers(), (0, 1))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row = next(row for row in response.data['results'] if row['transaction_id'] == transaction_obj.transaction_id)
+        self.assertEqual(row['status'], 'failed')
+
+
+class AccountHistoryTestCase(TestCase):
+    """Test suite for the UNION ALL history query"""
+
+    def setUp(self):
+        users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@example.com',
+                password='Test@1234',
+                role='customer'
+            )
+            for i in range(3)
+        ]
+        self.account, self.other, self.third = (user.bank_account for user in users)
+        pairs = [
+            (self.account, self.other), (self.other, self.account),
+            (self.other, self.third), (self.account, self.third),
+        ]
+        for i in range(12):
+            sender, receiver = pairs[i % len(pairs)]
+            Transaction.objects.create(
+                sender_account=sender, receiver_account=receiver,
+                amount=Decimal(i + 1), flagged=(i % 3 == 0)
+            )
+
+    def test_matches_or_query(self):
+        """Test that slices, filters and counts match the OR query"""
+        or_query = Transaction.objects.filter(
+            Q(sender_account=self.account) | Q(receiver_account=self.account)
+        ).order_by('-timestamp', '-id')
+        history = AccountHistory(self.account)
+
+        self.assertEqual(history.count(), or_query.count())
+        self.assertEqual([t.pk for t in history[2:6]], [t.pk for t in or_query[2:6]])
+        self.assertEqual(
+            [t.pk for t in history.filter(flagged=True).order_by('timestamp', 'pk')],
+            [t.pk for t in or_query.filter(flagged=True).order_by('timestamp', 'pk')]
+        )
+
+    def test_row_deleted_between_queries_is_skipped(self):
+        """Test that a page drops a row deleted after its ids were read"""
+        history = AccountHistory(self.account)
+        ids = [row['id'] for row in history.id_queryset(4)]
+        id_queryset = history.id_queryset
+
+        def delete_after_read(stop):
+            rows = list(id_queryset(stop))
+            Transaction.objects.filter(pk=ids[1]).delete()
+            return rows
+
+        with mock.patch.object(history, 'id_queryset', side_effect=delete_after_read):
+            page = history[:4]
+        self.assertEqual([t.pk for t in page], [ids[0]] + ids[2:])
+
+    @skipUnlessDBFeature('supports_slicing_ordering_in_compound')
+    def test_plans_use_history_indexes(self):
+        """Test that both branches and the flagged queue are index scans (PostgreSQL)"""
+        if connection.vendor != 'postgresql':
+            self.skipTest('EXPLAIN output is PostgreSQL specific')
+        with connection.cursor() as cursor:
+            # The test tables are tiny; make the planner show its index choice
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = AccountHistory(self.account).id_queryset(20).explain()
+        self.assertIn('txn_sender_ts_idx', plan)
+        self.assertIn('txn_receiver_ts_idx', plan)
+        flagged_plan = Transaction.objects.filter(flagged=True).order_by('-timestamp')[:20].explain()
+        self.assertIn('txn_flagged_ts_idx', flagged_plan)
+        pair_plan = AccountHistory(self.account).narrow(counterparty=self.other.pk).id_queryset(20).explain()
+        self.assertEqual(pair_plan.count('txn_pair_ts_idx'), 2)
+        review_plan = AccountHistory(self.account).filter(status='failed').id_queryset(20).explain()
+        self.assertIn('txn_sender_review_idx', review_plan)
+        self.assertIn('txn_receiver_review_idx', review_plan)
+
+
+class HistoryFilterTestCase(APITestCase):
+    """Test suite for the transaction history filters"""
+
+    def setUp(self):
+        users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@example.com',
+                password='Test@1234',
+                role='customer'
+            )
+            for i in range(3)
+        ]
+        self.account, self.other, self.third = (user.bank_account for user in users)
+        pairs = [
+            (self.account, self.other), (self.other, self.account),
+            (self.third, self.account), (self.account, self.third),
+        ]
+        for i in range(16):
+            sender, receiver = pairs[i % len(pairs)]
+            Transaction.objects.create(
+                sender_account=sender, receiver_account=receiver,
+                amount=Decimal(10 * (i + 1)), flagged=(i % 5 == 0),
+                status='failed' if i % 7 == 0 else 'completed'
+            )
+        # Day i // 4 ago, oldest first
+        for i, transaction_obj in enumerate(Transaction.objects.order_by('pk')):
+            Transaction.objects.filter(pk=transaction_obj.pk).update(
+                timestamp=timezone.now() - timedelta(days=3 - i // 4)
+            )
+        self.client.force_authenticate(user=users[0])
+
+    def fetch(self, query):
+        response = self.client.get(f'/api/transactions/history/?page_size=100&{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return {row['transaction_id'] for row in response.data['results']}
+
+    def expected(self, *conditions):
+        queryset = Transaction.objects.filter(
+            Q(sender_account=self.account) | Q(receiver_account=self.account), *conditions
+        )
+        return set(queryset.values_list('transaction_id', flat=True))
+
+    def test_filters_match_or_query(self):
+        """Test that every filter returns what the equivalent OR query does"""
+        today = timezone.localdate()
+        cases = {
+            f'start_date={today - timedelta(days=1)}': Q(timestamp__gte=timezone.now() - timedelta(days=1, hours=12)),
+            f'end_date={today - timedelta(days=2)}': Q(timestamp__lt=timezone.now() - timedelta(days=1, hours=12)),
+            'min_amount=50&max_amount=120': Q(amount__gte=50, amount__lte=120),
+            'counterparty=' + self.third.account_number: Q(sender_account=self.third) | Q(receiver_account=self.third),
+            'direction=sent': Q(sender_account=self.account),
+            'direction=received&counterparty=' + self.other.account_number: Q(sender_account=self.other),
+            'status=failed': Q(status='failed'),
+            'flagged=true': Q(flagged=True),
+            'flagged=false&min_amount=100': Q(flagged=False, amount__gte=100),
+        }
+        for query, condition in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.fetch(query), self.expected(condition))
+        self.assertEqual(self.fetch(''), self.expected())
+
+    def test_unknown_counterparty_is_empty(self):
+        """Test that an unknown counterparty matches nothing rather than everything"""
+        self.assertEqual(self.fetch('counterparty=ACC000000000'), set())
+
+    def test_invalid_filters_are_rejected(self):
+        """Test that malformed or contradictory filters get 400"""
+        for query in ('min_amount=abc', 'min_amount=50&max_amount=10', 'direction=both',
+                      'status=unknown', 'end_date=2025-01-01&start_date=2025-02-01'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/transactions/history/?{query}')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionListQueryTestCase(APITestCase):
+    """Pin the SQL cost of the transaction list endpoints"""
+
+    def setUp(self):
+        self.auditor = User.objects.create_user(
+            username='auditor',
+            email='auditor@example.com',
+            password='Test@1234',
+            role='auditor'
+        )
+        users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@example.com',
+                password='Test@1234',
+                role='customer'
+            )
+            for i in range(4)
+        ]
+        self.user = users[0]
+        for i in range(20):
+            Transaction.objects.create(
+                sender_account=users[i % 4].bank_account,
+                receiver_account=users[(i + 1) % 4].bank_account,
+                amount=Decimal('5.00'),
+                flagged=True
+            )
+
+    def test_history_page_query_count(self):
+        """Test that a history page is one UNION ALL for ids and one joined select"""
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(4):  # + the validators and the bank account lookup
+            response = self.client.get('/api/transactions/history/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertTrue(all(row['sender_name'] for row in response.data['results']))
+
+    def test_flagged_page_query_count(self):
+        """Test that the flagged list no longer loads accounts and users per row"""
+        self.client.force_authenticate(user=self.auditor)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/transactions/flagged/')
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_sparse_fieldset(self):
+        """Test that ?fields= prunes the output and skips unneeded joins"""
+        self.client.force_authenticate(user=self.auditor)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/flagged/?fields=transaction_id,amount')
+        self.assertEqual(set(response.data['results'][0]), {'transaction_id', 'amount'})
+        self.assertNotIn('JOIN', queries[-1]['sql'])
+        self.assertNotIn('fraud_reason', queries[-1]['sql'])
+
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        # The cursor key is loaded even when the client does not ask for it
+        response = self.client.get('/api/transactions/history/?fields=amount,receiver_name&page_size=4')
+        self.assertEqual(set(response.data['results'][0]), {'amount', 'receiver_name'})
+        self.assertIsNotNone(response.data['next'])
+
+
+class FastListRenderingTestCase(APITestCase):
+    """Test suite for the values_list()/compiled-plan list rendering"""
+
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        other = User.objects.create_user(
+            username='Zoë',
+            email='zoe@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.auditor = User.objects.create_user(
+            username='auditor',
+            email='auditor@example.com',
+            password='Test@1234',
+            role='auditor'
+        )
+        rows = [
+            ('1.5', 'Rent "May" \\ ünïcode \u2028 line\tbreak\x01', 0.85, 'High amount'),
+            ('1000000.00', None, None, None),
+            ('0.01', '', 1e-05, 'tiny score'),
+            ('42', 'émoji 💸', 0.0, ''),
+        ]
+        for i in range(12):
+            amount, description, score, reason = rows[i % len(rows)]
+            Transaction.objects.create(
+                sender_account=self.customer.bank_account if i % 2 else other.bank_account,
+                receiver_account=other.bank_account if i % 2 else self.customer.bank_account,
+                amount=Decimal(amount), description=description, flagged=True,
+                fraud_score=score, fraud_reason=reason,
+                status='failed' if i % 5 == 0 else 'completed'
+            )
+
+    def assert_identical(self, url):
+        with override_settings(FAST_LIST_RENDERING=False):
+            expected = self.client.get(url).content
+        self.assertEqual(self.client.get(url).content, expected)
+        with mock.patch.object(fastpath, 'orjson', None):
+            self.assertEqual(self.client.get(url).content, expected)
+        return expected
+
+    def test_byte_identical_output(self):
+        """Test that the fast path renders exactly what the serializer did"""
+        self.client.force_authenticate(user=User.objects.get(pk=self.customer.pk))
+        body = json.loads(self.assert_identical('/api/transactions/history/?page_size=5'))
+        self.assert_identical(body['next'])
+        self.assert_identical('/api/transactions/history/?fields=amount,fraud_score,timestamp&page_size=50')
+
+        self.client.force_authenticate(user=self.auditor)
+        self.assert_identical('/api/transactions/flagged/')
+        self.assert_identical('/api/transactions/flagged/?fields=sender_name,status')
+
+    def test_fast_path_is_used(self):
+        """Test that list pages go through the compiled plan, and can be switched off"""
+        self.client.force_authenticate(user=self.auditor)
+        with mock.patch.object(fastpath.RowPlan, '__call__', autospec=True,
+                               side_effect=fastpath.RowPlan.__call__) as plan:
+            self.client.get('/api/transactions/flagged/')
+            self.assertEqual(plan.call_count, 1)
+            with override_settings(FAST_LIST_RENDERING=False):
+                self.client.get('/api/transactions/flagged/')
+            self.assertEqual(plan.call_count, 1)
+
+
+class TransactionExportTestCase(APITestCase):
+    """Test suite for the streaming statement export"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        account, other = self.user.bank_account, self.other.bank_account
+        for i in range(6):
+            sender, receiver = (account, other) if i % 2 else (other, account)
+            Transaction.objects.create(
+                sender_account=sender, receiver_account=receiver,
+                amount=Decimal(i + 1), description=f'payment, #{i}'
+            )
+        # Two old transactions outside the default range filter below
+        old = list(Transaction.objects.order_by('pk').values_list('pk', flat=True)[:2])
+        Transaction.objects.filter(pk__in=old).update(timestamp=timezone.now() - timedelta(days=40))
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+
+    def test_csv_export_streams_oldest_first(self):
+        """Test that the CSV body is streamed lazily and holds every row in order"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/export/')
+            fetched_before_streaming = len(queries)
+            body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        # Rows are only read while the body is consumed
+        self.assertGreater(len(queries), fetched_before_streaming)
+
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual(len(rows), 6)
+        expected = list(Transaction.objects.order_by('timestamp', 'pk').values_list('transaction_id', flat=True))
+        self.assertEqual([row['transaction_id'] for row in rows], expected)
+        self.assertTrue(any(row['description'] == 'payment, #3' for row in rows))
+
+    def test_csv_export_neutralizes_formulas(self):
+        """Test that descriptions a spreadsheet would evaluate are exported as text"""
+        Transaction.objects.filter(description='payment, #3').update(description='=HYPERLINK("http://x")')
+        Transaction.objects.filter(description='payment, #4').update(description='-2+3')
+        body = b''.join(self.client.get('/api/transactions/export/').streaming_content).decode()
+        descriptions = {row['description'] for row in csv.DictReader(body.splitlines())}
+        self.assertIn('\'=HYPERLINK("http://x")', descriptions)
+        self.assertIn("'-2+3", descriptions)
+
+        # JSON consumers get the text unchanged
+        response = self.client.get('/api/transactions/export/?format=ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertIn('-2+3', {record['description'] for record in records})
+
+    def test_ndjson_export_with_date_range_and_gzip(self):
+        """Test NDJSON output, the date filter and on-the-fly compression"""
+        start = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response = self.client.get(
+            f'/api/transactions/export/?format=ndjson&start_date={start}',
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]['amount'], '3.00')
+
+    def test_export_access_and_validation(self):
+        """Test that customers cannot export other accounts and bad dates are rejected"""
+        response = self.client.get(
+            f'/api/transactions/export/?account={self.other.bank_account.account_number}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get('/api/transactions/export/?start_date=2025-02-01&end_date=2025-01-01')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionStreamTestCase(TransactionTestCase):
+    """
+    Test suite for the Server-Sent Events stream.
+    The stream recycles database connections around its queries, which a
+    TestCase's wrapping transaction would not survive.
+    """
+
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='sender',
+            email='sender@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        self.receiver = User.objects.create_user(
+            username='receiver',
+            email='receiver@example.com',
+            password='Test@1234',
+            role='customer'
+        )
+        BankAccount.objects.filter(user=self.sender).update(balance=Decimal('100.00'))
+        self.token = str(RefreshToken.for_user(self.receiver).access_token)
+
+    def transfer(self, amount):
+        return execute_transfer(
+            BankAccount.objects.get(user=self.sender),
+            BankAccount.objects.get(user=self.receiver),
+            Decimal(amount)
+        )
+
+    def connect(self, query='', headers=()):
+        return ApplicationCommunicator(application, {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/api/transactions/stream/',
+            'query_string': query.encode(),
+            'headers': list(headers),
+        })
+
+    @staticmethod
+    def parse(message):
+        events = []
+        for block in message['body'].decode().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+            if 'event' in fields:
+                events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+        return events
+
+    def test_pushes_transfers_and_balance(self):
+        """Test that a committed transfer reaches the receiver's open stream"""
+        async def scenario():
+            stream = self.connect(f'token={self.token}')
+            await stream.send_input({'type': 'http.request', 'body': b''})
+            start = await stream.receive_output(5)
+            self.assertEqual(start['status'], 200)
+            self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'), start['headers'])
+            self.assertEqual((await stream.receive_output(5))['body'], b'retry: 3000\n\n')
+            self.assertEqual(self.parse(await stream.receive_output(5)), [('balance', None, {'balance': '0.00'})])
+
+            transaction_obj = await sync_to_async(self.transfer)('25.00')
+            (kind, event_id, data), balance = self.parse(await stream.receive_output(5))
+            self.assertEqual((kind, event_id), ('transaction', transaction_obj.transaction_id))
+            self.assertEqual(data['direction'], 'received')
+            self.assertEqual(data['amount'], '25.00')
+            self.assertEqual(data['counterparty'], transaction_obj.sender_account.account_number)
+            self.assertEqual(balance, ('balance', None, {'balance': '25.00'}))
+
+            await stream.send_input({'type': 'http.disconnect'})
+            await stream.wait(5)
+            self.assertEqual(broker.subscriber_count(), 0)
+
+        async_to_sync(scenario)()
+
+    def test_replays_missed_transactions(self):
+        """Test that reconnecting with Last-Event-ID sends what was missed"""
+        first = self.transfer('10.00')
+        second = self.transfer('20.00')
+
+        async def scenario():
+            stream = self.connect(headers=[
+                (b'authorization', f'Bearer {self.token}'.encode()),
+                (b'last-event-id', first.transaction_id.encode()),
+            ])
+            await stream.send_input({'type': 'http.request', 'body': b''})
+            await stream.receive_output(5)  # response start
+            await stream.receive_output(5)  # retry
+            (kind, event_id, _), = self.parse(await stream.receive_output(5))
+            self.assertEqual((kind, event_id), ('transaction', second.transaction_id))
+            self.assertEqual(self.parse(await stream.receive_output(5))[0][2], {'balance': '30.00'})
+            await stream.send_input({'type': 'http.disconnect'})
+            await stream.wait(5)
+
+        async_to_sync(scenario)()
+
+    def test_rejects_missing_token(self):
+        """Test that the stream requires a valid access token"""
+        async def scenario():
+            stream = self.connect('token=not-a-jwt')
+            await stream.send_input({'type': 'http.request', 'body': b''})
+            self.assertEqual((await stream.receive_output(5))['status'], 401)
+
+        async_to_sync(scenario)()
+
+    def test_recycles_connections_around_queries(self):
+        """Test that stale connections are closed before and after each lookup"""
+        async def scenario():
+            stream = self.connect('token=not-a-jwt')
+            await stream.send_input({'type': 'http.request', 'body': b''})
+            await stream.receive_output(5)
+
+        with mock.patch('transactions.stream.close_old_connections') as close_old_connections:
+            async_to_sync(scenario)()
+        self.assertEqual(close_old_connections.call_count, 2)
+
+    def test_slow_subscriber_gets_resync(self):
+        """Test that an overflowing queue collapses into a single resync event"""
+        async def scenario():
+            subscription = broker.subscribe(42)
+            try:
+                for i in range(QUEUE_LIMIT + 5):
+                    broker.publish(42, {'event': 'transaction', 'id': str(i), 'data': {}})
+                await asyncio.sleep(0)
+                events = subscription.drain()
+            finally:
+                subscription.close()
+            self.assertEqual(events[0], RESYNC)
+            self.assertEqual(len(events), 5)
+
+        async_to_sync(scenario)()
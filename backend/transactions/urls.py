@@ -1,10 +1,18 @@
 from django.urls import path
-from .views import TransferMoneyView, TransactionHistoryView, FlaggedTransactionsView
+from .views import (
+    TransferMoneyView, BatchTransferView, TransactionStatusView, TransactionHistoryView,
+    FlaggedTransactionsView, TransactionExportView, ScheduledTransferListView, ScheduledTransferDetailView
+)
 
 app_name = 'transactions'
 
 urlpatterns = [
     path('transfer/', TransferMoneyView.as_view(), name='transfer'),
+    path('transfer/batch/', BatchTransferView.as_view(), name='transfer-batch'),
+    path('status/<str:transaction_id>/', TransactionStatusView.as_view(), name='status'),
+    path('scheduled/', ScheduledTransferListView.as_view(), name='scheduled'),
+    path('scheduled/<int:pk>/', ScheduledTransferDetailView.as_view(), name='scheduled-detail'),
     path('history/', TransactionHistoryView.as_view(), name='history'),
+    path('export/', TransactionExportView.as_view(), name='export'),
     path('flagged/', FlaggedTransactionsView.as_view(), name='flagged'),
 ]
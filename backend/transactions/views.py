@@ -1,25 +1,45 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db import transaction as db_transaction
-from django.db.models import Sum, Q
-from django.utils import timezone
-from datetime import timedelta
+import re
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from django_ratelimit.decorators import ratelimit
+from backend.fastpath import FastJSONRenderer
+from backend.projection import ProjectionMixin
 from django.utils.decorators import method_decorator
-from .models import Transaction
 from banking.models import BankAccount
-from .serializers import TransferSerializer, TransactionSerializer
+from fraud_detection.features import features_for
+from fraud_detection.rules import screen_transfer, server_timing
+from .conditional import account_condition
+from .export import CSVRenderer, EXPORT_FIELDS, NDJSONRenderer, chunked, csv_lines, gzipped, ndjson_lines
+from .models import ScheduledTransfer, Transaction
+from .history import AccountHistory, filter_history
+from .idempotency import idempotent
+from .pagination import KeysetPagination
+from .serializers import (
+    BatchTransferSerializer, ExportFilterSerializer, HistoryFilterSerializer, ScheduledTransferSerializer, TransferSerializer,
+    TransactionSerializer, TransactionStatusSerializer
+)
+from .services import (
+    BatchRejected, ReceiverNotFound, TransferError, execute_batch_transfer, execute_transfer,
+    resolve_accounts, resolve_transfer, submit_transfer
+)
 
 
 class TransferMoneyView(generics.CreateAPIView):
     """
     Money transfer endpoint with validation, fraud detection, and rate limiting.
+    Send "Prefer: respond-async" to queue the transfer and get 202 back.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = TransferSerializer
 
     @method_decorator(ratelimit(key='user', rate='10/m', method='POST'))
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -28,130 +48,304 @@ class TransferMoneyView(generics.CreateAPIView):
         amount = serializer.validated_data['amount']
         description = serializer.validated_data.get('description', '')
 
-        # Get sender's account
+        # Resolve both accounts (and their users) in one query
         try:
-            sender_account = request.user.bank_account
-        except BankAccount.DoesNotExist:
-            return Response(
-                {'error': 'You do not have a bank account'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Get receiver's account
-        receiver_account = BankAccount.objects.get(account_number=receiver_account_number)
+            sender_account, receiver_account = resolve_transfer(request.user, receiver_account_number)
+        except ReceiverNotFound as e:
+            raise ValidationError({'receiver_account': [e.message]})
+        except TransferError as e:
+            return Response({'error': e.message}, status=e.status_code)
 
-        # Validation: Cannot transfer to same account
-        if sender_account == receiver_account:
-            return Response(
-                {'error': 'Cannot transfer to your own account'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Validation: Insufficient balance
-        if sender_account.balance < amount:
+        # Validation: Insufficient balance (fast fail; enforced again under lock)
+        if sender_account.total_balance < amount:
             return Response(
                 {'error': 'Insufficient balance'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Validation: Daily limit check
-        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_transfers = Transaction.objects.filter(
-            sender_account=sender_account,
-            timestamp__gte=today_start,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Async mode: queue the transfer and let a worker settle it
+        if 'respond-async' in request.META.get('HTTP_PREFER', ''):
+            transaction_obj = submit_transfer(sender_account, receiver_account, amount, description)
+            status_url = reverse('transactions:status', args=[transaction_obj.transaction_id])
+            return Response({
+                'transaction_id': transaction_obj.transaction_id,
+                'status': 'pending',
+                'amount': str(amount),
+                'sender_account': sender_account.account_number,
+                'receiver_account': receiver_account.account_number,
+                'timestamp': transaction_obj.timestamp,
+                'status_url': status_url
+            }, status=status.HTTP_202_ACCEPTED, headers={
+                'Location': status_url,
+                'Preference-Applied': 'respond-async'
+            })
 
-        if today_transfers + amount > sender_account.daily_limit:
+        # Fraud detection (fraud_detection.rules)
+        verdict = screen_transfer(sender_account, amount)
+
+        # Atomic transaction execution (row-locked, retried on deadlock).
+        # The daily limit is checked here against the account's spend counter.
+        try:
+            transaction_obj = execute_transfer(
+                sender_account,
+                receiver_account,
+                amount,
+                description=description,
+                flagged=verdict.flagged,
+                fraud_score=verdict.score,
+                fraud_reason=verdict.reason
+            )
+        except TransferError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        except Exception as e:
             return Response(
-                {'error': 'Daily transfer limit exceeded'},
-                status=status.HTTP_429_TOO_MANY_REQUESTS
+                {'error': f'Transaction failed: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        # Fraud detection (simple rule-based for MVP)
-        flagged = False
-        fraud_score = 0.0
-        fraud_reason = None
+        return Response({
+            'transaction_id': transaction_obj.transaction_id,
+            'status': 'success',
+            'amount': str(amount),
+            'sender_account': sender_account.account_number,
+            'receiver_account': receiver_account.account_number,
+            'sender_new_balance': str(sender_account.total_balance),
+            'timestamp': transaction_obj.timestamp,
+            'flagged': verdict.flagged,
+            'fraud_score': str(verdict.score) if verdict.score > 0 else None
+        }, status=status.HTTP_200_OK, headers={'Server-Timing': server_timing([verdict])})
 
-        # Rule 1: Large transaction
-        if amount > 10000:
-            flagged = True
-            fraud_score = 0.9
-            fraud_reason = "Large transaction amount"
 
-        # Rule 2: Rapid transactions
-        recent_count = Transaction.objects.filter(
-            sender_account=sender_account,
-            timestamp__gte=timezone.now() - timedelta(minutes=10)
-        ).count()
+class BatchTransferView(generics.CreateAPIView):
+    """
+    Execute many transfers from the user's account in one request.
+    Receivers are resolved with one query, balance and daily limit are
+    checked once, and all transaction rows are bulk inserted atomically.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = BatchTransferSerializer
 
-        if recent_count > 5:
-            flagged = True
-            fraud_score = max(fraud_score, 0.8)
-            fraud_reason = "Multiple rapid transactions"
+    @method_decorator(ratelimit(key='user', rate='10/m', method='POST'))
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        # Atomic transaction execution
+        mode = serializer.validated_data['mode']
+        legs = serializer.validated_data['legs']
+
+        # Sender and every receiver in one query
         try:
-            with db_transaction.atomic():
-                # Deduct from sender
-                sender_account.balance -= amount
-                sender_account.save()
-
-                # Add to receiver
-                receiver_account.balance += amount
-                receiver_account.save()
-
-                # Create transaction record
-                transaction_obj = Transaction.objects.create(
-                    sender_account=sender_account,
-                    receiver_account=receiver_account,
-                    amount=amount,
-                    description=description,
-                    status='completed',
-                    flagged=flagged,
-                    fraud_score=fraud_score,
-                    fraud_reason=fraud_reason
-                )
+            sender_account, receivers = resolve_accounts(
+                request.user, {leg['receiver_account'] for leg in legs}
+            )
+        except TransferError as e:
+            return Response({'error': e.message}, status=e.status_code)
 
-                return Response({
-                    'transaction_id': transaction_obj.transaction_id,
-                    'status': 'success',
-                    'amount': str(amount),
-                    'sender_account': sender_account.account_number,
-                    'receiver_account': receiver_account.account_number,
-                    'sender_new_balance': str(sender_account.balance),
-                    'timestamp': transaction_obj.timestamp,
-                    'flagged': flagged,
-                    'fraud_score': str(fraud_score) if fraud_score > 0 else None
-                }, status=status.HTTP_200_OK)
+        # Fraud screening: earlier legs count towards the rapid-transfer rule
+        features = features_for(sender_account)
+        verdicts = []
+        for index, leg in enumerate(legs):
+            verdict = screen_transfer(sender_account, leg['amount'], earlier_legs=index, features=features)
+            leg['flagged'], leg['fraud_score'], leg['fraud_reason'] = verdict.flagged, verdict.score, verdict.reason
+            verdicts.append(verdict)
 
+        try:
+            results = execute_batch_transfer(
+                sender_account, legs, atomic=(mode == 'atomic'), receivers=receivers
+            )
+        except BatchRejected as e:
+            return Response({
+                'status': 'failed',
+                'mode': mode,
+                'error': e.message,
+                'results': self.format_results(e.results)
+            }, status=e.status_code)
+        except TransferError as e:
+            return Response({'error': e.message}, status=e.status_code)
         except Exception as e:
             return Response(
                 {'error': f'Transaction failed: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        completed = [result for result in results if result['status'] == 'completed']
+        if len(completed) == len(results):
+            batch_status = 'success'
+        elif completed:
+            batch_status = 'partial'
+        else:
+            batch_status = 'failed'
 
-class TransactionHistoryView(generics.ListAPIView):
-    """Get transaction history for authenticated user"""
-    serializer_class = TransactionSerializer
+        return Response({
+            'status': batch_status,
+            'mode': mode,
+            'completed': len(completed),
+            'rejected': len(results) - len(completed),
+            'total_amount': str(sum(result['amount'] for result in completed)),
+            'sender_account': sender_account.account_number,
+            'sender_new_balance': str(sender_account.total_balance),
+            'results': self.format_results(results)
+        }, status=status.HTTP_200_OK, headers={'Server-Timing': server_timing(verdicts)})
+
+    @staticmethod
+    def format_results(results):
+        for result in results:
+            result['amount'] = str(result['amount'])
+        return results
+
+
+class TransactionStatusView(generics.RetrieveAPIView):
+    """Poll the state of a transfer, e.g. one submitted asynchronously"""
+    serializer_class = TransactionStatusSerializer
     permission_classes = [IsAuthenticated]
+    lookup_field = 'transaction_id'
 
     def get_queryset(self):
-        user_account = self.request.user.bank_account
+        user = self.request.user
         return Transaction.objects.filter(
-            Q(sender_account=user_account) | Q(receiver_account=user_account)
-        ).order_by('-timestamp')
+            Q(sender_account__user=user) | Q(receiver_account__user=user)
+        ).select_related('sender_account__user', 'receiver_account__user')
+
+
+class ScheduledTransferListView(generics.ListCreateAPIView):
+    """List and create the user's standing orders"""
+    serializer_class = ScheduledTransferSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ScheduledTransfer.objects.filter(
+            sender_account__user=self.request.user
+        ).select_related('receiver_account').order_by('next_run_at')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            sender_account, receiver_account = resolve_transfer(
+                request.user, serializer.validated_data['receiver_account']
+            )
+        except ReceiverNotFound as e:
+            raise ValidationError({'receiver_account': [e.message]})
+        except TransferError as e:
+            return Response({'error': e.message}, status=e.status_code)
+
+        serializer.save(
+            sender_account=sender_account,
+            receiver_account=receiver_account,
+            next_run_at=serializer.validated_data['start_at']
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ScheduledTransferDetailView(generics.RetrieveDestroyAPIView):
+    """Show or cancel a standing order; cancelled schedules are kept for reference"""
+    serializer_class = ScheduledTransferSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ScheduledTransfer.objects.filter(
+            sender_account__user=self.request.user
+        ).select_related('receiver_account')
+
+    def perform_destroy(self, instance):
+        instance.is_active = False
+        instance.save(update_fields=['is_active', 'updated_at'])
+
+
+class TransactionHistoryView(ProjectionMixin, generics.ListAPIView):
+    """
+    Get transaction history for authenticated user, newest first.
+    Paged with opaque cursors; add ?count=estimate for an approximate total
+    and ?fields= to return (and load) a subset of fields. Filter with
+    start_date, end_date, min_amount, max_amount, counterparty, direction,
+    status and flagged.
+    Sends ETag/Last-Modified; unchanged polls get 304 Not Modified.
+    """
+    serializer_class = TransactionSerializer
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer]
+    pagination_class = KeysetPagination
+    projection_required = ('timestamp',)  # cursor key
+    fast_rows = True
+
+    @method_decorator(account_condition)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        filters = HistoryFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        # UNION ALL of the sent and received branches, one index each
+        history = AccountHistory(
+            self.request.user.bank_account,
+            base=self.project(Transaction.objects.all())
+        )
+        return filter_history(history, filters.validated_data)
+
+
+class TransactionExportView(generics.GenericAPIView):
+    """
+    Stream an account's full statement as CSV (default) or NDJSON, oldest first.
+    Pick the format with ?format=csv|ndjson or the Accept header, narrow it
+    with start_date/end_date, and send Accept-Encoding: gzip to compress it.
+    Admins and auditors can export any account with ?account=.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+    chunk_size = 2000
+    accepts_gzip = re.compile(r'\bgzip\b')
+
+    def get(self, request):
+        filters = ExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        try:
+            own_account = request.user.bank_account
+        except BankAccount.DoesNotExist:
+            own_account = None
+        account = own_account
+        if params.get('account') and params['account'] != getattr(own_account, 'account_number', None):
+            if request.user.role not in ['admin', 'auditor']:
+                return Response(
+                    {'error': 'You can only export your own account'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            account = BankAccount.objects.filter(account_number=params['account']).first()
+        if account is None:
+            return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        history = filter_history(AccountHistory(account).order_by('timestamp', 'id'), params)
+        rows = history.iterator(*EXPORT_FIELDS, chunk_size=self.chunk_size)
+
+        renderer = request.accepted_renderer
+        body = chunked(csv_lines(rows) if renderer.format == 'csv' else ndjson_lines(rows))
+        gzip = bool(self.accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        if gzip:
+            body = gzipped(body)
+
+        response = StreamingHttpResponse(body, content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = (
+            f'attachment; filename="statement-{account.account_number}.{renderer.format}"'
+        )
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
 
 
-class FlaggedTransactionsView(generics.ListAPIView):
-    """Admin endpoint to view flagged transactions"""
+class FlaggedTransactionsView(ProjectionMixin, generics.ListAPIView):
+    """Admin endpoint to view flagged transactions (supports ?fields=)"""
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer]
+    fast_rows = True
 
     def get_queryset(self):
         # Only allow admins and auditors
         if self.request.user.role not in ['admin', 'auditor']:
             return Transaction.objects.none()
 
-        return Transaction.objects.filter(flagged=True).order_by('-timestamp')
+        return self.project(Transaction.objects.filter(flagged=True)).order_by('-timestamp')